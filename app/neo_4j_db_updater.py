@@ -1,7 +1,13 @@
+# Run from the repository root: python -m app.neo_4j_db_updater
 import logging
 from neo4j import GraphDatabase
 import random
 from datetime import datetime, timedelta
+from modules.config import COMPACT_SERIES
+from modules.database_manager import DatabaseManager
+from modules.report_store import ReportStore
+from modules.schema_migration import migrate
+from modules.service import create_blob_store
 
 # Logging setup for your application
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,10 +29,8 @@ def clear_database():
 
 def create_constraints():
     logging.info("Creating constraints.")
-    with driver.session() as session:
-        session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (c:Company) REQUIRE c.name IS UNIQUE")
-        session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (m:Metric) REQUIRE m.name IS UNIQUE")
-        session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (r:Report) REQUIRE r.id IS UNIQUE")
+    # Creates the constraints and indexes, and records the schema version only once all of them exist
+    migrate(DatabaseManager(driver))
     logging.info("Constraints created.")
 
 def create_company(tx, name, industry, location, revenue, employees):
@@ -49,21 +53,6 @@ def create_metric(tx, name, description, unit):
         unit: $unit
     })""", name=name, description=description, unit=unit)
 
-def add_metric_value(tx, company, metric, value, date):
-    logging.debug(f"Adding metric value for {company}: {metric} = {value} on {date}")
-    tx.run("""
-    MATCH (c:Company {name: $company}), (m:Metric {name: $metric})
-    CREATE (c)-[:HAS_METRIC]->(m)
-    CREATE (m)-[:HAS_VALUE]->(mv:MetricValue {value: $value, date: $date})-[:OF_METRIC]->(m)
-    """, company=company, metric=metric, value=value, date=date)
-
-def add_report(tx, company, report_type, date, content):
-    logging.debug(f"Adding {report_type} report for {company} on {date}")
-    tx.run("""
-    MATCH (c:Company {name: $company})
-    CREATE (c)-[:HAS_REPORT]->(r:Report {id: $id, type: $type, date: $date, content: $content})
-    """, company=company, id=f"{company}_{report_type}_{date}", type=report_type, date=date, content=content)
-
 def generate_sample_report_content(company, report_type):
     financial_overview = f"{company} saw substantial changes in the {report_type.lower()} period. Highlights include revenue growth driven by key business segments and strong market positioning."
     challenges = "Challenges faced include fluctuations in commodity prices and regulatory changes in key markets."
@@ -72,6 +61,7 @@ def generate_sample_report_content(company, report_type):
 
 def populate_database():
     logging.info("Starting database population.")
+    create_constraints()
     
     companies = [
         ("Apple", "Technology", "United States", 365000, 147000),
@@ -99,6 +89,7 @@ def populate_database():
         current_date = start_date
         
         logging.info("Adding metric values and reports.")
+        records = []
         while current_date <= end_date:
             for company, _, _, _, _ in companies:
                 for metric, _, unit in metrics:
@@ -154,16 +145,25 @@ def populate_database():
                         pass
                     
                     # Add metric value
-                    session.execute_write(add_metric_value, company, metric, round(value, 2), current_date.strftime("%Y-%m-%d"))
+                    records.append({"company": company, "metric": metric, "value": round(value, 2),
+                                    "date": current_date.strftime("%Y-%m-%d"), "unit": unit})
             
             current_date += timedelta(days=90)  # Quarterly data
-        
-        report_types = ["Annual", "Quarterly"]
-        for company, _, _, _, _ in companies:
-            for report_type in report_types:
-                date = end_date - timedelta(days=random.randint(0, 365*5))
-                content = generate_sample_report_content(company, report_type)
-                session.execute_write(add_report, company, report_type, date.strftime("%Y-%m-%d"), content)
+
+    # The same batched upsert the app uses, which also maintains the compact series arrays and the rollups
+    DatabaseManager(driver, COMPACT_SERIES).add_metric_values(records)
+
+    # Reports go through the report store, which splits them into the chunks retrieval searches
+    # and keeps their bodies in the blob store when REPORT_BLOB_DIR is set
+    report_store = ReportStore(DatabaseManager(driver), blob_store=create_blob_store())
+    report_store.create_indexes()
+    report_types = ["Annual", "Quarterly"]
+    for company, _, _, _, _ in companies:
+        for report_type in report_types:
+            date = end_date - timedelta(days=random.randint(0, 365*5))
+            content = generate_sample_report_content(company, report_type)
+            logging.debug(f"Adding {report_type} report for {company} on {date:%Y-%m-%d}")
+            report_store.add_report(company, report_type, date.strftime("%Y-%m-%d"), content)
 
     logging.info("Database population complete.")
 
@@ -1,55 +1,72 @@
-import os
 import logging
-from typing import Dict, Any, List, Tuple
+import uuid
+import hashlib
+from typing import Dict, Any
 import streamlit as st
 import pandas as pd
-from neo4j import GraphDatabase
-import openai
-from datetime import datetime
 
-from modules.database_manager import DatabaseManager
-from modules.conversation_manager import Conversation, ConversationContext, save_conversation, load_conversation
-from modules.nlp_processor import extract_entities_and_intent
-from modules.query_generator import QueryGenerator
-from modules.chatbot import chatbot_with_context
+from modules.config import (
+    AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD, METRICS_PANEL, CONVERSATION_OWNER, CONVERSATION_OWNER_COOKIE,
+    CONVERSATION_LIST_LIMIT
+)
+from modules.conversation_manager import Conversation
+from modules.service import FinWiseService, create_service, create_database_manager, get_conversation_store
+from modules.metrics import pipeline_metrics
+from modules.model_router import model_router
+from modules.resources import resources
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-AURA_CONNECTION_URI = os.environ.get("AURA_CONNECTION_URI", "neo4j+s://2df8ccfd.databases.neo4j.io:7687")
-AURA_USERNAME = os.environ.get("AURA_USERNAME", "neo4j")
-AURA_PASSWORD = os.environ.get("AURA_PASSWORD", "m0bp___En5qsHdQyjxKEuxCx-lMEZBgmgNESxLjZIHw")
-GAIA_NODE_URL = os.environ.get("GAIA_NODE_URL", "https://llama.us.gaianet.network/v1")
-GAIA_NODE_NAME = os.environ.get("GAIA_NODE_NAME", "llama")
-GAIA_NODE_API_KEY = os.environ.get("GAIA_NODE_API_KEY", "API_KEY")
-
-def create_driver(uri: str, username: str, password: str):
-    try:
-        return GraphDatabase.driver(uri, auth=(username, password))
-    except Exception as e:
-        logger.error(f"Error creating driver: {e}")
-        return None
+
+def conversation_owner() -> str:
+    # The signed-in user where Streamlit knows one, then the identity cookie; a single shared
+    # history only when CONVERSATION_OWNER opts into it, otherwise this browser session's own
+    user = getattr(st, "experimental_user", None)
+    email = user.get("email") if user is not None else None
+    if email:
+        return email
+    if CONVERSATION_OWNER_COOKIE:
+        cookies = getattr(getattr(st, "context", None), "cookies", None) or {}
+        if cookies.get(CONVERSATION_OWNER_COOKIE):
+            # Hashed, so the conversation store never holds a usable session token
+            return "cookie:" + hashlib.sha256(cookies[CONVERSATION_OWNER_COOKIE].encode("utf-8")).hexdigest()
+    if CONVERSATION_OWNER:
+        return CONVERSATION_OWNER
+    if "conversation_owner" not in st.session_state:
+        st.session_state.conversation_owner = f"session:{uuid.uuid4()}"
+    return st.session_state.conversation_owner
+
+@st.cache_resource
+def get_service(_db_manager, db_key: int) -> FinWiseService:
+    # Keyed by driver, so every session on the same database shares one service and its caches
+    return create_service(_db_manager)
 
 class FinWiseApp:
     def __init__(self):
-        self.driver = create_driver(AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD)
-        self.client = openai.OpenAI(base_url=GAIA_NODE_URL, api_key=GAIA_NODE_API_KEY)
-        self.query_generator = QueryGenerator(self.client, GAIA_NODE_NAME)
+        # Shared across reruns and sessions; see modules.resources
+        self.driver = resources.get_driver(AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD)
         self.initialize_session_state()
 
+    @property
+    def service(self) -> FinWiseService:
+        return get_service(st.session_state.db_manager, id(st.session_state.db_manager.driver))
+
     def initialize_session_state(self):
         if 'current_conversation' not in st.session_state:
             st.session_state.current_conversation = Conversation()
-        if 'conversations' not in st.session_state:
-            st.session_state.conversations = {}
         if 'db_manager' not in st.session_state:
-            st.session_state.db_manager = DatabaseManager(self.driver)
+            st.session_state.db_manager = create_database_manager(self.driver)
             if st.session_state.db_manager.database_is_empty():
                 st.error("The database is empty. Please add some data before using FinWise AI.")
         if 'uploaded_file' not in st.session_state:
             st.session_state.uploaded_file = None
         if 'chart_data' not in st.session_state:
             st.session_state.chart_data = None
+        if 'pending_records' not in st.session_state:
+            st.session_state.pending_records = None
+        if 'answer_cached_at' not in st.session_state:
+            st.session_state.answer_cached_at = None
 
     def sidebar(self):
         with st.sidebar:
@@ -60,20 +77,25 @@ class FinWiseApp:
             self.file_uploader()
             self.database_manager()
             self.recent_insights()
+            if METRICS_PANEL:
+                self.metrics_panel()
             self.help_section()
 
+    def save_current_conversation(self):
+        # Appends only what changed since the last save; a conversation nobody wrote in is not kept
+        conversation = st.session_state.current_conversation
+        if len(conversation.messages) > 1:
+            get_conversation_store().save(conversation, conversation_owner())
+
     def new_conversation(self):
-        st.session_state.conversations = save_conversation(st.session_state.current_conversation, st.session_state.conversations)
+        self.save_current_conversation()
         st.session_state.current_conversation = Conversation()
         st.rerun()
 
     def past_conversations(self):
         st.subheader("Past Conversations")
-        conversations = sorted(
-            st.session_state.conversations.values(),
-            key=lambda x: datetime.fromisoformat(x['updated_at']),
-            reverse=True
-        )
+        # Titles only, newest first from the store's index; a body is loaded when it is opened
+        conversations = get_conversation_store().list(conversation_owner(), CONVERSATION_LIST_LIMIT)
         self.display_conversations(conversations[:10])
         if len(conversations) > 10:
             with st.expander("Show more"):
@@ -86,7 +108,8 @@ class FinWiseApp:
             conv_title = f"{conv['title'][:20]}..."
             cols = st.columns([5, 1, 1])
             if cols[0].button(conv_title, key=f"conv_{conv_id}"):
-                st.session_state.current_conversation = load_conversation(conv_id, st.session_state.conversations)
+                self.save_current_conversation()
+                st.session_state.current_conversation = get_conversation_store().load(conv_id) or Conversation()
                 st.rerun()
             if cols[1].button("✏️", key=f"rename_btn_{conv_id}", help="Rename"):
                 self.rename_conversation(conv, conv_title)
@@ -97,13 +120,16 @@ class FinWiseApp:
         new_title = st.text_input(f"Rename {conv_title}:", value=conv['title'], key=f"rename_input_{conv['id']}")
         if st.button("Submit", key=f"submit_rename_{conv['id']}"):
             if new_title != conv['title'] and new_title.strip():
-                conv['title'] = new_title.strip()
-                st.session_state.conversations = save_conversation(Conversation.from_dict(conv), st.session_state.conversations)
+                get_conversation_store().rename(conv['id'], new_title.strip())
+                if st.session_state.current_conversation.id == conv['id']:
+                    st.session_state.current_conversation.title = new_title.strip()
                 st.rerun()
 
     def delete_conversation(self, conv_id: str):
         if st.button("Confirm Delete", key=f"confirm_delete_{conv_id}"):
-            del st.session_state.conversations[conv_id]
+            get_conversation_store().delete(conv_id)
+            if st.session_state.current_conversation.id == conv_id:
+                st.session_state.current_conversation = Conversation()
             st.rerun()
 
     def database_manager(self):
@@ -115,13 +141,15 @@ class FinWiseApp:
                 self.load_database(new_uri, new_username, new_password)
             if st.session_state.db_manager:
                 self.display_database_stats()
+            if st.button("Check connections"):
+                for driver in resources.health()["drivers"]:
+                    st.write(f"{'✅' if driver['healthy'] else '❌'} {driver['username']}@{driver['uri']}")
 
     def load_database(self, uri: str, username: str, password: str):
         try:
-            new_driver = create_driver(uri, username, password)
+            new_driver = resources.get_driver(uri, username, password)
             if new_driver is not None:
-                st.session_state.db_manager = DatabaseManager(new_driver)
-                stats = st.session_state.db_manager.get_database_stats()
+                st.session_state.db_manager = create_database_manager(new_driver)
                 st.success("Database loaded successfully.")
                 self.display_database_stats()
             else:
@@ -136,16 +164,33 @@ class FinWiseApp:
 
     def recent_insights(self):
         st.subheader("Recent Insights")
-        insight = self.generate_insight()
-        st.info(insight)
-
-    def generate_insight(self) -> str:
-        prompt = "Fetch the latest data from our database and return a meaningful, bite-sized, and concise insight about the data. Return as short and concise a message as possible."
-        return self.generate_standalone_insight(prompt)
-
-    def generate_standalone_insight(self, prompt: str) -> str:
-        insight = chatbot_with_context(prompt, ConversationContext(), self.client, GAIA_NODE_NAME)
-        return insight
+        insight = self.service.latest_insight()
+        if insight:
+            st.info(insight["text"])
+            st.caption(f"Generated at {insight['generated_at']}")
+        else:
+            st.caption("Insights are being prepared from the latest data.")
+
+    def metrics_panel(self):
+        with st.expander("📊 Pipeline Metrics", expanded=False):
+            snapshot = pipeline_metrics.snapshot()
+            if not snapshot["stages"]:
+                st.write("No questions answered yet.")
+                return
+            st.write("Stage latency")
+            st.dataframe(pd.DataFrame(snapshot["stages"]), hide_index=True)
+            if snapshot["tokens"]:
+                st.write("LLM tokens")
+                st.dataframe(pd.DataFrame(snapshot["tokens"]), hide_index=True)
+            if snapshot["cache"]:
+                st.write("Cache hit rates")
+                st.dataframe(pd.DataFrame(snapshot["cache"]), hide_index=True)
+            routes = model_router.snapshot()
+            if routes:
+                st.write("Models")
+                st.dataframe(pd.DataFrame(routes), hide_index=True)
+            if st.button("Reset metrics"):
+                pipeline_metrics.reset()
 
     def help_section(self):
         with st.expander("ℹ️ Help / About", expanded=False):
@@ -163,6 +208,23 @@ class FinWiseApp:
         if uploaded_file and uploaded_file != st.session_state.uploaded_file:
             st.session_state.uploaded_file = uploaded_file
             self.handle_file_upload(uploaded_file)
+        if st.session_state.pending_records:
+            if st.button(f"Add to database ({len(st.session_state.pending_records)} records)"):
+                self.ingest_pending_records()
+
+    def ingest_pending_records(self):
+        records = st.session_state.pending_records
+        try:
+            with st.spinner("Adding records to the database..."):
+                self.service.ingest(records)
+        except Exception as e:
+            # The records stay pending, so the button can be pressed again
+            st.error(f"The records could not be added to the database: {e}")
+            return
+        st.session_state.pending_records = None
+        st.session_state.current_conversation.add_message("assistant", f"Added {len(records)} data points to the database.")
+        self.save_current_conversation()
+        st.rerun()
 
     def main_chat_area(self):
         st.header(st.session_state.current_conversation.title)
@@ -186,7 +248,7 @@ class FinWiseApp:
         st.success(f"File processed: {uploaded_file.name}")
         st.session_state.current_conversation.add_message("user", f"Uploaded file: {uploaded_file.name}")
         st.session_state.current_conversation.add_message("assistant", response)
-        st.session_state.conversations = save_conversation(st.session_state.current_conversation, st.session_state.conversations)
+        self.save_current_conversation()
         st.rerun()
 
     def read_file(self, uploaded_file):
@@ -195,6 +257,13 @@ class FinWiseApp:
         return uploaded_file.getvalue().decode("utf-8")
 
     def process_file_contents(self, file_contents, filename):
+        if isinstance(file_contents, pd.DataFrame):
+            result = self.service.recognize_table(file_contents)
+            if result is not None:
+                st.session_state.pending_records = result.records
+                return result.summary(filename)
+            logger.info(f"{filename} did not match a known tabular layout, falling back to LLM analysis")
+
         prompt = f"""
         Analyze the following file contents from {filename}:
 
@@ -205,7 +274,7 @@ class FinWiseApp:
 
         If no relevant information is found, please state that.
         """
-        return self.process_user_input(prompt)
+        return self.service.analyze_upload(prompt)
 
     def handle_user_input(self, user_input: str):
         st.session_state.current_conversation.add_message("user", user_input)
@@ -215,75 +284,17 @@ class FinWiseApp:
             with st.spinner("Thinking..."):
                 response = self.process_user_input(user_input)
             st.write(response)
+            if st.session_state.answer_cached_at:
+                st.caption(f"Cached answer as of {st.session_state.answer_cached_at}")
         st.session_state.current_conversation.add_message("assistant", response)
-        st.session_state.conversations = save_conversation(st.session_state.current_conversation, st.session_state.conversations)
+        self.save_current_conversation()
 
     def process_user_input(self, user_input: str) -> str:
-        entities, intent = extract_entities_and_intent(user_input)
-        
-        try:
-            query, is_valid, explanation = self.query_generator.generate_and_validate_query(intent, entities)
-            
-            if is_valid:
-                logger.info(f"Valid query generated: {query}")
-                
-                required_params = self.query_generator.extract_parameters_from_query(query)
-                
-                parameters = self._prepare_query_parameters(entities, required_params)
-                
-                logger.debug(f"Executing Query with Parameters: {parameters}")
-                
-                try:
-                    kg_response = st.session_state.db_manager.execute_query(query, parameters)
-                    
-                    self._update_conversation_context(user_input, entities, intent, kg_response)
-                    
-                    # Process the kg_response to generate chart data if applicable
-                    st.session_state.chart_data = self.process_chart_data(kg_response, intent)
-                    
-                except Exception as e:
-                    logger.error(f"Neo4j query execution failed: {e}")
-                    kg_response = f"I encountered an error while fetching the data: {str(e)}. Please try rephrasing your question or providing more specific information."
-                    self._update_conversation_context(user_input, entities, intent, kg_response)
-            
-            else:
-                logger.warning(f"Invalid query generated: {query}")
-                logger.warning(f"Validation explanation: {explanation}")
-                kg_response = f"I apologize, but I couldn't generate a valid query to answer your question. The issue was: {explanation}. Could you please rephrase or provide more details?"
-        
-        except Exception as e:
-            logger.error(f"Query generation failed: {e}")
-            kg_response = "I encountered an unexpected error while processing your question. Please try again or rephrase your query."
-        
-        ai_response = chatbot_with_context(user_input, st.session_state.current_conversation.context, self.client, GAIA_NODE_NAME)
-        st.session_state.current_conversation.context.update_ai_response(ai_response)
-        return ai_response
-
-    def _prepare_query_parameters(self, entities: Dict[str, List[str]], required_params: List[str]) -> Dict[str, Any]:
-        parameters = {}
-        for param in required_params:
-            if param in entities and entities[param]:
-                if param == "limit":
-                    parameters[param] = int(entities[param][0])
-                elif param in ["startDate", "endDate"]:
-                    parameters[param] = entities[param][0]
-                else:
-                    parameters[param] = entities[param]
-            else:
-                parameters[param] = None
-        return parameters
-
-    def _update_conversation_context(self, user_input: str, entities: Dict[str, List[str]], intent: Dict[str, Any], kg_response: str):
-        st.session_state.current_conversation.context.update(
-            user_input=user_input,
-            companies=entities.get("companies", []),
-            metrics=entities.get("metrics", []),
-            start_date=entities.get("startDate", ["latest"]),
-            end_date=entities.get("endDate", []),
-            industry=entities.get("industry", None),
-            intent=intent,
-            kg_response=str(kg_response)
-        )
+        # The session's conversation context is handed to the service explicitly
+        result = self.service.ask(user_input, st.session_state.current_conversation.context)
+        st.session_state.chart_data = self.process_chart_data(result["data"], result["intent"])
+        st.session_state.answer_cached_at = result["cached_at"]
+        return result["answer"]
 
     def process_chart_data(self, kg_response, intent):
         # This method would process the kg_response and generate chart data based on the intent
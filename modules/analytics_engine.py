@@ -0,0 +1,301 @@
+from typing import Dict, Any, List, Optional, Tuple
+import re
+import time
+import logging
+import threading
+import numpy as np
+from modules.tabular_recognizer import METRIC_ALIASES, normalize_label
+from modules.trend_engine import Series, summarize_series
+from modules.rollups import FLOW_METRICS
+
+logger = logging.getLogger(__name__)
+
+METRIC_BITS = 20
+METRIC_MASK = (1 << METRIC_BITS) - 1
+
+LOAD_QUERY = """
+MATCH (mv:MetricValue)
+WHERE mv.companyName IS NOT NULL AND mv.metricName IS NOT NULL
+  AND ($watermark IS NULL OR mv.date >= date($watermark))
+RETURN mv.companyName AS company, mv.metricName AS metric,
+       duration.inDays(date('1970-01-01'), mv.date).days AS day, toFloat(mv.value) AS value
+"""
+
+INDUSTRY_QUERY = "MATCH (c:Company) RETURN c.name AS company, c.industry AS industry"
+
+
+def day_to_iso(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+def iso_to_day(date: str) -> int:
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+
+def parse_year_bound(date_texts: List[str], month_day: str) -> Optional[str]:
+    for text in date_texts or []:
+        match = re.search(r"\b(19|20)\d{2}\b", text)
+        if match:
+            return f"{match.group(0)}-{month_day}"
+    return None
+
+
+class MetricAnalyticsEngine:
+    # Incremental refreshes load values dated on or after the newest day already held, which
+    # misses backfilled history written by other processes; a full reload every
+    # full_refresh_interval picks those up. Values ingested through this process are merged
+    # directly with add_records.
+    def __init__(self, db_manager, refresh_interval: float = 60.0, full_refresh_interval: float = 900.0, forecast_horizon: int = 4):
+        self.db_manager = db_manager
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.forecast_horizon = forecast_horizon
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.last_refresh = 0.0
+        self.last_full_refresh = 0.0
+        self.companies = []
+        self.company_codes = {}
+        self.metrics = []
+        self.metric_codes = {}
+        self.industries = {}
+        # Columnar store sorted by (company, metric, day); keys pack both codes into one int64
+        self.keys = np.empty(0, dtype=np.int64)
+        self.days = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        self.watermark = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _code(self, name: str, names: List[str], codes: Dict[str, int]) -> int:
+        lookup = name.lower()
+        if lookup not in codes:
+            codes[lookup] = len(names)
+            names.append(name)
+        return codes[lookup]
+
+    def refresh(self, full: bool = False) -> int:
+        with self.lock:
+            if full:
+                self._reset()
+            loaded = 0
+            if full and getattr(self.db_manager, "compact_series", False):
+                # One read of the compact arrays instead of a scan of every MetricValue; values
+                # written after the arrays were read are caught by the watermark load below
+                loaded = self._merge_series(self.db_manager.get_series_arrays_bulk())
+            rows = self.db_manager.execute_query(LOAD_QUERY, {"watermark": day_to_iso(self.watermark) if self.watermark is not None else None})
+            for row in self.db_manager.execute_query(INDUSTRY_QUERY):
+                self.industries[self._code(row["company"], self.companies, self.company_codes)] = row["industry"]
+            self.last_refresh = time.monotonic()
+            if full:
+                self.last_full_refresh = self.last_refresh
+            return loaded + self._merge(rows)
+
+    def add_records(self, records: List[Dict[str, Any]]) -> int:
+        # Ingested records (ISO dates) go straight into the store, whatever their dates
+        with self.lock:
+            return self._merge([{
+                "company": record["company"], "metric": record["metric"],
+                "day": iso_to_day(record["date"]) if record.get("date") else None, "value": record.get("value")
+            } for record in records])
+
+    def _merge_series(self, arrays: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]) -> int:
+        # arrays: (company, metric) -> (datetime64[D] dates, values), as read from the compact series
+        arrays = {name: series for name, series in arrays.items() if len(series[0])}
+        if not arrays:
+            return 0
+        new_keys = np.concatenate([
+            np.full(len(dates), (self._code(company, self.companies, self.company_codes) << METRIC_BITS)
+                    | self._code(metric, self.metrics, self.metric_codes), dtype=np.int64)
+            for (company, metric), (dates, _) in arrays.items()])
+        new_days = np.concatenate([dates.astype(np.int64) for dates, _ in arrays.values()])
+        new_values = np.concatenate([values for _, values in arrays.values()])
+        return self._merge_arrays(new_keys, new_days, new_values)
+
+    def _merge(self, rows: List[Dict[str, Any]]) -> int:
+        rows = [row for row in rows if row["day"] is not None and row["value"] is not None]
+        if not rows:
+            return 0
+
+        new_keys = np.fromiter(
+            ((self._code(row["company"], self.companies, self.company_codes) << METRIC_BITS)
+             | self._code(row["metric"], self.metrics, self.metric_codes) for row in rows),
+            dtype=np.int64, count=len(rows))
+        new_days = np.fromiter((row["day"] for row in rows), dtype=np.int64, count=len(rows))
+        new_values = np.fromiter((row["value"] for row in rows), dtype=np.float64, count=len(rows))
+        return self._merge_arrays(new_keys, new_days, new_values)
+
+    def _merge_arrays(self, new_keys: np.ndarray, new_days: np.ndarray, new_values: np.ndarray) -> int:
+        keys = np.concatenate([self.keys, new_keys])
+        days = np.concatenate([self.days, new_days])
+        values = np.concatenate([self.values, new_values])
+        order = np.lexsort((days, keys))
+        keys, days, values = keys[order], days[order], values[order]
+        # The most recently loaded value wins for a repeated (company, metric, day)
+        keep = np.r_[(keys[1:] != keys[:-1]) | (days[1:] != days[:-1]), True]
+        self.keys, self.days, self.values = keys[keep], days[keep], values[keep]
+        self.watermark = int(self.days.max())
+        logger.info(f"Analytics store merged {len(new_keys)} values, {len(self)} total")
+        return len(new_keys)
+
+    def refresh_if_stale(self):
+        now = time.monotonic()
+        if now - self.last_refresh > self.refresh_interval:
+            try:
+                self.refresh(full=now - self.last_full_refresh > self.full_refresh_interval)
+            except Exception as e:
+                logger.error(f"Analytics refresh failed: {e}")
+
+    def resolve_company(self, name: str) -> Optional[int]:
+        return self.company_codes.get(name.strip().lower())
+
+    def resolve_metric(self, name: str) -> Optional[int]:
+        label = normalize_label(name)
+        canonical = METRIC_ALIASES.get(label, name)
+        code = self.metric_codes.get(canonical.lower())
+        return code if code is not None else self.metric_codes.get(label)
+
+    def series(self, company_code: int, metric_code: int) -> Tuple[np.ndarray, np.ndarray]:
+        key = (company_code << METRIC_BITS) | metric_code
+        lo, hi = np.searchsorted(self.keys, [key, key + 1])
+        return self.days[lo:hi], self.values[lo:hi]
+
+    def latest(self, metric_code: int, as_of: Optional[int] = None, company_codes: Optional[List[int]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        mask = (self.keys & METRIC_MASK) == metric_code
+        if as_of is not None:
+            mask &= self.days <= as_of
+        if company_codes is not None:
+            mask &= np.isin(self.keys >> METRIC_BITS, company_codes)
+        idx = np.flatnonzero(mask)
+        if not len(idx):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        # Rows are sorted by day within each series, so the last row per key is the latest
+        idx = idx[np.r_[self.keys[idx][1:] != self.keys[idx][:-1], True]]
+        return self.keys[idx] >> METRIC_BITS, self.days[idx], self.values[idx]
+
+    def value_a_year_before(self, company_code: int, metric_code: int, day: int, tolerance: int = 45) -> Optional[float]:
+        days, values = self.series(company_code, metric_code)
+        target = day - 365
+        pos = np.searchsorted(days, target)
+        candidates = [i for i in (pos - 1, pos) if 0 <= i < len(days) and abs(days[i] - target) <= tolerance]
+        if not candidates:
+            return None
+        return float(values[min(candidates, key=lambda i: abs(days[i] - target))])
+
+    def annual(self, company_code: int, metric_code: int, year: int) -> Optional[Tuple[float, bool]]:
+        # The AnnualMetric rollup for one year: (value, complete) under the same rules
+        days, values = self.series(company_code, metric_code)
+        lo, hi = np.searchsorted(days, [iso_to_day(f"{year}-01-01"), iso_to_day(f"{year + 1}-01-01")])
+        if lo == hi:
+            return None
+        flow = self.metrics[metric_code] in FLOW_METRICS
+        value = float(values[lo:hi].sum()) if flow else float(values[hi - 1])
+        later = hi < len(days) and days[hi] < iso_to_day(f"{year + 2}-01-01")
+        complete = ((later or days[hi - 1] >= iso_to_day(f"{year}-10-01"))
+                    and (not flow or days[lo] < iso_to_day(f"{year}-04-01")))
+        return value, bool(complete)
+
+    def metric_companies(self, metric_code: int) -> np.ndarray:
+        return np.unique(self.keys[(self.keys & METRIC_MASK) == metric_code] >> METRIC_BITS)
+
+    def latest_complete_year(self, metric_code: int) -> Optional[int]:
+        latest = None
+        for company_code in self.metric_companies(metric_code):
+            days, _ = self.series(int(company_code), metric_code)
+            for year in range(int(day_to_iso(days[-1])[:4]), int(day_to_iso(days[0])[:4]) - 1, -1):
+                if latest is not None and year <= latest:
+                    break
+                figure = self.annual(int(company_code), metric_code, year)
+                if figure and figure[1]:
+                    latest = year
+                    break
+        return latest
+
+    def rank(self, metric_code: int, limit: int = 10, industry: Optional[str] = None, as_of: Optional[int] = None, ascending: bool = False) -> List[Dict[str, Any]]:
+        # Ranks every company on the same calendar year, like the planner's rollup ranking: the
+        # year of as_of, or else the latest year any company has complete, with full years first
+        year = int(day_to_iso(as_of)[:4]) if as_of is not None else self.latest_complete_year(metric_code)
+        if year is None:
+            return []
+        rows = []
+        for company_code in self.metric_companies(metric_code):
+            company_code = int(company_code)
+            if industry and (self.industries.get(company_code) or "").lower() != industry.lower():
+                continue
+            figure = self.annual(company_code, metric_code, year)
+            if figure is None:
+                continue
+            value, complete = figure
+            previous = self.annual(company_code, metric_code, year - 1)
+            comparable = complete and previous and previous[1] and previous[0] != 0
+            rows.append({
+                "Company": self.companies[company_code],
+                "Metric": self.metrics[metric_code],
+                "Year": year,
+                "FullYear": complete,
+                "Value": round(value, 4),
+                "YoYGrowth": round((value - previous[0]) / abs(previous[0]), 4) if comparable else None,
+                "Industry": self.industries.get(company_code)
+            })
+        rows.sort(key=lambda row: (not row["FullYear"], row["Value"] if ascending else -row["Value"]))
+        return [{"Rank": position + 1, **row} for position, row in enumerate(rows[:limit])]
+
+    def compare(self, company_codes: List[int], metric_codes: List[int], as_of: Optional[int] = None) -> List[Dict[str, Any]]:
+        rows = []
+        for metric_code in metric_codes:
+            companies, days, values = self.latest(metric_code, as_of, company_codes)
+            for company, day, value in zip(companies, days, values):
+                previous = self.value_a_year_before(int(company), metric_code, int(day))
+                rows.append({
+                    "Company": self.companies[company],
+                    "Metric": self.metrics[metric_code],
+                    "Date": day_to_iso(day),
+                    "Value": round(float(value), 4),
+                    "YoYGrowth": round(float(value) / previous - 1, 4) if previous else None
+                })
+        return rows
+
+    def collect_series(self, company_codes: List[int], metric_code: int, start: Optional[int] = None, end: Optional[int] = None) -> List[Series]:
+        collected = []
+        for company_code in company_codes:
+            days, values = self.series(company_code, metric_code)
+            in_range = np.ones(len(days), dtype=bool)
+            if start is not None:
+                in_range &= days >= start
+            if end is not None:
+                in_range &= days <= end
+            if in_range.any():
+                collected.append((self.companies[company_code], self.metrics[metric_code], days[in_range], values[in_range]))
+        return collected
+
+    def serve(self, intent: Dict[str, Any], entities: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        # Returns rows for intents that can be answered from the columnar store, None otherwise
+        with self.lock:
+            if not len(self):
+                return None
+            company_codes = [self.resolve_company(name) for name in entities.get("companies", [])]
+            metric_codes = list(dict.fromkeys(self.resolve_metric(name) for name in entities.get("metrics", [])))
+            if None in company_codes or None in metric_codes or not metric_codes:
+                return None
+            start = parse_year_bound(entities.get("startDate"), "01-01")
+            end = parse_year_bound(entities.get("endDate"), "12-31")
+            start_day = iso_to_day(start) if start else None
+            end_day = iso_to_day(end) if end else None
+            action = intent.get("action")
+
+            if action == "rank" and len(metric_codes) == 1:
+                limit = int(entities["limit"][0]) if entities.get("limit") else 5
+                return self.rank(metric_codes[0], limit, entities.get("industry"), end_day)
+            if action == "compare" and (len(company_codes) > 1 or entities.get("industry")):
+                if not company_codes:
+                    company_codes = [code for code, name in self.industries.items() if name and name.lower() == entities["industry"].lower()]
+                return self.compare(company_codes, metric_codes, end_day)
+            if action in ("trend", "predict") and company_codes:
+                series = [item for metric_code in metric_codes for item in self.collect_series(company_codes, metric_code, start_day, end_day)]
+                return summarize_series(series, horizon=self.forecast_horizon if action == "predict" else 0)
+            if action == "display" and company_codes:
+                return self.compare(company_codes, metric_codes, end_day)
+            return None
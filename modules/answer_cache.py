@@ -0,0 +1,163 @@
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from datetime import datetime
+import re
+import time
+import json
+import hashlib
+import logging
+import threading
+from modules.analytics_engine import parse_year_bound
+from modules.comparison_planner import canonical_metric
+from modules.metrics import pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def date_terms(texts: List[str]) -> List[str]:
+    # "the last quarter" and "Last  Quarter" are the same term; "Q1 2023" and "Q3 2023" are not,
+    # although both resolve to the same year bound
+    terms = {re.sub(r"^the ", "", " ".join(text.lower().split())) for text in texts or []}
+    return sorted(term for term in terms if term)
+
+
+def canonical_question(entities: Dict[str, Any], intent: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # Two phrasings of the same question resolve to the same entities, intent and dates
+    companies = sorted({name.strip().lower() for name in entities.get("companies", [])})
+    metrics = sorted({canonical_metric(name).lower() for name in entities.get("metrics", [])})
+    industry = (entities.get("industry") or "").strip().lower()
+    action = intent.get("action")
+    if not (companies or metrics or industry) or not action or action == "unknown":
+        # Vague questions usually lean on the conversation so far and are not safe to share
+        return None
+    return {
+        "action": action,
+        "timeframe": intent.get("timeframe"),
+        "companies": companies,
+        "metrics": metrics,
+        "industry": industry,
+        "start": parse_year_bound(entities.get("startDate"), "01-01"),
+        "end": parse_year_bound(entities.get("endDate"), "12-31"),
+        "startTerms": date_terms(entities.get("startDate")),
+        "endTerms": date_terms(entities.get("endDate")),
+        "limit": int(entities["limit"][0]) if entities.get("limit") else None
+    }
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisBackend:
+    # Any Redis-compatible server (Redis, Valkey, KeyDB, ...) shared by all workers; it should run
+    # with an LRU maxmemory policy, the TTL is set per key
+    def __init__(self, url: str, prefix: str = "finwise:answer:"):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+class AnswerCache:
+    # Whole answers keyed by the canonical question, the graph data version and the answering
+    # model, so new data or a different model never serves an old answer
+    def __init__(self, db_manager, ttl: float = 600.0, max_entries: int = 1000, redis_url: str = "", version_interval: float = 30.0):
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.version_interval = version_interval
+        self.lock = threading.Lock()
+        self.version = None
+        self.version_checked = 0.0
+        self.backend = MemoryBackend(max_entries)
+        if redis_url:
+            try:
+                self.backend = RedisBackend(redis_url)
+            except Exception as e:
+                logger.error(f"Redis answer cache unavailable, using the in-process cache: {e}")
+
+    def data_version(self) -> Optional[str]:
+        # Reading the version is a graph query, so it is only rechecked every version_interval seconds
+        with self.lock:
+            if self.version is not None and time.monotonic() - self.version_checked < self.version_interval:
+                return self.version
+        version = self.db_manager.get_data_version()
+        with self.lock:
+            self.version = version
+            self.version_checked = time.monotonic()
+        return version
+
+    def invalidate(self):
+        # After a local ingest; other workers pick the new version up within version_interval
+        with self.lock:
+            self.version = None
+
+    def key(self, entities: Dict[str, Any], intent: Dict[str, Any], model_name: str) -> Optional[str]:
+        question = canonical_question(entities, intent)
+        if question is None or self.ttl <= 0:
+            return None
+        version = self.data_version()
+        if version is None:
+            return None
+        payload = json.dumps({"question": question, "version": version, "model": model_name}, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Answer cache lookup failed: {e}")
+            value = None
+        pipeline_metrics.record_cache("answer_cache", value is not None)
+        return json.loads(value) if value is not None else None
+
+    def put(self, key: Optional[str], result: Dict[str, Any]):
+        if key is None:
+            return
+        entry = {
+            "answer": result["answer"],
+            "data": result["data"],
+            "source": result["source"],
+            "cached_at": datetime.now().isoformat(timespec="seconds")
+        }
+        try:
+            self.backend.set(key, json.dumps(entry, default=str), self.ttl)
+        except Exception as e:
+            logger.error(f"Answer cache store failed: {e}")
@@ -0,0 +1,270 @@
+from typing import Dict, Any, List, Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import io
+import json
+import math
+import numbers
+import asyncio
+import logging
+import pandas as pd
+
+from modules.config import API_WORKER_THREADS
+from modules.service import FinWiseService, ConversationRegistry, create_service
+from modules.metrics import pipeline_metrics
+from modules.llm_scheduler import llm_scheduler
+from modules.model_router import model_router
+
+logger = logging.getLogger(__name__)
+
+# A plain ASGI application so it runs under any ASGI server without a web framework:
+#   uvicorn modules.api:app --workers 4
+# The pipeline itself is blocking (Neo4j, spaCy, the LLM client), so each request runs on a
+# bounded thread pool and the event loop stays free to accept and stream other requests.
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class FinWiseAPI:
+    def __init__(self, service_factory: Callable[[], FinWiseService] = create_service, worker_threads: int = API_WORKER_THREADS):
+        self.service_factory = service_factory
+        self.executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="finwise-api")
+        self.service = None
+        self.service_lock = asyncio.Lock()
+        self.conversations = ConversationRegistry()
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.metrics,
+            ("POST", "/ask"): self.ask,
+            ("POST", "/ask/stream"): self.ask_stream,
+            ("POST", "/ingest"): self.ingest
+        }
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        handler = self.routes.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        response_started = False
+
+        async def tracked_send(message: Dict[str, Any]):
+            nonlocal response_started
+            response_started = response_started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            if handler is None:
+                raise HTTPError(404, f"No route for {scope['method']} {scope['path']}")
+            await self.ensure_service()
+            await handler(scope, receive, tracked_send)
+        except Exception as e:
+            if response_started:
+                # Too late for an error response; the server aborts the connection instead
+                logger.error(f"API request {scope['method']} {scope['path']} failed after the response started: {e}")
+                raise
+            if isinstance(e, HTTPError):
+                await send_json(send, e.status, {"error": e.message})
+            else:
+                logger.error(f"API request {scope['method']} {scope['path']} failed: {e}")
+                await send_json(send, 500, {"error": "Internal server error"})
+
+    async def lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.ensure_service()
+                    await send({"type": "lifespan.startup.complete"})
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def ensure_service(self):
+        if self.service is not None:
+            return
+        # Concurrent first requests wait for one service instead of each building their own
+        async with self.service_lock:
+            if self.service is None:
+                # Loading spaCy and connecting to Neo4j block, so they happen off the event loop
+                self.service = await self.run(self.service_factory)
+
+    def conversation(self, body: Dict[str, Any]):
+        conversation_id = body.get("conversation_id")
+        if conversation_id is not None and not isinstance(conversation_id, str):
+            raise HTTPError(400, "'conversation_id' must be a string")
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            raise HTTPError(404, "Unknown conversation_id; omit it to start a new conversation")
+        return conversation
+
+    async def run(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def health(self, scope, receive, send):
+        await send_json(send, 200, {"status": "ok", "conversations": len(self.conversations.conversations), "llm": llm_scheduler.snapshot(),
+                                    "models": model_router.snapshot()})
+
+    async def metrics(self, scope, receive, send):
+        await send_response(send, 200, pipeline_metrics.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+
+    async def ask(self, scope, receive, send):
+        body = await read_json(receive)
+        question = require_question(body)
+        conversation = self.conversation(body)
+        async with self.conversations.lock_for(conversation.id):
+            conversation.add_message("user", question)
+            # Stages run concurrently on the service's own pool; the event loop only coordinates them
+            result = await self.service.ask_async(question, conversation.context)
+            conversation.add_message("assistant", result["answer"])
+        await send_json(send, 200, {
+            "conversation_id": conversation.id,
+            "answer": result["answer"],
+            "source": result["source"],
+            "degraded": result["degraded"],
+            "cached_at": result["cached_at"],
+            "intent": result["intent"],
+            "entities": result["entities"],
+            "data": result["data"]
+        })
+
+    async def ask_stream(self, scope, receive, send):
+        body = await read_json(receive)
+        question = require_question(body)
+        conversation = self.conversation(body)
+        async with self.conversations.lock_for(conversation.id):
+            conversation.add_message("user", question)
+            parts = self.service.stream(question, conversation.context)
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")]})
+            await send_event(send, "conversation", {"conversation_id": conversation.id})
+            answer = []
+            try:
+                while True:
+                    part = await self.run(next, parts, None)
+                    if part is None:
+                        break
+                    answer.append(part)
+                    await send_event(send, "delta", {"text": part})
+            except Exception as e:
+                # The status line has gone out, so the failure is reported in the stream itself
+                logger.error(f"Streaming answer for conversation {conversation.id} failed: {e}")
+                await send_event(send, "error", {"error": "Internal server error"})
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            finally:
+                # Lets an unfinished answer give up its in-flight slot; a no-op once it is exhausted
+                await self.run(parts.close)
+            conversation.add_message("assistant", "".join(answer))
+            await send_event(send, "done", {"conversation_id": conversation.id})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def ingest(self, scope, receive, send):
+        body = await read_json(receive)
+        records, skipped, unknown_metrics = [], 0, 0
+        if isinstance(body.get("records"), list):
+            records = body["records"]
+        elif isinstance(body.get("csv"), str):
+            try:
+                table = pd.read_csv(io.StringIO(body["csv"]))
+            except Exception as e:
+                raise HTTPError(400, f"The CSV could not be parsed: {e}")
+            result = await self.run(self.service.recognize_table, table)
+            if result is None:
+                raise HTTPError(422, "The CSV does not match a known company/metric/date/value layout")
+            records, skipped, unknown_metrics = result.records, result.skipped_rows, result.unknown_metric_rows
+        else:
+            raise HTTPError(400, "Send either a 'records' list or a 'csv' string")
+        units = await self.run(self.service.db_manager.get_metric_units)
+        problems = validate_records(records, units)
+        if problems:
+            raise HTTPError(400, f"{len(problems)} invalid records: " + "; ".join(problems[:10]))
+        try:
+            added = await self.run(self.service.ingest, records)
+        except Exception as e:
+            logger.error(f"Ingest of {len(records)} records failed: {e}")
+            raise HTTPError(503, "The records could not be stored; nothing was reported as added, please retry")
+        await send_json(send, 200, {"added": added, "skipped_rows": skipped, "unknown_metric_rows": unknown_metrics})
+
+
+def validate_records(records: List[Any], units: Dict[str, str]) -> List[str]:
+    # Checked before anything is written: one bad record rejects the whole request
+    problems = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            problems.append(f"record {index} is not an object")
+            continue
+        for key in ("company", "metric"):
+            if not isinstance(record.get(key), str) or not record[key].strip():
+                problems.append(f"record {index} needs a non-empty '{key}'")
+        value = record.get("value")
+        if isinstance(value, bool) or not isinstance(value, numbers.Real) or not math.isfinite(value):
+            problems.append(f"record {index} needs a numeric 'value'")
+        if record.get("date") is not None:
+            try:
+                date.fromisoformat(str(record["date"])[:10])
+            except ValueError:
+                problems.append(f"record {index} has a date that is not YYYY-MM-DD")
+        unit = record.get("unit")
+        if unit is not None and not isinstance(unit, str):
+            problems.append(f"record {index} has a 'unit' that is not a string")
+        elif unit and units.get(record.get("metric")) not in (None, unit):
+            # A metric keeps the unit it was first stored in, so other units would mix scales
+            problems.append(f"record {index} gives {record['metric']} in {unit}, but it is stored in {units[record['metric']]}")
+    return problems
+
+
+async def read_json(receive: Callable) -> Dict[str, Any]:
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    try:
+        body = json.loads(b"".join(chunks) or b"{}")
+    except json.JSONDecodeError:
+        raise HTTPError(400, "Request body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return body
+
+
+def require_question(body: Dict[str, Any]) -> str:
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise HTTPError(400, "'question' is required")
+    return question.strip()
+
+
+async def send_response(send: Callable, status: int, body: bytes, content_type: str):
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", content_type.encode("latin-1")), (b"content-length", str(len(body)).encode("latin-1"))]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send: Callable, status: int, payload: Any):
+    await send_response(send, status, json.dumps(payload, default=str).encode("utf-8"), "application/json")
+
+
+async def send_event(send: Callable, event: str, payload: Dict[str, Any]):
+    message = f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+    await send({"type": "http.response.body", "body": message.encode("utf-8"), "more_body": True})
+
+
+app = FinWiseAPI()
@@ -0,0 +1,109 @@
+from typing import Any, Optional
+from datetime import datetime
+import os
+import json
+import gzip
+import queue
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def truncate(value: Any, max_chars: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}... [{len(value) - max_chars} chars truncated]"
+    if isinstance(value, dict):
+        return {str(key): truncate(item, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [truncate(item, max_chars) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return truncate(str(value), max_chars)
+
+
+class AuditLog:
+    # Sampling happens before anything is copied; a sampled event's fields are snapshotted
+    # (and truncated) when it is recorded, since callers go on mutating the lists and dicts
+    # they pass in, and only JSON serialization happens on the writer thread
+    def __init__(self):
+        self.path = None
+        self.sample_rate = 0.0
+        self.max_field_chars = 4000
+        self.max_file_bytes = 20 * 1024 * 1024
+        self.backup_count = 5
+        self.queue = None
+        self.thread = None
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None and self.sample_rate > 0
+
+    def configure(self, path: Optional[str], sample_rate: float = 1.0, max_field_chars: int = 4000,
+                  max_file_bytes: int = 20 * 1024 * 1024, backup_count: int = 5, queue_size: int = 1000):
+        with self.lock:
+            self.path = path or None
+            self.sample_rate = sample_rate
+            self.max_field_chars = max_field_chars
+            self.max_file_bytes = max_file_bytes
+            self.backup_count = backup_count
+            if self.enabled and self.thread is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.queue = queue.Queue(maxsize=queue_size)
+                self.thread = threading.Thread(target=self._write_loop, name="finwise-audit", daemon=True)
+                self.thread.start()
+
+    def sampled(self) -> bool:
+        return self.enabled and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def record(self, kind: str, **fields):
+        if not self.sampled():
+            return
+        try:
+            self.queue.put_nowait((datetime.now().isoformat(), kind, truncate(fields, self.max_field_chars)))
+        except queue.Full:
+            # Never block a request on the audit trail
+            self.dropped += 1
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines = []
+                for timestamp, kind, fields in batch:
+                    event = {"timestamp": timestamp, "kind": kind}
+                    event.update(fields)
+                    lines.append(json.dumps(event, default=str))
+                if self.dropped:
+                    lines.append(json.dumps({"timestamp": datetime.now().isoformat(), "kind": "dropped", "count": self.dropped}))
+                    self.dropped = 0
+                # Each batch is a complete gzip member, so the file stays readable if the process dies
+                with open(self.path, "ab") as raw:
+                    with gzip.GzipFile(fileobj=raw, mode="ab") as handle:
+                        handle.write(("\n".join(lines) + "\n").encode("utf-8"))
+                    size = raw.tell()
+                if size >= self.max_file_bytes:
+                    self._rotate()
+            except Exception as e:
+                logger.error(f"Audit log write failed: {e}")
+
+
+audit_log = AuditLog()
@@ -0,0 +1,157 @@
+from typing import Dict, Any, Optional
+import os
+import re
+import json
+import mmap
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SIZE = 256 * 1024 * 1024
+SUMMARY_LENGTH = 300
+
+
+def summarize_content(content: str, max_length: int = SUMMARY_LENGTH) -> str:
+    text = re.sub(r"\s+", " ", content or "").strip()
+    if len(text) <= max_length:
+        return text
+    cut = text[:max_length]
+    sentence_end = cut.rfind(". ")
+    return cut[:sentence_end + 1] if sentence_end > max_length // 2 else cut.rsplit(" ", 1)[0] + "..."
+
+
+class BlobStore:
+    def __init__(self, root_dir: str, segment_size: int = SEGMENT_SIZE):
+        self.root_dir = root_dir
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+        self.maps = {}
+        os.makedirs(root_dir, exist_ok=True)
+        self.index_path = os.path.join(root_dir, "index.jsonl")
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    ref = json.loads(line)
+                    self.index[ref["hash"]] = ref
+        self.current_segment = max((ref["segment"] for ref in self.index.values()), default=0)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.root_dir, f"segment-{segment:06d}.dat")
+
+    def put(self, content: str) -> Dict[str, Any]:
+        data = content.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        if not data:
+            # Nothing to store, and get() serves empty refs without touching a segment
+            return {"hash": content_hash, "segment": self.current_segment, "offset": 0, "length": 0}
+        with self.lock:
+            if content_hash in self.index:
+                return self.index[content_hash]
+
+            path = self._segment_path(self.current_segment)
+            if os.path.exists(path) and os.path.getsize(path) + len(data) > self.segment_size:
+                self.current_segment += 1
+                path = self._segment_path(self.current_segment)
+
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+            ref = {"hash": content_hash, "segment": self.current_segment, "offset": offset, "length": len(data)}
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(ref) + "\n")
+            self.index[content_hash] = ref
+            return ref
+
+    def get(self, ref: Dict[str, Any], max_bytes: Optional[int] = None) -> memoryview:
+        length = ref["length"] if max_bytes is None else min(ref["length"], max_bytes)
+        if length <= 0:
+            # mmap cannot map an empty file, and an empty blob needs no segment at all
+            return memoryview(b"")
+        end = ref["offset"] + length
+        with self.lock:
+            segment_map = self.maps.get(ref["segment"])
+            # Segments only ever grow, so remap when a blob lies past the mapped region
+            if segment_map is None or len(segment_map) < end:
+                with open(self._segment_path(ref["segment"]), "rb") as f:
+                    segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.maps[ref["segment"]] = segment_map
+        return memoryview(segment_map)[ref["offset"]:end]
+
+    def read_text(self, ref: Dict[str, Any], max_bytes: Optional[int] = None) -> str:
+        return bytes(self.get(ref, max_bytes)).decode("utf-8", errors="ignore")
+
+    def close(self):
+        with self.lock:
+            for segment_map in self.maps.values():
+                try:
+                    segment_map.close()
+                except BufferError:
+                    # A caller still holds a slice of this segment
+                    pass
+            self.maps = {}
+
+
+def report_blob_properties(ref: Dict[str, Any], content: str) -> Dict[str, Any]:
+    return {
+        "contentHash": ref["hash"],
+        "contentSegment": ref["segment"],
+        "contentOffset": ref["offset"],
+        "contentLength": ref["length"],
+        "summary": summarize_content(content)
+    }
+
+
+def blob_ref_from_row(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if row.get("contentHash") is None:
+        return None
+    return {
+        "hash": row["contentHash"],
+        "segment": row["contentSegment"],
+        "offset": row["contentOffset"],
+        "length": row["contentLength"]
+    }
+
+
+def migrate_report_bodies(db_manager, blob_store: BlobStore, batch_size: int = 20) -> int:
+    select_query = """
+    MATCH (r:Report)
+    WHERE r.content IS NOT NULL AND NOT r.id IN $seen
+    RETURN r.id AS id, r.content AS content
+    LIMIT $limit
+    """
+    update_query = """
+    MATCH (r:Report {id: $id})
+    SET r += $properties
+    REMOVE r.content
+    """
+    migrated = 0
+    seen = set()
+    while True:
+        reports = db_manager.execute_query(select_query, {"limit": batch_size, "seen": list(seen)})
+        if not reports:
+            return migrated
+        for report in reports:
+            seen.add(report["id"])
+            ref = blob_store.put(report["content"])
+            db_manager.execute_query(update_query, {"id": report["id"], "properties": report_blob_properties(ref, report["content"])})
+            migrated += 1
+        logger.info(f"Moved {migrated} report bodies into the blob store")
+
+
+if __name__ == "__main__":
+    from modules.config import AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD, REPORT_BLOB_DIR
+    from modules.resources import resources
+    from modules.database_manager import DatabaseManager
+
+    logging.basicConfig(level=logging.INFO)
+    if not REPORT_BLOB_DIR:
+        raise SystemExit("Set REPORT_BLOB_DIR to the blob store directory before migrating report bodies.")
+    driver = resources.get_driver(AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD)
+    logger.info(f"Migrated {migrate_report_bodies(DatabaseManager(driver), BlobStore(REPORT_BLOB_DIR))} reports")
+    driver.close()
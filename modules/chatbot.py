@@ -1,9 +1,28 @@
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
 from modules.conversation_manager import ConversationContext
+from modules.metrics import pipeline_metrics
+from modules.audit_log import audit_log
+from modules.llm_scheduler import llm_scheduler, Overloaded, OVERLOADED_MESSAGE
+from modules.model_router import ModelRoute, model_router
+from modules.prompt_context import TokenCounter, ContextBuilder
+from modules.config import PROMPT_TOKEN_BUDGET, PROMPT_TOKENIZER_FILE, PROMPT_TURN_TOKENS
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Keeps every prompt inside PROMPT_TOKEN_BUDGET however large the result or the conversation gets
+context_builder = ContextBuilder(TokenCounter(PROMPT_TOKENIZER_FILE), PROMPT_TOKEN_BUDGET, PROMPT_TURN_TOKENS)
+
+ERROR_MESSAGE = "I apologize, but I encountered an error while processing your request. Please try again."
+INTERRUPTED_MESSAGE = "\n\n(The rest of this answer was interrupted. Please ask again.)"
+
+
+class FailedAnswer(str):
+    # Text shown in place of (part of) an answer when the model could not produce it; callers
+    # show it but must not cache it, share it with coalesced requests or keep it as an insight
+    pass
+
 def generate_system_message() -> str:
     return """You are FinWise, an advanced financial assistant with access to a comprehensive knowledge graph containing detailed company metrics and reports. Your primary role is to provide accurate, concise, and insightful financial information. Follow these guidelines:
 
@@ -13,8 +32,8 @@ def generate_system_message() -> str:
 4. If specific data is not available in the knowledge graph, clearly state that and provide general financial insights based on your knowledge.
 5. Use the Indian numeric system and Indian Rupee (INR) for all financial values.
 6. Clearly state the basis of any comparisons made between companies or metrics.
-7. For trend analysis, offer brief explanations of the factors influencing observed trends without excessive detail.
-8. Clearly state that future predictions are estimates based on current data and trends.
+7. For trend analysis, offer brief explanations of the factors influencing observed trends without excessive detail. Trend data arrives as precomputed statistics (changes and CAGR in percent, moving averages, seasonality); use these figures rather than recomputing them.
+8. Clearly state that future predictions are estimates based on current data and trends, and name the forecast method provided with the data.
 9. When referencing reports, summarize key points and encourage users to review the full report for detailed insights.
 
 You have access to the following structures in the database:
@@ -22,6 +41,7 @@ You have access to the following structures in the database:
 - **Metric**: Financial metrics including Revenue, Net Profit, EBITDA, EPS, Debt to Equity, and Employee Count, each with a unique name, description, and unit.
 - **MetricValue**: Values for metrics associated with specific companies over time.
 - **Report**: Documents containing financial reports, identified by a unique ID, type (e.g., Annual, Quarterly), date, and content.
+- **ReportChunk**: Passages of a report; the most relevant excerpts are included in the knowledge graph data when a question concerns reports.
 
 Example response format:
 - For a query about company revenue, respond with the company name and revenue figure, without technical details or any additional explanatory notes.
@@ -32,16 +52,7 @@ Example:
 This structure ensures that user interactions are friendly and informative, focusing on delivering valuable insights efficiently while clearly indicating when data is not available."""
 
 def prepare_messages(system_message: str, user_input: str, context: ConversationContext) -> List[Dict[str, str]]:
-    context_summary = context.get_context_summary()
-    
-    context_string = f"""
-    Current Entities: {context_summary['current_entities']}
-    Current Intent: {context_summary['current_intent']}
-    Knowledge Graph Data: {context_summary['kg_data']}
-    
-    Recent Conversation History:
-    {' '.join([f"User: {item['user_input']}\nAI: {item['ai_response']}" for item in context_summary['recent_history']])}
-    """
+    context_string = context_builder.build(system_message, user_input, context.get_context_summary())
     
     messages = [
         {"role": "system", "content": system_message},
@@ -49,23 +60,94 @@ def prepare_messages(system_message: str, user_input: str, context: Conversation
     ]
     return messages
 
-def chatbot_with_context(user_input: str, context: ConversationContext, client, model_name: str) -> str:
+def create_completion(client, model_name: str, stage: str, messages: List[Dict[str, str]], **params):
+    # Tries the stage's model routes in order and returns the completion with the route that produced it
+    last_error = None
+    for route in model_router.candidates(stage, client, model_name):
+        started = time.monotonic()
+        try:
+            with llm_scheduler.slot(route.endpoint, stage):
+                started = time.monotonic()
+                completion = route.client.chat.completions.create(model=route.model, messages=messages, **params)
+        except Overloaded as e:
+            last_error = e
+            continue
+        except Exception as e:
+            model_router.record(route, stage, time.monotonic() - started, ok=False)
+            logger.warning(f"Model route {route.name} failed for {stage}: {e}")
+            last_error = e
+            continue
+        model_router.record(route, stage, time.monotonic() - started, ok=True, usage=getattr(completion, "usage", None))
+        return completion, route
+    raise last_error
+
+def stream_completion(client, model_name: str, stage: str, messages: List[Dict[str, str]], **params) -> Iterator[Tuple[ModelRoute, str]]:
+    # Falls back to the next route only while nothing has been streamed yet
+    last_error = None
+    for route in model_router.candidates(stage, client, model_name):
+        streamed = False
+        started = time.monotonic()
+        try:
+            # The slot is held until the stream ends, since the node is busy for all of it
+            with llm_scheduler.slot(route.endpoint, stage):
+                started = time.monotonic()
+                stream = route.client.chat.completions.create(model=route.model, messages=messages, stream=True, **params)
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        streamed = True
+                        yield route, delta
+        except Overloaded as e:
+            last_error = e
+            continue
+        except Exception as e:
+            model_router.record(route, stage, time.monotonic() - started, ok=False)
+            if streamed:
+                raise
+            logger.warning(f"Model route {route.name} failed for {stage}: {e}")
+            last_error = e
+            continue
+        model_router.record(route, stage, time.monotonic() - started, ok=True)
+        return
+    raise last_error
+
+def chatbot_with_context(user_input: str, context: ConversationContext, client, model_name: str, stage: str = "answer") -> str:
     system_message = generate_system_message()
     messages = prepare_messages(system_message, user_input, context)
     
     try:
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=300
-        )
-        return completion.choices[0].message.content
+        completion, route = create_completion(client, model_name, stage, messages, temperature=0.7, max_tokens=300)
+        pipeline_metrics.record_tokens(stage, getattr(completion, "usage", None))
+        response = completion.choices[0].message.content
+        audit_log.record("llm", stage=stage, model=route.model, messages=messages, response=response)
+        return response
+    except Overloaded:
+        return FailedAnswer(OVERLOADED_MESSAGE)
     except Exception as e:
         logger.error(f"Error in LLM request: {e}")
-        return "I apologize, but I encountered an error while processing your request. Please try again."
+        pipeline_metrics.record_error(stage)
+        return FailedAnswer(ERROR_MESSAGE)
+
+def chatbot_stream_with_context(user_input: str, context: ConversationContext, client, model_name: str, stage: str = "answer") -> Iterator[str]:
+    system_message = generate_system_message()
+    messages = prepare_messages(system_message, user_input, context)
+    parts = []
+    model = model_name
+
+    try:
+        for route, delta in stream_completion(client, model_name, stage, messages, temperature=0.7, max_tokens=300):
+            model = route.model
+            parts.append(delta)
+            yield delta
+    except Overloaded:
+        yield FailedAnswer(OVERLOADED_MESSAGE)
+    except Exception as e:
+        logger.error(f"Error in streaming LLM request: {e}")
+        pipeline_metrics.record_error(stage)
+        yield FailedAnswer(INTERRUPTED_MESSAGE if parts else ERROR_MESSAGE)
+    audit_log.record("llm", stage=stage, model=model, messages=messages, response="".join(parts))
 
-def chatbot_no_context(user_input: str, client, model_name: str) -> str:
+def chatbot_no_context(user_input: str, client, model_name: str, stage: str = "llm") -> str:
     system_message = "Accurately help with the query, be precise and return only whats asked, no extra words."
     messages = [
         {"role": "system", "content": system_message},
@@ -73,13 +155,15 @@ def chatbot_no_context(user_input: str, client, model_name: str) -> str:
     ]
     
     try:
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=300
-        )
-        return completion.choices[0].message.content
+        completion, route = create_completion(client, model_name, stage, messages, temperature=0.7, max_tokens=300)
+        pipeline_metrics.record_tokens(stage, getattr(completion, "usage", None))
+        response = completion.choices[0].message.content
+        audit_log.record("llm", stage=stage, model=route.model, messages=messages, response=response)
+        return response
+    except Overloaded:
+        # Callers use this output as data (a query, a verdict), so they decide how to report it
+        raise
     except Exception as e:
         logger.error(f"Error in LLM request: {e}")
-        return "I apologize, but I encountered an error while processing your request. Please try again."
+        pipeline_metrics.record_error(stage)
+        return FailedAnswer(ERROR_MESSAGE)
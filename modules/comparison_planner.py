@@ -0,0 +1,119 @@
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from modules.tabular_recognizer import METRIC_ALIASES, normalize_label
+from modules.analytics_engine import parse_year_bound
+
+logger = logging.getLogger(__name__)
+
+MAX_SUB_QUERIES = 64
+
+# Both lookups stay on the metric_value_series index: one company, one metric, bounded by date.
+# The prior-year value is optional, so a company without one still gets its row.
+COMPANY_METRIC_QUERY = """
+CALL {
+    MATCH (mv:MetricValue)
+    WHERE mv.companyName = $company AND mv.metricName = $metric AND mv.date <= date($asOf)
+    RETURN mv ORDER BY mv.date DESC LIMIT 1
+}
+OPTIONAL MATCH (previous:MetricValue)
+WHERE previous.companyName = $company AND previous.metricName = $metric
+  AND previous.date <= mv.date - duration({months: 11}) AND previous.date >= mv.date - duration({months: 13})
+WITH mv, previous ORDER BY previous.date DESC
+WITH mv, collect(previous)[0] AS previous
+RETURN mv.value AS value, toString(mv.date) AS date, previous.value AS previousValue
+"""
+
+# One ranking per metric from the yearly rollups, on each metric's annual value (total or
+# closing); the latest complete year when none was asked for, with full years ranked first
+METRIC_RANK_QUERY = """
+MATCH (latest:AnnualMetric {metricName: $metric})
+WHERE ($year IS NULL AND latest.complete) OR latest.year = $year
+WITH coalesce($year, max(latest.year)) AS year
+MATCH (a:AnnualMetric {metricName: $metric, year: year})
+WHERE $industry IS NULL OR a.industry = $industry
+RETURN a.companyName AS company, a.year AS year, a.value AS value, coalesce(a.complete, false) AS complete,
+       a.yoyGrowth AS yoyGrowth, a.industry AS industry
+ORDER BY complete DESC, a.value DESC
+LIMIT $limit
+"""
+
+INDUSTRY_COMPANIES_QUERY = "MATCH (c:Company {industry: $industry}) RETURN c.name AS company ORDER BY company"
+
+
+def canonical_metric(name: str) -> str:
+    label = normalize_label(name)
+    return METRIC_ALIASES.get(label, name.strip())
+
+
+class ComparisonPlanner:
+    # Splits compare and rank questions into small indexed lookups, one per company and metric
+    # (or one per metric for rankings), runs them concurrently and merges them into one table.
+    # Each lookup opens its own session, so they spread over the driver's connection pool; the
+    # pool passed in bounds how many run at once and must not be the one running the stage itself.
+    def __init__(self, db_manager, pool: ThreadPoolExecutor):
+        self.db_manager = db_manager
+        self.pool = pool
+
+    def plan(self, intent: Dict[str, Any], entities: Dict[str, Any]) -> Optional[List[Tuple[str, str, Dict[str, Any]]]]:
+        action = intent.get("action")
+        metrics = list(dict.fromkeys(canonical_metric(name) for name in entities.get("metrics", [])))
+        if not metrics:
+            return None
+        end = parse_year_bound(entities.get("endDate"), "12-31") or parse_year_bound(entities.get("startDate"), "12-31")
+
+        if action == "rank":
+            limit = int(entities["limit"][0]) if entities.get("limit") else 5
+            return [("rank", metric, {"metric": metric, "year": int(end[:4]) if end else None,
+                                      "industry": entities.get("industry"), "limit": limit}) for metric in metrics]
+
+        if action == "compare" or (action == "display" and len(entities.get("companies", [])) > 1):
+            companies = list(dict.fromkeys(entities.get("companies", [])))
+            if not companies and entities.get("industry"):
+                companies = [row["company"] for row in self.db_manager.execute_query(INDUSTRY_COMPANIES_QUERY, {"industry": entities["industry"]})]
+            if not companies or len(companies) * len(metrics) > MAX_SUB_QUERIES:
+                return None
+            as_of = end or "9999-12-31"
+            return [("compare", metric, {"company": company, "metric": metric, "asOf": as_of})
+                    for metric in metrics for company in companies]
+        return None
+
+    def _run(self, sub_query: Tuple[str, str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        kind, _, params = sub_query
+        query = METRIC_RANK_QUERY if kind == "rank" else COMPANY_METRIC_QUERY
+        return self.db_manager.execute_query(query, params)
+
+    def execute(self, intent: Dict[str, Any], entities: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        sub_queries = self.plan(intent, entities)
+        if not sub_queries:
+            return None
+        results = list(self.pool.map(self._run, sub_queries))
+        logger.info(f"Comparison planner ran {len(sub_queries)} sub-queries for a '{intent.get('action')}' question")
+
+        table = []
+        for (kind, metric, params), rows in zip(sub_queries, results):
+            if kind == "rank":
+                table.extend({
+                    "Rank": position + 1,
+                    "Company": row["company"],
+                    "Metric": metric,
+                    "Year": row["year"],
+                    "FullYear": row["complete"],
+                    "Value": row["value"],
+                    "YoYGrowth": round(row["yoyGrowth"], 4) if row["yoyGrowth"] is not None else None,
+                    "Industry": row["industry"]
+                } for position, row in enumerate(rows))
+            else:
+                for row in rows:
+                    previous = row["previousValue"]
+                    table.append({
+                        "Company": params["company"],
+                        "Metric": metric,
+                        "Date": row["date"],
+                        "Value": row["value"],
+                        "YoYGrowth": round(row["value"] / previous - 1, 4) if previous else None
+                    })
+        if sub_queries[0][0] == "compare":
+            table.sort(key=lambda row: (row["Metric"], -(row["Value"] or 0)))
+        # An empty table means the names did not match the graph; let the general path try instead
+        return table or None
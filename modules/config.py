@@ -0,0 +1,65 @@
+import os
+
+# Settings shared by the Streamlit app, the HTTP API and the command line tools
+AURA_CONNECTION_URI = os.environ.get("AURA_CONNECTION_URI", "neo4j+s://2df8ccfd.databases.neo4j.io:7687")
+AURA_USERNAME = os.environ.get("AURA_USERNAME", "neo4j")
+AURA_PASSWORD = os.environ.get("AURA_PASSWORD", "m0bp___En5qsHdQyjxKEuxCx-lMEZBgmgNESxLjZIHw")
+GAIA_NODE_URL = os.environ.get("GAIA_NODE_URL", "https://llama.us.gaianet.network/v1")
+GAIA_NODE_NAME = os.environ.get("GAIA_NODE_NAME", "llama")
+GAIA_NODE_API_KEY = os.environ.get("GAIA_NODE_API_KEY", "API_KEY")
+REPORT_EXCERPT_LIMIT = int(os.environ.get("REPORT_EXCERPT_LIMIT", "5"))
+EMBEDDING_INDEX_DIR = os.environ.get("EMBEDDING_INDEX_DIR", ".finwise/embeddings")
+EMBEDDING_SYNC_SECONDS = float(os.environ.get("EMBEDDING_SYNC_SECONDS", "60"))
+REPORT_BLOB_DIR = os.environ.get("REPORT_BLOB_DIR", "")
+FORECAST_HORIZON = int(os.environ.get("FORECAST_HORIZON", "4"))
+ANALYTICS_REFRESH_SECONDS = float(os.environ.get("ANALYTICS_REFRESH_SECONDS", "60"))
+ANALYTICS_FULL_REFRESH_SECONDS = float(os.environ.get("ANALYTICS_FULL_REFRESH_SECONDS", "900"))
+COMPACT_SERIES = os.environ.get("COMPACT_SERIES", "false").lower() in ("1", "true", "yes")
+REPORT_TEXT_CHARS = int(os.environ.get("REPORT_TEXT_CHARS", "4000"))
+QUERY_MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", "1000"))
+QUERY_SCAN_ROW_LIMIT = int(os.environ.get("QUERY_SCAN_ROW_LIMIT", "10000"))
+QUERY_MAX_ESTIMATED_ROWS = int(os.environ.get("QUERY_MAX_ESTIMATED_ROWS", "1000000"))
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", "15"))
+QUERY_PROFILE_SAMPLE_RATE = float(os.environ.get("QUERY_PROFILE_SAMPLE_RATE", "0"))
+QUERY_PROFILE_STORE = os.environ.get("QUERY_PROFILE_STORE", ".finwise/query_profiles.json")
+METRICS_JSONL_PATH = os.environ.get("METRICS_JSONL_PATH", "")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_PANEL = os.environ.get("METRICS_PANEL", "false").lower() in ("1", "true", "yes")
+AUDIT_LOG_PATH = os.environ.get("AUDIT_LOG_PATH", "")
+AUDIT_SAMPLE_RATE = float(os.environ.get("AUDIT_SAMPLE_RATE", "1.0"))
+AUDIT_MAX_FIELD_CHARS = int(os.environ.get("AUDIT_MAX_FIELD_CHARS", "4000"))
+AUDIT_MAX_FILE_MB = int(os.environ.get("AUDIT_MAX_FILE_MB", "20"))
+AUDIT_BACKUP_COUNT = int(os.environ.get("AUDIT_BACKUP_COUNT", "5"))
+INSIGHT_REFRESH_SECONDS = float(os.environ.get("INSIGHT_REFRESH_SECONDS", "900"))
+FULL_REPORT_PHRASES = ("full report", "full text", "report text", "entire report", "whole report")
+API_WORKER_THREADS = int(os.environ.get("API_WORKER_THREADS", "32"))
+API_MAX_CONVERSATIONS = int(os.environ.get("API_MAX_CONVERSATIONS", "10000"))
+PIPELINE_DEADLINE_SECONDS = float(os.environ.get("PIPELINE_DEADLINE_SECONDS", "45"))
+PIPELINE_STAGE_THREADS = int(os.environ.get("PIPELINE_STAGE_THREADS", "32"))
+ANALYTICS_STAGE_TIMEOUT = float(os.environ.get("ANALYTICS_STAGE_TIMEOUT", "5"))
+REPORT_STAGE_TIMEOUT = float(os.environ.get("REPORT_STAGE_TIMEOUT", "8"))
+PLANNER_STAGE_TIMEOUT = float(os.environ.get("PLANNER_STAGE_TIMEOUT", "10"))
+PLANNER_MAX_CONCURRENCY = int(os.environ.get("PLANNER_MAX_CONCURRENCY", "8"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_REDIS_URL = os.environ.get("ANSWER_CACHE_REDIS_URL", "")
+ANSWER_CACHE_VERSION_SECONDS = float(os.environ.get("ANSWER_CACHE_VERSION_SECONDS", "30"))
+COALESCE_TIMEOUT_SECONDS = float(os.environ.get("COALESCE_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_BURST = float(os.environ.get("LLM_BURST", "5"))
+LLM_INTERACTIVE_RESERVED = int(os.environ.get("LLM_INTERACTIVE_RESERVED", "1"))
+LLM_MAX_WAIT_INTERACTIVE = float(os.environ.get("LLM_MAX_WAIT_INTERACTIVE", "20"))
+LLM_MAX_WAIT_BACKGROUND = float(os.environ.get("LLM_MAX_WAIT_BACKGROUND", "120"))
+LLM_MAX_WAIT_BULK = float(os.environ.get("LLM_MAX_WAIT_BULK", "300"))
+LLM_ROUTES_FILE = os.environ.get("LLM_ROUTES_FILE", "")
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "3500"))
+PROMPT_TOKENIZER_FILE = os.environ.get("PROMPT_TOKENIZER_FILE", "")
+PROMPT_TURN_TOKENS = int(os.environ.get("PROMPT_TURN_TOKENS", "200"))
+CONVERSATION_DB_PATH = os.environ.get("CONVERSATION_DB_PATH", ".finwise/conversations.db")
+# Set to share one conversation history between everyone using the app; unset, each user,
+# identity cookie or browser session keeps its own
+CONVERSATION_OWNER = os.environ.get("CONVERSATION_OWNER", "")
+# A cookie identifying the visitor, e.g. one set by an auth proxy in front of Streamlit
+CONVERSATION_OWNER_COOKIE = os.environ.get("CONVERSATION_OWNER_COOKIE", "")
+CONVERSATION_LIST_LIMIT = int(os.environ.get("CONVERSATION_LIST_LIMIT", "50"))
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from collections import deque
 from datetime import datetime
 import uuid
@@ -17,7 +17,10 @@ class ConversationContext:
         }
         self.current_intent = {}
         self.kg_data = ""
+        self.kg_rows = None
         self.last_ai_response = ""
+        # Changes not yet written to the conversation store, in order
+        self.events = []
 
     def update(
         self,
@@ -28,7 +31,8 @@ class ConversationContext:
         end_date: List[str],
         industry: str,
         intent: Dict[str, Any],
-        kg_response: str
+        kg_response: str,
+        kg_rows: Optional[List[Dict[str, Any]]] = None
     ):
         self.current_entities["companies"] = companies if companies else self.current_entities["companies"]
         self.current_entities["metrics"] = metrics if metrics else self.current_entities["metrics"]
@@ -37,6 +41,8 @@ class ConversationContext:
         self.current_entities["industry"] = industry if industry else self.current_entities["industry"]
         self.current_intent = intent
         self.kg_data = kg_response
+        # Structured rows of the latest result, for the prompt builder; history keeps only the text
+        self.kg_rows = kg_rows
 
         self.history.append({
             "user_input": user_input,
@@ -45,11 +51,13 @@ class ConversationContext:
             "kg_data": self.kg_data,
             "ai_response": self.last_ai_response
         })
+        self.events.append({"type": "turn", "entry": self.history[-1]})
 
     def update_ai_response(self, ai_response: str):
         self.last_ai_response = ai_response
         if self.history:
             self.history[-1]["ai_response"] = ai_response
+        self.events.append({"type": "ai_response", "text": ai_response})
 
     def get_context_summary(self) -> Dict[str, Any]:
         return {
@@ -57,6 +65,7 @@ class ConversationContext:
             "current_intent": self.current_intent,
             "recent_history": list(self.history),
             "kg_data": self.kg_data,
+            "kg_rows": self.kg_rows,
             "last_ai_response": self.last_ai_response
         }
 
@@ -68,6 +77,9 @@ class Conversation:
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.context = ConversationContext()
+        # How much of this conversation the conversation store already holds
+        self.saved_messages = 0
+        self.saved_events = 0
         self.add_message("assistant", "How can I help you with financial information today?")
 
     def add_message(self, role: str, content: str):
@@ -100,7 +112,8 @@ class Conversation:
             "messages": self.messages,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
-            "context": self.context.get_context_summary()
+            # The latest result's rows are only needed while answering; the history keeps its table
+            "context": {key: value for key, value in self.context.get_context_summary().items() if key != "kg_rows"}
         }
 
     @classmethod
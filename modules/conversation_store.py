@@ -0,0 +1,123 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import os
+import json
+import sqlite3
+import logging
+import threading
+from modules.conversation_manager import Conversation, ConversationContext
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    title TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (owner, updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, position)
+);
+CREATE TABLE IF NOT EXISTS context_events (
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, position)
+);
+"""
+
+
+def replay_context(events: List[Dict[str, Any]]) -> ConversationContext:
+    context = ConversationContext()
+    for event in events:
+        if event["type"] == "turn":
+            entry = event["entry"]
+            context.current_entities = dict(entry["entities"])
+            context.current_intent = entry["intent"]
+            context.kg_data = entry["kg_data"]
+            context.history.append(entry)
+        elif event["type"] == "ai_response":
+            context.last_ai_response = event["text"]
+            if context.history:
+                context.history[-1]["ai_response"] = event["text"]
+    return context
+
+
+class ConversationStore:
+    # Conversations persist in SQLite as append-only logs: each save writes only the messages and
+    # context events added since the previous save, plus the title and updated_at of the listing
+    # row. Listing reads the (owner, updated_at) index; a conversation's body is only read when
+    # it is opened.
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def save(self, conversation: Conversation, owner: str):
+        messages_saved, events_saved = conversation.saved_messages, conversation.saved_events
+        new_messages = conversation.messages[messages_saved:]
+        new_events = list(conversation.context.events)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO conversations (id, owner, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET title = excluded.title, updated_at = excluded.updated_at",
+                (conversation.id, owner, conversation.title, conversation.created_at.isoformat(), conversation.updated_at.isoformat()))
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO messages (conversation_id, position, role, content) VALUES (?, ?, ?, ?)",
+                [(conversation.id, messages_saved + offset, message["role"], message["content"]) for offset, message in enumerate(new_messages)])
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO context_events (conversation_id, position, event) VALUES (?, ?, ?)",
+                [(conversation.id, events_saved + offset, json.dumps(event, default=str)) for offset, event in enumerate(new_events)])
+        # Only once the write has committed, so a failed save is retried in full next time
+        conversation.saved_messages += len(new_messages)
+        conversation.saved_events += len(new_events)
+        del conversation.context.events[:len(new_events)]
+
+    def list(self, owner: str, limit: int = 50) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, title, updated_at FROM conversations WHERE owner = ? ORDER BY updated_at DESC LIMIT ?",
+                (owner, limit)).fetchall()
+        return [{"id": row[0], "title": row[1], "updated_at": row[2]} for row in rows]
+
+    def load(self, conversation_id: str) -> Optional[Conversation]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT title, created_at, updated_at FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+            if row is None:
+                return None
+            messages = self.connection.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY position", (conversation_id,)).fetchall()
+            events = self.connection.execute(
+                "SELECT event FROM context_events WHERE conversation_id = ? ORDER BY position", (conversation_id,)).fetchall()
+        conversation = Conversation(id=conversation_id, title=row[0])
+        conversation.messages = [{"role": role, "content": content} for role, content in messages]
+        conversation.created_at = datetime.fromisoformat(row[1])
+        conversation.updated_at = datetime.fromisoformat(row[2])
+        conversation.context = replay_context([json.loads(event[0]) for event in events])
+        conversation.saved_messages = len(messages)
+        conversation.saved_events = len(events)
+        return conversation
+
+    def rename(self, conversation_id: str, title: str):
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE conversations SET title = ? WHERE id = ?", (title, conversation_id))
+
+    def delete(self, conversation_id: str):
+        with self.lock, self.connection:
+            for table, column in (("messages", "conversation_id"), ("context_events", "conversation_id"), ("conversations", "id")):
+                self.connection.execute(f"DELETE FROM {table} WHERE {column} = ?", (conversation_id,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
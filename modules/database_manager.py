@@ -1,25 +1,120 @@
-from typing import List, Dict, Any
-from neo4j import GraphDatabase
+from typing import List, Dict, Any, Tuple, Optional
+from datetime import date
+import numpy as np
 import logging
+from modules.rollups import partitions_for_records, refresh_rollups
+from modules.query_guard import QueryGuard
+from modules.query_profiler import QueryProfiler
+from modules.trend_engine import to_day
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Values hang off one Series per (company, metric) and carry the keys of the
+# composite MetricValue indexes, so trend and ranking reads are index seeks.
+# A (company, metric, date) holds one value: loading the same file again overwrites it.
+UPSERT_METRIC_VALUES_QUERY = """
+UNWIND $records AS record
+MERGE (c:Company {name: record.company})
+MERGE (m:Metric {name: record.metric})
+ON CREATE SET m.unit = record.unit
+MERGE (s:Series {companyName: record.company, metricName: record.metric})
+MERGE (c)-[:HAS_SERIES]->(s)
+MERGE (s)-[:OF_METRIC]->(m)
+MERGE (c)-[:HAS_METRIC]->(m)
+MERGE (mv:MetricValue {
+    companyName: record.company,
+    metricName: record.metric,
+    date: coalesce(date(record.date), date())
+})
+SET mv.value = record.value
+MERGE (s)-[:HAS_VALUE]->(mv)
+"""
+
+# Overwritten values change neither the count nor the latest date, so every load also bumps a revision
+BUMP_DATA_REVISION_QUERY = "MERGE (v:DataVersion {name: 'finwise'}) SET v.revision = coalesce(v.revision, 0) + 1"
+
+# Optional compact copy of each series: parallel, date-sorted lists on the Series node with
+# dates stored as days since 1970-01-01. A batch is merged into the lists it touches in Python;
+# compactVersion guards the write, and the SET on it takes the node's write lock before the check.
+READ_COMPACT_SERIES_QUERY = """
+UNWIND $series AS p
+MATCH (s:Series {companyName: p.company, metricName: p.metric})
+RETURN s.companyName AS company, s.metricName AS metric, s.dates AS dates, s.values AS values,
+       coalesce(s.compactVersion, 0) AS version
+"""
+
+WRITE_COMPACT_SERIES_QUERY = """
+UNWIND $series AS p
+MATCH (s:Series {companyName: p.company, metricName: p.metric})
+SET s.compactVersion = coalesce(s.compactVersion, 0)
+WITH s, p
+WHERE s.compactVersion = p.version
+SET s.dates = p.dates, s.values = p.values, s.compactVersion = p.version + 1
+RETURN s.companyName AS company, s.metricName AS metric
+"""
+
+# Series that have no arrays yet, or that another writer changed in the meantime, are rebuilt
+# from their MetricValue nodes instead
+REFRESH_COMPACT_SERIES_QUERY = """
+UNWIND $series AS p
+MATCH (s:Series {companyName: p.company, metricName: p.metric})
+CALL {
+    WITH s
+    MATCH (s)-[:HAS_VALUE]->(mv:MetricValue)
+    WITH mv ORDER BY mv.date
+    RETURN collect(duration.inDays(date('1970-01-01'), mv.date).days) AS dates, collect(toFloat(mv.value)) AS values
+}
+SET s.dates = dates, s.values = values, s.compactVersion = coalesce(s.compactVersion, 0) + 1
+"""
+
+def series_to_numpy(days: List[int], values: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+    return (np.asarray(days or [], dtype=np.int64).astype("datetime64[D]"),
+            np.asarray(values or [], dtype=np.float64))
+
+def merge_series_points(days: List[int], values: List[float], points: Dict[int, Optional[float]]) -> Tuple[List[int], List[float]]:
+    # points maps day -> value; a point replaces the value already held for its day and a
+    # None value removes it
+    days = np.asarray(days, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    new_days = np.fromiter(points, dtype=np.int64, count=len(points))
+    keep = ~np.isin(days, new_days)
+    added = np.array([value is not None for value in points.values()], dtype=bool)
+    merged_days = np.concatenate([days[keep], new_days[added]])
+    merged_values = np.concatenate([values[keep], np.array([v for v in points.values() if v is not None], dtype=np.float64)])
+    order = np.argsort(merged_days, kind="stable")
+    return merged_days[order].tolist(), merged_values[order].tolist()
+
 class DatabaseManager:
-    def __init__(self, driver):
+    def __init__(self, driver, compact_series: bool = False, maintain_rollups: bool = True, query_guard: QueryGuard = None,
+                 profiler: QueryProfiler = None):
         self.driver = driver
+        self.compact_series = compact_series
+        self.maintain_rollups = maintain_rollups
+        self.query_guard = query_guard or QueryGuard()
+        self.profiler = profiler
 
     def execute_query(self, query: str, params: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
         try:
             with self.driver.session() as session:
+                if self.profiler and self.profiler.should_sample(query):
+                    return self.profiler.profile(session, query, params)
                 result = session.run(query, params)
-                logger.debug(f"Neo4j query: {query}")
-                logger.debug(f"Neo4j result: {result}")
-                return [dict(record) for record in result]
+                records = [dict(record) for record in result]
+                logger.debug("Neo4j query returned %d rows: %s", len(records), query)
+                return records
         except Exception as e:
             logger.error(f"Neo4j query failed: {e}")
             return []
 
+    def execute_write(self, query: str, params: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
+        # Unlike execute_query this raises, so a caller can tell the user their data was not stored
+        with self.driver.session() as session:
+            return [dict(record) for record in session.run(query, params)]
+
+    def execute_generated_query(self, query: str, params: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
+        # Generated queries go through the cost guard and raise QueryRejected instead of returning []
+        return self.query_guard.run(self.driver, query, params, self.profiler)
+
     def clear_database(self):
         query = "MATCH (n) DETACH DELETE n"
         self.execute_query(query)
@@ -28,14 +123,8 @@ class DatabaseManager:
         query = "MERGE (c:Company {name: $name})"
         self.execute_query(query, {"name": company_name})
 
-    def add_metric(self, company_name: str, metric_name: str, value: Any):
-        query = """
-        MATCH (c:Company {name: $company_name})
-        MERGE (m:Metric {name: $metric_name})
-        MERGE (mv:MetricValue {value: $value})
-        MERGE (c)-[:HAS_METRIC]->(mv)-[:OF_METRIC]->(m)
-        """
-        self.execute_query(query, {"company_name": company_name, "metric_name": metric_name, "value": value})
+    def add_metric(self, company_name: str, metric_name: str, value: Any, date: str = None):
+        self.add_metric_values([{"company": company_name, "metric": metric_name, "value": value, "date": date, "unit": None}])
 
     def populate_sample_data(self):
         companies = ["TCS", "Infosys", "Wipro", "HCL Technologies"]
@@ -51,11 +140,67 @@ class DatabaseManager:
                 value = values[companies.index(company)]
                 self.add_metric(company, metric_name, value)
 
+    def add_metric_values(self, records: List[Dict[str, Any]], batch_size: int = 1000):
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            self.execute_write(UPSERT_METRIC_VALUES_QUERY, {"records": batch})
+            if self.compact_series:
+                self._merge_compact_series(batch)
+        self.execute_write(BUMP_DATA_REVISION_QUERY)
+        if self.maintain_rollups:
+            refresh_rollups(self, partitions_for_records(records))
+
+    def _merge_compact_series(self, batch: List[Dict[str, Any]]):
+        points = {}
+        today = to_day(date.today().isoformat())
+        for record in batch:
+            # Matches the upsert: undated values are stored under today's date, and later records win
+            day = to_day(record["date"]) if record.get("date") else today
+            value = record.get("value")
+            series_points = points.setdefault((record["company"], record["metric"]), {})
+            if day is not None:
+                series_points[day] = float(value) if value is not None else None
+
+        current = self.execute_query(READ_COMPACT_SERIES_QUERY, {"series": [{"company": c, "metric": m} for c, m in points]})
+        updates = []
+        for row in current:
+            if row["dates"] is None:
+                continue
+            dates, values = merge_series_points(row["dates"], row["values"], points[(row["company"], row["metric"])])
+            updates.append({"company": row["company"], "metric": row["metric"], "version": row["version"], "dates": dates, "values": values})
+        written = set()
+        if updates:
+            written = {(row["company"], row["metric"]) for row in self.execute_query(WRITE_COMPACT_SERIES_QUERY, {"series": updates})}
+        rebuild = [{"company": c, "metric": m} for c, m in points if (c, m) not in written]
+        if rebuild:
+            self.execute_query(REFRESH_COMPACT_SERIES_QUERY, {"series": rebuild})
+
+    def get_series_arrays(self, company_name: str, metric_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        query = "MATCH (s:Series {companyName: $company, metricName: $metric}) RETURN s.dates AS dates, s.values AS values"
+        result = self.execute_query(query, {"company": company_name, "metric": metric_name})
+        return series_to_numpy(result[0]["dates"], result[0]["values"]) if result else series_to_numpy([], [])
+
+    def get_series_arrays_bulk(self, company_names: Optional[List[str]] = None,
+                               metric_names: Optional[List[str]] = None) -> Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]:
+        # None reads every company or metric
+        query = """
+        MATCH (s:Series)
+        WHERE ($companies IS NULL OR s.companyName IN $companies) AND ($metrics IS NULL OR s.metricName IN $metrics)
+          AND s.dates IS NOT NULL
+        RETURN s.companyName AS company, s.metricName AS metric, s.dates AS dates, s.values AS values
+        """
+        rows = self.execute_query(query, {"companies": company_names, "metrics": metric_names})
+        return {(row["company"], row["metric"]): series_to_numpy(row["dates"], row["values"]) for row in rows}
+
+    def get_metric_units(self) -> Dict[str, str]:
+        query = "MATCH (m:Metric) RETURN m.name AS name, m.unit AS unit"
+        return {row["name"]: row["unit"] for row in self.execute_query(query) if row["name"] and row["unit"]}
+
     def get_all_data(self) -> List[Dict[str, Any]]:
         query = """
         MATCH (c:Company)
-        OPTIONAL MATCH (c)-[:HAS_METRIC]->(mv:MetricValue)-[:OF_METRIC]->(m:Metric)
-        RETURN c.name AS CompanyName, m.name AS MetricName, mv.value AS Value
+        OPTIONAL MATCH (c)-[:HAS_SERIES]->(s:Series)-[:HAS_VALUE]->(mv:MetricValue)
+        RETURN c.name AS CompanyName, s.metricName AS MetricName, mv.date AS Date, mv.value AS Value
         """
         return self.execute_query(query)
 
@@ -64,6 +209,17 @@ class DatabaseManager:
         result = self.execute_query(query)
         return result[0]['count'] == 0 if result else True
 
+    def get_data_version(self) -> Optional[str]:
+        # Changes whenever metric values are added or overwritten, so caches built on the graph can key on it
+        query = """
+        MATCH (mv:MetricValue)
+        WITH count(mv) AS points, toString(max(mv.date)) AS latestDate
+        OPTIONAL MATCH (v:DataVersion {name: 'finwise'})
+        RETURN points, latestDate, v.revision AS revision
+        """
+        result = self.execute_query(query)
+        return f"{result[0]['points']}:{result[0]['latestDate']}:{result[0]['revision']}" if result else None
+
     def get_database_stats(self) -> Dict[str, int]:
         queries = {
             "companies": "MATCH (c:Company) RETURN COUNT(c) AS count",
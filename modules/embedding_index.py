@@ -0,0 +1,352 @@
+from typing import Dict, Any, List, Optional, Iterable
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MIN_TRAIN_SIZE = 2048
+SAMPLES_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+BATCH_SIZE = 8192
+EXACT_SCAN_SIZE = 4096
+
+
+def date_key(date: Optional[str]) -> int:
+    # "2024-03-31" -> 20240331, unknown dates sort before everything else
+    digits = "".join(ch for ch in str(date or "")[:10] if ch.isdigit())
+    return int(digits.ljust(8, "0")[:8]) if digits else 0
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class SpacyEmbedder:
+    def __init__(self, nlp):
+        self.nlp = nlp
+        self.dim = nlp.vocab.vectors_length
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        # Only the static word vectors are needed, so skip the parser and NER
+        with self.nlp.select_pipes(enable=[]):
+            vectors = np.array([doc.vector for doc in self.nlp.pipe(texts, batch_size=64)], dtype=np.float32)
+        return normalize_rows(vectors.reshape(len(texts), self.dim))
+
+
+# Inverted-file (IVF) index over memory-mapped, L2-normalised chunk vectors
+class ChunkEmbeddingIndex:
+    def __init__(self, index_dir: str, embedder, nprobe: int = 8):
+        self.index_dir = index_dir
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.nprobe = nprobe
+        self.lock = threading.RLock()
+        os.makedirs(index_dir, exist_ok=True)
+        self.vectors_path = os.path.join(index_dir, "vectors.f32")
+        self.assignments_path = os.path.join(index_dir, "assignments.i32")
+        self.rows_path = os.path.join(index_dir, "rows.jsonl")
+        self.reports_path = os.path.join(index_dir, "reports.jsonl")
+        self.centroids_path = os.path.join(index_dir, "ivf.npz")
+        self.lock_path = os.path.join(index_dir, "writer.lock")
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def _load(self):
+        self.chunk_ids = []
+        self.company_codes = {}
+        self.report_codes = {}
+        # Latest version per report; rows written for any other version are tombstoned
+        self.report_versions = {}
+        companies = []
+        dates = []
+        reports = []
+        versions = []
+        if os.path.exists(self.rows_path):
+            with open(self.rows_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    self.chunk_ids.append(row["id"])
+                    companies.append(self.company_codes.setdefault(row["company"], len(self.company_codes)))
+                    dates.append(row["date"])
+                    reports.append(self.report_codes.setdefault(row["report"], len(self.report_codes)))
+                    versions.append(row.get("version", ""))
+        if os.path.exists(self.reports_path):
+            with open(self.reports_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.report_versions[entry["report"]] = entry["version"]
+        self.companies = np.array(companies, dtype=np.int32)
+        self.dates = np.array(dates, dtype=np.int32)
+        self.reports = np.array(reports, dtype=np.int32)
+        report_names = list(self.report_codes)
+        self.live = np.array([self.report_versions.get(report_names[code], "") == version
+                              for code, version in zip(reports, versions)], dtype=bool)
+        self.live_ids = {self.chunk_ids[i] for i in np.flatnonzero(self.live)}
+        self.vectors = self._map(self.vectors_path, np.float32, (len(self.chunk_ids), self.dim))
+        self.centroids = None
+        self.inverted_lists = None
+        self.trained_size = 0
+        if os.path.exists(self.centroids_path):
+            ivf = np.load(self.centroids_path)
+            self.centroids = ivf["centroids"]
+            self.trained_size = int(ivf["trained_size"])
+            self._build_lists(np.asarray(self._map(self.assignments_path, np.int32, (len(self.chunk_ids),))))
+        self.signature = self._signature()
+
+    def _signature(self) -> tuple:
+        stats = [os.stat(path) if os.path.exists(path) else None
+                 for path in (self.rows_path, self.reports_path, self.centroids_path)]
+        return tuple((stat.st_size, stat.st_mtime_ns) if stat else None for stat in stats)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        with open(self.lock_path, "a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            # Closing the handle releases the lock
+            yield
+
+    def _refresh(self):
+        # Pick up rows that other processes appended since the files were last read
+        if self._signature() != self.signature:
+            with self._file_lock(exclusive=False):
+                self._load()
+
+    @contextmanager
+    def _writer(self):
+        # The app, the report store CLI and the updater append to the same files, so one writer at a
+        # time holds the file lock and first catches up with whatever the others appended
+        with self.lock, self._file_lock(exclusive=True):
+            if self._signature() != self.signature:
+                self._load()
+            yield
+            self.signature = self._signature()
+
+    @staticmethod
+    def _map(path: str, dtype, shape) -> np.ndarray:
+        if not shape[0] or not os.path.exists(path):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    def _build_lists(self, assignments: np.ndarray):
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self.inverted_lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def _is_new(self, row: Dict[str, Any]) -> bool:
+        version = row.get("version") or ""
+        return self.report_versions.get(row.get("report") or "", "") != version or row["id"] not in self.live_ids
+
+    def _set_versions(self, versions: Dict[str, Optional[str]]):
+        if not versions:
+            return
+        with open(self.reports_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps({"report": report, "version": version}) + "\n" for report, version in versions.items())
+        for report, version in versions.items():
+            self.report_versions[report] = version
+            code = self.report_codes.get(report)
+            if code is not None:
+                dead = np.flatnonzero(self.live & (self.reports == code))
+                self.live[dead] = False
+                self.live_ids.difference_update(self.chunk_ids[i] for i in dead)
+
+    def add(self, rows: List[Dict[str, Any]]) -> int:
+        # rows: {"id", "text", "company", "date", "report", "version"}; rows carrying a new version of a
+        # report tombstone the rows indexed for its previous version
+        with self.lock:
+            self._refresh()
+            rows = [row for row in rows if self._is_new(row)]
+        if not rows:
+            return 0
+        # Embedding is the slow part, so it runs without holding the lock
+        vectors = self.embedder.embed([row["text"] for row in rows])
+
+        with self._writer():
+            # Another thread or process may have indexed the same rows in the meantime
+            fresh = [i for i, row in enumerate(rows) if self._is_new(row)]
+            if not fresh:
+                return 0
+            vectors = vectors[fresh]
+            records = [{"id": rows[i]["id"], "company": rows[i].get("company") or "",
+                        "date": date_key(rows[i].get("date")), "report": rows[i].get("report") or "",
+                        "version": rows[i].get("version") or ""} for i in fresh]
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.rows_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+            self._set_versions({record["report"]: record["version"] for record in records
+                                if self.report_versions.get(record["report"], "") != record["version"]})
+
+            start = len(self)
+            self.chunk_ids.extend(record["id"] for record in records)
+            self.live_ids.update(record["id"] for record in records)
+            codes = [self.company_codes.setdefault(record["company"], len(self.company_codes)) for record in records]
+            self.companies = np.concatenate([self.companies, np.array(codes, dtype=np.int32)])
+            self.dates = np.concatenate([self.dates, np.array([record["date"] for record in records], dtype=np.int32)])
+            codes = [self.report_codes.setdefault(record["report"], len(self.report_codes)) for record in records]
+            self.reports = np.concatenate([self.reports, np.array(codes, dtype=np.int32)])
+            self.live = np.concatenate([self.live, np.ones(len(records), dtype=bool)])
+            self.vectors = self._map(self.vectors_path, np.float32, (len(self.chunk_ids), self.dim))
+
+            if self.centroids is not None:
+                assignments = self._assign(vectors).astype(np.int32)
+                with open(self.assignments_path, "ab") as f:
+                    f.write(assignments.tobytes())
+                for list_id in np.unique(assignments):
+                    new_ids = start + np.flatnonzero(assignments == list_id)
+                    self.inverted_lists[list_id] = np.concatenate([self.inverted_lists[list_id], new_ids])
+
+            # Retrain once the index has grown well past the data the centroids were fitted on
+            live = int(self.live.sum())
+            if live >= MIN_TRAIN_SIZE and (self.centroids is None or live > 4 * self.trained_size):
+                self._train()
+            return len(records)
+
+    def remove(self, report_ids: Iterable[str]) -> int:
+        with self._writer():
+            before = int(self.live.sum())
+            self._set_versions({report: None for report in report_ids
+                                if report in self.report_codes and self.report_versions.get(report, "") is not None})
+            return before - int(self.live.sum())
+
+    def train(self):
+        with self._writer():
+            self._train()
+
+    def _train(self):
+        # Centroids are fitted on live rows only, but every row gets a list so row ids stay aligned
+        live = np.flatnonzero(self.live)
+        if not len(live):
+            return
+        n = len(self)
+        nlist = min(max(16, int(np.sqrt(len(live)))), len(live))
+        rng = np.random.default_rng(0)
+        sample_ids = np.sort(rng.choice(live, size=min(len(live), nlist * SAMPLES_PER_LIST), replace=False))
+        sample = np.asarray(self.vectors[sample_ids])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = normalize_rows(sums[filled])
+        self.centroids = centroids
+        self.trained_size = len(live)
+
+        assignments = np.concatenate([self._assign(np.asarray(self.vectors[start:start + BATCH_SIZE]))
+                                      for start in range(0, n, BATCH_SIZE)]).astype(np.int32)
+        assignments.tofile(self.assignments_path)
+        with open(self.centroids_path, "wb") as f:
+            np.savez(f, centroids=centroids, trained_size=len(live))
+        self._build_lists(assignments)
+        logger.info(f"Trained embedding index with {nlist} lists over {len(live)} chunks")
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def _probe(self, query: np.ndarray, mask: np.ndarray, top_k: int) -> np.ndarray:
+        # Probe the closest lists first and widen until enough rows pass the filters
+        order = np.argsort(self.centroids @ query)[::-1]
+        nprobe = self.nprobe
+        while True:
+            candidates = np.concatenate([self.inverted_lists[p] for p in order[:nprobe]])
+            candidates = candidates[mask[candidates]]
+            if len(candidates) >= top_k or nprobe >= len(order):
+                return np.sort(candidates)
+            nprobe *= 2
+
+    def search(self, question: str, top_k: int = 5, company_names: Optional[Iterable[str]] = None,
+               start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Embedding is the slow part, so it runs before taking the lock
+        query = self.embedder.embed([question])[0]
+        with self.lock:
+            self._refresh()
+            mask = self.live.copy()
+            if company_names:
+                codes = [self.company_codes[name] for name in company_names if name in self.company_codes]
+                mask &= np.isin(self.companies, codes)
+            if start_date:
+                mask &= self.dates >= date_key(start_date)
+            if end_date:
+                mask &= self.dates <= date_key(end_date)
+            allowed = np.flatnonzero(mask)
+            if not len(allowed):
+                return []
+            if self.inverted_lists is None or len(allowed) <= EXACT_SCAN_SIZE:
+                # A small filtered set is scanned exactly, which is cheap and never misses a match
+                candidates = allowed
+            else:
+                candidates = self._probe(query, mask, top_k)
+
+            scores = np.asarray(self.vectors[candidates]) @ query
+            k = min(top_k, len(candidates))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [{"id": self.chunk_ids[candidates[i]], "score": float(scores[i])} for i in best]
+
+    def sync_from_graph(self, db_manager, batch_size: int = 20) -> int:
+        # Each report's chunk version is compared with the index, so only new or re-chunked reports are
+        # embedded again and reports that lost their chunks are tombstoned
+        versions_query = """
+        MATCH (r:Report)
+        WITH r, size([(r)-[:HAS_CHUNK]->(:ReportChunk) | 1]) AS chunks
+        WHERE chunks > 0
+        RETURN r.id AS report, coalesce(r.chunkHash, toString(chunks)) AS version
+        """
+        chunks_query = """
+        MATCH (r:Report)-[:HAS_CHUNK]->(ch:ReportChunk)
+        WHERE r.id IN $reports
+        OPTIONAL MATCH (c:Company)-[:HAS_REPORT]->(r)
+        RETURN ch.id AS id, ch.text AS text, c.name AS company, r.date AS date, r.id AS report
+        """
+        versions = {row["report"]: row["version"] for row in db_manager.execute_query(versions_query)}
+        if not versions:
+            # A failed query also comes back empty, which must not tombstone the whole index
+            return 0
+        with self.lock:
+            self._refresh()
+            stale = [report for report, version in versions.items() if self.report_versions.get(report, "") != version]
+            gone = [report for report in self.report_codes
+                    if report and report not in versions and self.report_versions.get(report, "") is not None]
+        if gone:
+            self.remove(gone)
+
+        added = 0
+        for start in range(0, len(stale), batch_size):
+            rows = db_manager.execute_query(chunks_query, {"reports": stale[start:start + batch_size]})
+            for row in rows:
+                row["version"] = versions[row["report"]]
+            added += self.add(rows)
+        return added
+
+
+def fetch_chunk_excerpts(db_manager, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not hits:
+        return []
+    query = """
+    MATCH (r:Report)-[:HAS_CHUNK]->(ch:ReportChunk)
+    WHERE ch.id IN $ids
+    OPTIONAL MATCH (c:Company)-[:HAS_REPORT]->(r)
+    RETURN ch.id AS id, c.name AS Company, r.id AS ReportId, r.type AS ReportType, r.date AS ReportDate,
+           ch.index AS ChunkIndex, ch.text AS Excerpt
+    """
+    scores = {hit["id"]: hit["score"] for hit in hits}
+    rows = db_manager.execute_query(query, {"ids": list(scores)})
+    for row in rows:
+        row["Score"] = round(scores.pop(row["id"]), 4)
+        del row["id"]
+    return sorted(rows, key=lambda row: row["Score"], reverse=True)
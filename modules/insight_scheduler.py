@@ -0,0 +1,115 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import time
+import logging
+import threading
+from modules.chatbot import chatbot_with_context, FailedAnswer
+from modules.conversation_manager import ConversationContext
+from modules.metrics import pipeline_metrics
+from modules.result_encoder import encode_rows
+
+logger = logging.getLogger(__name__)
+
+INSIGHT_PROMPT = ("Using only the knowledge graph data provided, return one meaningful, bite-sized insight about "
+                  "the latest figures. Return as short and concise a message as possible.")
+
+# Largest year-over-year moves in the most recent year of each metric, read from the rollups
+MOVERS_QUERY = """
+MATCH (a:AnnualMetric)
+WHERE a.yoyGrowth IS NOT NULL
+WITH a.metricName AS metric, max(a.year) AS year
+MATCH (a:AnnualMetric {metricName: metric, year: year})
+WHERE a.yoyGrowth IS NOT NULL
+RETURN a.companyName AS Company, a.metricName AS Metric, a.year AS Year, a.value AS Value,
+       round(a.yoyGrowth * 100, 2) AS YoYGrowthPct, a.overallRank AS Rank
+ORDER BY abs(a.yoyGrowth) DESC
+LIMIT $limit
+"""
+
+LATEST_VALUES_QUERY = """
+MATCH (s:Series)
+WHERE s.latestValue IS NOT NULL
+RETURN s.companyName AS Company, s.metricName AS Metric, toString(s.latestDate) AS Date, s.latestValue AS Value
+ORDER BY s.latestDate DESC
+LIMIT $limit
+"""
+
+
+class InsightScheduler:
+    def __init__(self, db_manager, client, model_name: str, interval: float = 900.0, poll_interval: float = 60.0, limit: int = 10):
+        self.db_manager = db_manager
+        self.client = client
+        self.model_name = model_name
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.insight = None
+        self.data_version = None
+        # trigger() bumps triggers; a run only clears the triggers it saw, so one arriving mid-run is kept
+        self.triggers = 0
+        self.handled_triggers = 0
+        self.generated_at = 0.0
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="finwise-insights", daemon=True)
+            self.thread.start()
+        return self
+
+    def trigger(self):
+        # Called after data changes so the next insight reflects them without waiting for the interval
+        with self.lock:
+            self.triggers += 1
+        self.wake.set()
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return dict(self.insight) if self.insight else None
+
+    def gather(self) -> List[Dict[str, Any]]:
+        rows = self.db_manager.execute_query(MOVERS_QUERY, {"limit": self.limit})
+        return rows or self.db_manager.execute_query(LATEST_VALUES_QUERY, {"limit": self.limit})
+
+    def generate(self) -> Optional[Dict[str, Any]]:
+        rows = self.gather()
+        if not rows:
+            return None
+        context = ConversationContext()
+        context.update(user_input=INSIGHT_PROMPT, companies=[], metrics=[], start_date=[], end_date=[],
+                       industry=None, intent={"action": "insight"}, kg_response=encode_rows(rows), kg_rows=rows)
+        with pipeline_metrics.stage("insight"):
+            text = chatbot_with_context(INSIGHT_PROMPT, context, self.client, self.model_name, stage="insight")
+        if isinstance(text, FailedAnswer):
+            # Shed in favour of users' questions, or the model failed; the next poll tries again
+            raise RuntimeError(text)
+        return {"text": text, "generated_at": datetime.now().isoformat(timespec="seconds")}
+
+    def run_once(self, force: bool = False) -> bool:
+        version = self.db_manager.get_data_version()
+        with self.lock:
+            triggers = self.triggers
+            due = (force or triggers != self.handled_triggers or version != self.data_version
+                   or time.monotonic() - self.generated_at > self.interval)
+        if not due:
+            return False
+        insight = self.generate()
+        with self.lock:
+            if insight:
+                self.insight = insight
+            self.data_version = version
+            self.handled_triggers = triggers
+            self.generated_at = time.monotonic()
+        logger.info(f"Recent insight refreshed for data version {version}")
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Insight generation failed: {e}")
+            self.wake.wait(self.poll_interval)
+            self.wake.clear()
@@ -1,10 +1,10 @@
 from typing import Dict, Any, List, Tuple
 from modules.chatbot import chatbot_no_context
+from modules.metrics import pipeline_metrics
 import json
 import logging
 import re
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class LLMQueryGenerator:
@@ -14,15 +14,15 @@ class LLMQueryGenerator:
         self.db_schema = db_schema
 
     def generate_and_validate_query(self, intent: Dict[str, Any], entities: Dict[str, List[str]]) -> Tuple[str, bool, str]:
-        query = self.generate_query(intent, entities)
-        is_valid, explanation = self.validate_query(query)
+        with pipeline_metrics.stage("query_generation"):
+            query = self.generate_query(intent, entities)
+        with pipeline_metrics.stage("query_validation"):
+            is_valid, explanation = self.validate_query(query)
         return query, is_valid, explanation
 
     def generate_query(self, intent: Dict[str, Any], entities: Dict[str, List[str]]) -> str:
         prompt = self._create_prompt(intent, entities)
-        logger.debug(f"Generated Prompt for Query: {prompt}")
-        response = chatbot_no_context(prompt, self.client, self.model_name)
-        logger.debug(f"Chatbot Response for Query: {response}")
+        response = chatbot_no_context(prompt, self.client, self.model_name, stage="query_generation")
         return self._extract_query(response)
 
     def validate_query(self, query: str) -> Tuple[bool, str]:
@@ -53,9 +53,7 @@ class LLMQueryGenerator:
             "suggested_fix": "MATCH (c:Company {{name: $companyName}}) RETURN c"
         }}
         """
-        logger.debug(f"Validation Prompt: {prompt}")
-        response = chatbot_no_context(prompt, self.client, self.model_name)
-        logger.debug(f"Chatbot Response for Validation: {response}")
+        response = chatbot_no_context(prompt, self.client, self.model_name, stage="query_validation")
 
         try:
             result = json.loads(response)
@@ -86,68 +84,85 @@ class LLMQueryGenerator:
         4. Handle potential null values and empty lists in parameters.
         5. Limit results when appropriate to prevent performance issues.
         6. Use CASE statements for complex conditional logic.
-        7. Utilize appropriate aggregation functions when dealing with multiple records."""+\
+        7. Utilize appropriate aggregation functions when dealing with multiple records.
+        8. Never return Report.content or ReportChunk.text; relevant report excerpts are retrieved separately.
+        9. Filter MetricValue nodes directly on companyName, metricName and date, which are indexed; MetricValue.date is a DATE, so wrap date parameters in date().
+        10. Prefer the precomputed rollups: Series.latestValue/latestDate for latest values, and AnnualMetric for annual figures, YoY changes and rankings. AnnualMetric.value is the annual total for Revenue, Net Profit and EBITDA and the closing value for other metrics; only years with AnnualMetric.complete = true have YoY figures and ranks."""+\
         """
         Example queries:
 
         1. Retrieve the latest quarterly report for a company:
         MATCH (c:Company {{name: $companyName}})-[:HAS_REPORT]->(r:Report {{type: "quarterly"}})
         WITH c, r ORDER BY r.date DESC LIMIT 1
-        RETURN c.name AS Company, r.date AS ReportDate, r.content AS ReportContent
+        RETURN c.name AS Company, r.id AS ReportId, r.type AS ReportType, r.date AS ReportDate
 
         2. Compare multiple metrics for several companies:
-        MATCH (c:Company)
-        WHERE c.name IN $companyNames
-        OPTIONAL MATCH (c)-[:HAS_METRIC]->(mv:MetricValue)-[:OF_METRIC]->(m:Metric)
-        WHERE m.name IN $metricNames
-        WITH c, m, mv ORDER BY mv.date DESC
-        WITH c, m, COLLECT(mv)[0] AS latestValue
-        RETURN c.name AS Company, 
-               m.name AS Metric, 
+        MATCH (mv:MetricValue)
+        WHERE mv.companyName IN $companyNames AND mv.metricName IN $metricNames
+        WITH mv ORDER BY mv.date DESC
+        WITH mv.companyName AS Company, mv.metricName AS Metric, COLLECT(mv)[0] AS latestValue
+        RETURN Company, 
+               Metric, 
                latestValue.value AS Value, 
                latestValue.date AS Date
 
         3. Analyze trend of a specific metric for a company over time:
-        MATCH (c:Company {{name: $companyName}})-[:HAS_METRIC]->(mv:MetricValue)-[:OF_METRIC]->(m:Metric {{name: $metricName}})
-        WHERE mv.date >= $startDate AND mv.date <= $endDate
-        WITH c, m, mv ORDER BY mv.date
-        RETURN c.name AS Company, 
-               m.name AS Metric, 
-               COLLECT({{date: mv.date, value: mv.value}}) AS Trend
+        MATCH (mv:MetricValue)
+        WHERE mv.companyName = $companyName AND mv.metricName = $metricName
+          AND mv.date >= date($startDate) AND mv.date <= date($endDate)
+        RETURN mv.companyName AS Company, 
+               mv.metricName AS Metric, 
+               mv.date AS Date, 
+               mv.value AS Value
+        ORDER BY mv.date
 
         4. Find top N companies by a specific metric:
-        MATCH (c:Company)-[:HAS_METRIC]->(mv:MetricValue)-[:OF_METRIC]->(m:Metric {{name: $metricName}})
-        WITH c, mv WHERE mv.date = $date
+        MATCH (mv:MetricValue)
+        WHERE mv.metricName = $metricName AND mv.date = date($date)
+        RETURN mv.companyName AS Company, mv.value AS MetricValue
         ORDER BY mv.value DESC
         LIMIT $limit
-        RETURN c.name AS Company, mv.value AS MetricValue
 
         5. Compare companies within the same industry:
         MATCH (c:Company)
         WHERE c.industry = $industry
-        OPTIONAL MATCH (c)-[:HAS_METRIC]->(mv:MetricValue)-[:OF_METRIC]->(m:Metric)
-        WHERE m.name IN $metricNames
-        WITH c, m, mv ORDER BY mv.date DESC
-        WITH c, m, COLLECT(mv)[0] AS latestValue
+        MATCH (mv:MetricValue)
+        WHERE mv.companyName = c.name AND mv.metricName IN $metricNames
+        WITH c, mv ORDER BY mv.date DESC
+        WITH c, mv.metricName AS Metric, COLLECT(mv)[0] AS latestValue
         RETURN c.name AS Company, 
                c.industry AS Industry,
-               m.name AS Metric, 
+               Metric, 
                latestValue.value AS Value
 
+        6. Latest value of metrics for several companies (precomputed):
+        MATCH (s:Series)
+        WHERE s.companyName IN $companyNames AND s.metricName IN $metricNames
+        RETURN s.companyName AS Company, s.metricName AS Metric, s.latestValue AS Value, s.latestDate AS Date
+
+        7. Top N companies by an annual figure, with year-on-year change (precomputed; the latest complete year unless a year is given):
+        MATCH (a:AnnualMetric)
+        WHERE a.metricName = $metricName AND a.complete
+        WITH max(a.year) AS latestYear
+        MATCH (a:AnnualMetric {metricName: $metricName, year: coalesce($year, latestYear)})
+        WHERE a.complete
+        RETURN a.companyName AS Company, a.year AS Year, a.value AS Value, a.basis AS Basis, a.yoyGrowth AS YoYGrowth, a.overallRank AS Rank
+        ORDER BY a.overallRank
+        LIMIT $limit
+
         Generate a parameterized Cypher query that retrieves the relevant information based on the intent and entities.
         Ensure the query is efficient, follows Neo4j best practices, and is safe from injection vulnerabilities.
         Return only the Cypher query without any explanation or additional text.
         """
-        logger.debug(f"Created Prompt: {prompt}")
         return prompt
 
     def _extract_query(self, response: str) -> str:
         query = response.strip()
-        logger.debug(f"Extracted Query: {query}")
+        logger.debug("Extracted Query: %s", query)
         return query
     
     def extract_parameters_from_query(self, query: str) -> List[str]:
         pattern = r'\$([a-zA-Z_][a-zA-Z0-9_]*)'
         parameters = re.findall(pattern, query)
-        logger.debug(f"Extracted Parameters: {parameters}")
+        logger.debug("Extracted Parameters: %s", parameters)
         return parameters
\ No newline at end of file
@@ -0,0 +1,153 @@
+from typing import Dict, Any, Iterator, Tuple
+from contextlib import contextmanager
+import time
+import heapq
+import logging
+import itertools
+import threading
+from modules.metrics import pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE, BACKGROUND, BULK = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BULK: "bulk"}
+# Stages not listed here are part of answering a user's question
+STAGE_PRIORITIES = {"insight": BACKGROUND, "upload_analysis": BULK}
+
+OVERLOADED_MESSAGE = "FinWise is handling more questions than it can answer right now. Please try again in a minute."
+
+
+class Overloaded(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        # rate is in requests per second; 0 disables rate limiting
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+class Endpoint:
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.active = 0
+        self.waiting = []
+        self.average_duration = 2.0
+
+
+class LLMScheduler:
+    # Every LLM call takes a slot here first. Each endpoint (GaiaNet node) has a concurrency limit
+    # and a token bucket; waiting calls are admitted strictly by priority, and background and bulk
+    # calls leave some slots free for interactive ones. A call whose expected wait exceeds what
+    # its priority allows is refused at once with Overloaded instead of timing out later.
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.configure()
+
+    def configure(self, max_concurrency: int = 4, requests_per_minute: float = 0.0, burst: float = 5.0,
+                  reserved_interactive: int = 1, max_wait: Tuple[float, float, float] = (20.0, 120.0, 300.0)):
+        with self.condition:
+            self.max_concurrency = max(1, max_concurrency)
+            self.rate = requests_per_minute / 60.0
+            self.burst = burst
+            self.reserved_interactive = min(reserved_interactive, self.max_concurrency - 1)
+            self.max_wait = dict(zip((INTERACTIVE, BACKGROUND, BULK), max_wait))
+            self.endpoints = {}
+        return self
+
+    def _endpoint(self, name: str) -> Endpoint:
+        if name not in self.endpoints:
+            self.endpoints[name] = Endpoint(self.rate, self.burst)
+        return self.endpoints[name]
+
+    def _estimated_wait(self, endpoint: Endpoint, ahead: int) -> float:
+        by_concurrency = max(0, endpoint.active + ahead + 1 - self.max_concurrency) / self.max_concurrency * endpoint.average_duration
+        by_rate = max(0.0, ahead + 1 - endpoint.bucket.tokens) / self.rate if self.rate > 0 else 0.0
+        return max(by_concurrency, by_rate)
+
+    def _admission_wait(self, endpoint: Endpoint, entry: Tuple[int, int]):
+        # None: wait to be notified; otherwise seconds until the bucket has a token (0 = go)
+        if endpoint.waiting[0] != entry:
+            return None
+        limit = self.max_concurrency - (self.reserved_interactive if entry[0] != INTERACTIVE else 0)
+        if endpoint.active >= limit:
+            return None
+        return endpoint.bucket.wait_time()
+
+    def _shed(self, priority: int, reason: str):
+        name = PRIORITY_NAMES[priority]
+        pipeline_metrics.record_error(f"llm_shed_{name}")
+        logger.warning(f"Shedding {name} LLM call: {reason}")
+        raise Overloaded(OVERLOADED_MESSAGE)
+
+    @contextmanager
+    def slot(self, endpoint_name: str, stage: str) -> Iterator[None]:
+        priority = STAGE_PRIORITIES.get(stage, INTERACTIVE)
+        queued = time.monotonic()
+        deadline = queued + self.max_wait[priority]
+        with self.condition:
+            endpoint = self._endpoint(endpoint_name)
+            ahead = sum(1 for waiting_priority, _ in endpoint.waiting if waiting_priority <= priority)
+            expected = self._estimated_wait(endpoint, ahead)
+            if expected > self.max_wait[priority]:
+                self._shed(priority, f"expected wait {expected:.1f}s with {ahead} calls ahead")
+            entry = (priority, next(self.sequence))
+            heapq.heappush(endpoint.waiting, entry)
+            try:
+                while True:
+                    wait = self._admission_wait(endpoint, entry)
+                    if wait == 0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._shed(priority, f"waited {time.monotonic() - queued:.1f}s")
+                    self.condition.wait(min(wait, remaining) if wait else remaining)
+            finally:
+                endpoint.waiting.remove(entry)
+                heapq.heapify(endpoint.waiting)
+                self.condition.notify_all()
+            endpoint.bucket.take()
+            endpoint.active += 1
+        pipeline_metrics.observe(f"llm_queue_{PRIORITY_NAMES[priority]}", time.monotonic() - queued)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.condition:
+                endpoint.active -= 1
+                endpoint.average_duration = 0.8 * endpoint.average_duration + 0.2 * (time.monotonic() - started)
+                self.condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.condition:
+            return {
+                name: {
+                    "active": endpoint.active,
+                    "waiting": {PRIORITY_NAMES[priority]: sum(1 for waiting_priority, _ in endpoint.waiting if waiting_priority == priority)
+                                for priority in PRIORITY_NAMES},
+                    "average_seconds": round(endpoint.average_duration, 3)
+                } for name, endpoint in self.endpoints.items()
+            }
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,186 @@
+from typing import Dict, Any, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seconds; LLM stages dominate, so the buckets stretch well past the typical Neo4j latency
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the quantile, which is what Prometheus would report
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class PipelineMetrics:
+    def __init__(self, sink_path: str = None):
+        self.lock = threading.Lock()
+        self.sink_path = sink_path
+        self.server = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latency = {}
+            self.errors = {}
+            self.tokens = {}
+            self.cache = {}
+
+    def configure(self, sink_path: str = None):
+        self.sink_path = sink_path
+        if sink_path:
+            os.makedirs(os.path.dirname(sink_path) or ".", exist_ok=True)
+
+    def _emit(self, event: Dict[str, Any]):
+        if not self.sink_path:
+            return
+        event["timestamp"] = datetime.now().isoformat()
+        try:
+            with open(self.sink_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+        except Exception as e:
+            logger.error(f"Could not write metrics event to {self.sink_path}: {e}")
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            self.latency.setdefault(stage, Histogram()).observe(seconds)
+        self._emit({"type": "latency", "stage": stage, "seconds": round(seconds, 4)})
+
+    def record_error(self, stage: str):
+        with self.lock:
+            self.errors[stage] = self.errors.get(stage, 0) + 1
+        self._emit({"type": "error", "stage": stage})
+
+    def record_cache(self, cache: str, hit: bool):
+        with self.lock:
+            hits, misses = self.cache.get(cache, (0, 0))
+            self.cache[cache] = (hits + 1, misses) if hit else (hits, misses + 1)
+        self._emit({"type": "cache", "cache": cache, "hit": hit})
+
+    def record_tokens(self, stage: str, usage: Any):
+        # Accepts the usage object of an OpenAI-compatible completion; some servers omit it
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        with self.lock:
+            totals = self.tokens.setdefault(stage, {"prompt": 0, "completion": 0, "calls": 0})
+            totals["prompt"] += prompt_tokens
+            totals["completion"] += completion_tokens
+            totals["calls"] += 1
+        self._emit({"type": "tokens", "stage": stage, "prompt": prompt_tokens, "completion": completion_tokens})
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record_error(name)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            stages = [{
+                "Stage": stage,
+                "Count": histogram.count,
+                "MeanSeconds": round(histogram.total / histogram.count, 3) if histogram.count else None,
+                "P50Seconds": histogram.quantile(0.5),
+                "P95Seconds": histogram.quantile(0.95),
+                "Errors": self.errors.get(stage, 0)
+            } for stage, histogram in sorted(self.latency.items())]
+            tokens = [{
+                "Stage": stage,
+                "Calls": totals["calls"],
+                "PromptTokens": totals["prompt"],
+                "CompletionTokens": totals["completion"]
+            } for stage, totals in sorted(self.tokens.items())]
+            cache = [{
+                "Cache": name,
+                "Hits": hits,
+                "Misses": misses,
+                "HitRate": round(hits / (hits + misses), 3) if hits + misses else None
+            } for name, (hits, misses) in sorted(self.cache.items())]
+        return {"stages": stages, "tokens": tokens, "cache": cache}
+
+    def render_prometheus(self) -> str:
+        lines = ["# TYPE finwise_stage_seconds histogram"]
+        with self.lock:
+            for stage, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    lines.append(f'finwise_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'finwise_stage_seconds_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'finwise_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            lines.append("# TYPE finwise_stage_errors_total counter")
+            for stage, count in sorted(self.errors.items()):
+                lines.append(f'finwise_stage_errors_total{{stage="{stage}"}} {count}')
+            lines.append("# TYPE finwise_llm_tokens_total counter")
+            for stage, totals in sorted(self.tokens.items()):
+                lines.append(f'finwise_llm_tokens_total{{stage="{stage}",kind="prompt"}} {totals["prompt"]}')
+                lines.append(f'finwise_llm_tokens_total{{stage="{stage}",kind="completion"}} {totals["completion"]}')
+            lines.append("# TYPE finwise_cache_requests_total counter")
+            for name, (hits, misses) in sorted(self.cache.items()):
+                lines.append(f'finwise_cache_requests_total{{cache="{name}",result="hit"}} {hits}')
+                lines.append(f'finwise_cache_requests_total{{cache="{name}",result="miss"}} {misses}')
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port: int, host: str = "0.0.0.0"):
+        if self.server is not None:
+            return self.server
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, name="finwise-metrics", daemon=True).start()
+        logger.info(f"Serving pipeline metrics on http://{host}:{port}/metrics")
+        return self.server
+
+
+pipeline_metrics = PipelineMetrics()
@@ -0,0 +1,146 @@
+from typing import Dict, Any, List, Optional
+from collections import deque
+import json
+import time
+import logging
+import threading
+from modules.metrics import pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+# Example routes file (LLM_ROUTES_FILE):
+# {
+#   "routes": {
+#     "small": {"url": "https://small.gaianet.network/v1", "model": "llama-3.2-3b", "api_key": "...",
+#               "cost_per_1k_prompt": 0.0001, "cost_per_1k_completion": 0.0002, "latency_budget": 4},
+#     "large": {"url": "https://llama.us.gaianet.network/v1", "model": "llama", "api_key": "..."}
+#   },
+#   "stages": {"query_generation": ["small", "large"], "query_validation": ["small", "large"],
+#              "answer": ["large", "small"], "default": ["large"]}
+# }
+
+
+class ModelRoute:
+    def __init__(self, name: str, client, model: str, cost_per_1k_prompt: float = 0.0, cost_per_1k_completion: float = 0.0,
+                 latency_budget: Optional[float] = None):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.cost_per_1k_prompt = cost_per_1k_prompt
+        self.cost_per_1k_completion = cost_per_1k_completion
+        self.latency_budget = latency_budget
+        self.endpoint = str(getattr(client, "base_url", name))
+
+
+class RouteStats:
+    def __init__(self, window: int):
+        self.outcomes = deque(maxlen=window)
+        self.latency = None
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.demoted_until = 0.0
+
+
+class ModelRouter:
+    # Picks the model for each pipeline stage from an ordered list of routes. A route whose recent
+    # error rate or latency is over its limit is demoted behind the others for a cooldown, then
+    # tried again; demoted routes are still used as a last resort.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.configure()
+
+    def configure(self, routes: Dict[str, ModelRoute] = None, stages: Dict[str, List[str]] = None, window: int = 20,
+                  max_error_rate: float = 0.5, min_samples: int = 5, cooldown: float = 60.0):
+        with self.lock:
+            self.routes = routes or {}
+            self.stages = stages or {}
+            self.window = window
+            self.max_error_rate = max_error_rate
+            self.min_samples = min_samples
+            self.cooldown = cooldown
+            self.stats = {name: RouteStats(window) for name in self.routes}
+        return self
+
+    def load(self, path: str, client_factory) -> "ModelRouter":
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        routes = {
+            name: ModelRoute(name, client_factory(route["url"], route.get("api_key", "")), route["model"],
+                             route.get("cost_per_1k_prompt", 0.0), route.get("cost_per_1k_completion", 0.0),
+                             route.get("latency_budget"))
+            for name, route in config["routes"].items()
+        }
+        unknown = {name for names in config.get("stages", {}).values() for name in names} - set(routes)
+        if unknown:
+            raise ValueError(f"Stages refer to unknown routes {sorted(unknown)}")
+        logger.info(f"Model routing configured with routes {sorted(routes)}")
+        return self.configure(routes, config.get("stages", {}))
+
+    def candidates(self, stage: str, client, model_name: str) -> List[ModelRoute]:
+        # Without a routes file every stage uses the client and model it was given
+        with self.lock:
+            names = self.stages.get(stage) or self.stages.get("default") or []
+            if not names:
+                name = f"{model_name}@{getattr(client, 'base_url', 'default')}"
+                if name not in self.routes:
+                    self.routes[name] = ModelRoute(name, client, model_name)
+                    self.stats[name] = RouteStats(self.window)
+                return [self.routes[name]]
+            now = time.monotonic()
+            healthy = [name for name in names if self.stats[name].demoted_until <= now]
+            demoted = [name for name in names if self.stats[name].demoted_until > now]
+            return [self.routes[name] for name in healthy + demoted]
+
+    def model_for(self, stage: str, default: str) -> str:
+        with self.lock:
+            names = self.stages.get(stage) or self.stages.get("default")
+            return self.routes[names[0]].model if names else default
+
+    def record(self, route: ModelRoute, stage: str, seconds: float, ok: bool, usage: Any = None):
+        pipeline_metrics.observe(f"llm_model_{route.name}", seconds)
+        with self.lock:
+            stats = self.stats[route.name]
+            stats.calls += 1
+            stats.outcomes.append(ok)
+            if ok:
+                stats.latency = seconds if stats.latency is None else 0.8 * stats.latency + 0.2 * seconds
+            else:
+                stats.errors += 1
+            if usage is not None:
+                prompt = getattr(usage, "prompt_tokens", 0) or 0
+                completion = getattr(usage, "completion_tokens", 0) or 0
+                stats.prompt_tokens += prompt
+                stats.completion_tokens += completion
+                stats.cost += prompt / 1000 * route.cost_per_1k_prompt + completion / 1000 * route.cost_per_1k_completion
+
+            error_rate = stats.outcomes.count(False) / len(stats.outcomes)
+            too_many_errors = len(stats.outcomes) >= self.min_samples and error_rate > self.max_error_rate
+            too_slow = route.latency_budget is not None and stats.latency is not None and stats.latency > route.latency_budget
+            if (too_many_errors or too_slow) and stats.demoted_until <= time.monotonic():
+                stats.demoted_until = time.monotonic() + self.cooldown
+                # A fresh window after the cooldown, so old failures do not demote it again at once
+                stats.outcomes.clear()
+                stats.latency = None
+                logger.warning(f"Demoting model route {route.name} after {stage} call: error rate {error_rate:.0%}, "
+                               f"latency {seconds:.2f}s")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            now = time.monotonic()
+            return [{
+                "Route": name,
+                "Model": self.routes[name].model,
+                "Calls": stats.calls,
+                "Errors": stats.errors,
+                "LatencySeconds": round(stats.latency, 3) if stats.latency is not None else None,
+                "PromptTokens": stats.prompt_tokens,
+                "CompletionTokens": stats.completion_tokens,
+                "Cost": round(stats.cost, 6),
+                "Demoted": stats.demoted_until > now
+            } for name, stats in self.stats.items()]
+
+
+model_router = ModelRouter()
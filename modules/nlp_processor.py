@@ -4,7 +4,6 @@ from spacy.matcher import Matcher
 from spacy.tokens import Span
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 nlp = spacy.load("en_core_web_md")
@@ -77,8 +76,8 @@ def extract_entities_and_intent(text: str) -> Tuple[Dict[str, Any], Dict[str, An
     # Analyze intent
     intent.update(analyze_query_intent(doc))
     
-    logger.debug(f"Extracted entities: {entities}")
-    logger.debug(f"Analyzed intent: {intent}")
+    logger.debug("Extracted entities: %s", entities)
+    logger.debug("Analyzed intent: %s", intent)
     
     return entities, intent
 
@@ -0,0 +1,85 @@
+from typing import Dict, Any, List, Callable, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+import time
+import asyncio
+import logging
+from modules.metrics import pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StageFailed(Exception):
+    def __init__(self, message: str, results: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        # Whatever the stages that did finish produced, so callers can clean up after them
+        self.results = results or {}
+
+
+class Stage:
+    def __init__(self, name: str, function: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str] = (),
+                 timeout: Optional[float] = None, critical: bool = True, fallback: Any = None):
+        self.name = name
+        self.function = function
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.critical = critical
+        self.fallback = fallback
+
+
+class PipelineExecutor:
+    # Runs each stage as soon as the stages it depends on have finished, so independent stages
+    # overlap and a request costs roughly its critical path. Stage functions are blocking and run
+    # on a thread pool; they receive the results of every stage finished so far.
+    def __init__(self, stages: List[Stage], pool: ThreadPoolExecutor, deadline: float = 60.0):
+        self.stages = {stage.name: stage for stage in stages}
+        self.pool = pool
+        self.deadline = deadline
+        for stage in stages:
+            unknown = [name for name in stage.depends_on if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {unknown}")
+
+    async def run(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        results = dict(inputs)
+        results["degraded"] = []
+        started = time.monotonic()
+        done = {}
+
+        async def run_stage(stage: Stage):
+            for name in stage.depends_on:
+                await done[name]
+            remaining = self.deadline - (time.monotonic() - started)
+            timeout = min(stage.timeout, remaining) if stage.timeout else remaining
+            stage_start = time.monotonic()
+            try:
+                if timeout <= 0:
+                    raise asyncio.TimeoutError()
+                future = asyncio.get_running_loop().run_in_executor(self.pool, stage.function, results)
+                results[stage.name] = await asyncio.wait_for(future, timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                pipeline_metrics.record_error(stage.name)
+                if stage.critical:
+                    raise StageFailed(f"{stage.name} {'timed out' if timed_out else f'failed: {e}'}", results) from e
+                # A non-critical stage degrades the answer instead of failing it
+                logger.warning(f"Stage {stage.name} {'timed out' if timed_out else f'failed: {e}'}, continuing without it")
+                results[stage.name] = stage.fallback
+                results["degraded"].append(stage.name)
+            finally:
+                pipeline_metrics.observe(stage.name, time.monotonic() - stage_start)
+
+        for name, stage in self.stages.items():
+            done[name] = asyncio.ensure_future(run_stage(stage))
+        try:
+            await asyncio.gather(*done.values())
+        except BaseException:
+            # Anything still waiting is abandoned; work already running in a thread finishes on its own
+            for task in done.values():
+                task.cancel()
+            raise
+        return results
+
+    def run_sync(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return asyncio.run(self.run(inputs))
@@ -0,0 +1,119 @@
+from typing import Dict, Any, List, Tuple
+import re
+import json
+import logging
+from modules.result_encoder import table_groups
+
+logger = logging.getLogger(__name__)
+
+PIECES = re.compile(r"\w+|[^\w\s]")
+TRUNCATION_MARKER = " [...]"
+
+
+class TokenCounter:
+    # Counts with the served model's tokenizer.json when one is configured; otherwise estimates
+    # about four characters per token with punctuation counted separately, which errs on the high side
+    def __init__(self, tokenizer_file: str = ""):
+        self.tokenizer = None
+        if tokenizer_file:
+            try:
+                from tokenizers import Tokenizer
+                self.tokenizer = Tokenizer.from_file(tokenizer_file)
+            except Exception as e:
+                logger.error(f"Could not load tokenizer {tokenizer_file}, estimating token counts instead: {e}")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        return sum(1 if len(piece) == 1 else (len(piece) + 3) // 4 for piece in PIECES.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.count(text) <= max_tokens:
+            return text
+        if max_tokens <= self.count(TRUNCATION_MARKER):
+            return ""
+        # No token is much longer than eight characters, so the prefix search can start there
+        text = text[:max_tokens * 8]
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) + self.count(TRUNCATION_MARKER) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low].rstrip() + TRUNCATION_MARKER
+
+
+class ContextBuilder:
+    # Assembles the context block of the prompt within a token budget. The system message, the
+    # question, the entities and the intent always go in; knowledge graph rows get the remaining
+    # budget first (less room for the last exchange) and recent turns, newest first, get the rest.
+    def __init__(self, counter: TokenCounter, budget: int = 3500, turn_tokens: int = 200):
+        self.counter = counter
+        self.budget = budget
+        self.turn_tokens = turn_tokens
+
+    def build(self, system_message: str, user_input: str, summary: Dict[str, Any]) -> str:
+        entities = {key: value for key, value in summary["current_entities"].items() if value}
+        header = (f"Current Entities: {json.dumps(entities, ensure_ascii=False, default=str)}\n"
+                  f"Current Intent: {json.dumps(summary['current_intent'], ensure_ascii=False, default=str)}\n")
+        remaining = self.budget - sum(self.counter.count(text) for text in (system_message, user_input, header)) - 20
+
+        turns = self.history_turns(summary["recent_history"], user_input)
+        # The last exchange is kept back from the rows so a follow-up question still has its antecedent
+        reserved = self.counter.count(turns[0]) + 1 if turns else 0
+        kg_text, used = self.kg_section(summary, remaining - reserved)
+        remaining -= used
+        history_text = self.history_section(turns, remaining)
+        return f"{header}Knowledge Graph Data:\n{kg_text}\n\nRecent Conversation History:\n{history_text}"
+
+    def kg_section(self, summary: Dict[str, Any], budget: int) -> Tuple[str, int]:
+        rows = summary.get("kg_rows")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            text = self.counter.truncate(str(summary["kg_data"]), max(budget, 0))
+            return text, self.counter.count(text)
+
+        # Room for the omission note is kept back so the section never overruns
+        budget -= 15
+        kept, used, shown, total, full = [], 0, 0, 0, False
+        for header, lines in table_groups(rows):
+            total += len(lines)
+            # A header only goes in together with at least one of its rows
+            cost = self.counter.count("\n".join(header)) + 2
+            for line in lines:
+                line_cost = self.counter.count(line) + 1
+                full = full or used + cost + line_cost > budget
+                if full:
+                    break
+                if cost:
+                    kept.extend(header)
+                    used += cost
+                    cost = 0
+                kept.append(line)
+                used += line_cost
+                shown += 1
+        if shown < total:
+            kept.append(f"({total - shown} more of {total} rows not shown)")
+        text = "\n".join(kept)
+        return text, self.counter.count(text)
+
+    def history_turns(self, history: List[Dict[str, Any]], user_input: str) -> List[str]:
+        # Newest first, each side of a turn cut to turn_tokens
+        turns = list(history)
+        if turns and turns[-1]["user_input"] == user_input:
+            # The newest entry is the question being answered, which the prompt already carries
+            turns = turns[:-1]
+        return [f"User: {self.counter.truncate(turn['user_input'], self.turn_tokens)}\n"
+                f"AI: {self.counter.truncate(turn['ai_response'], self.turn_tokens)}" for turn in reversed(turns)]
+
+    def history_section(self, turns: List[str], budget: int) -> str:
+        kept, used = [], 0
+        for text in turns:
+            cost = self.counter.count(text) + 1
+            if used + cost > budget:
+                break
+            kept.append(text)
+            used += cost
+        return "\n".join(reversed(kept))
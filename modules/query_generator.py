@@ -23,39 +23,210 @@ class QueryGenerator:
             properties: {},
             type: "relationship"
         },
-        MetricValue: {
-            count: 390,
+        HAS_SERIES: {
+            count: 12,
+            properties: {},
+            type: "relationship"
+        },
+        HAS_ANNUAL: {
+            count: 60,
+            properties: {},
+            type: "relationship"
+        },
+        AnnualMetric: {
+            count: 60,
             labels: [],
+            description: "Materialized yearly rollup per (company, metric, year)",
             properties: {
+            companyName: {
+                unique: false,
+                indexed: true,
+                type: "STRING",
+                existence: false
+            },
+            metricName: {
+                unique: false,
+                indexed: true,
+                type: "STRING",
+                existence: false
+            },
+            year: {
+                unique: false,
+                indexed: true,
+                type: "INTEGER",
+                existence: false
+            },
+            industry: {
+                unique: false,
+                indexed: false,
+                type: "STRING",
+                existence: false
+            },
+            total: {
+                unique: false,
+                indexed: false,
+                type: "FLOAT",
+                existence: false
+            },
+            average: {
+                unique: false,
+                indexed: false,
+                type: "FLOAT",
+                existence: false
+            },
+            closing: {
+                unique: false,
+                indexed: false,
+                type: "FLOAT",
+                existence: false
+            },
             value: {
                 unique: false,
                 indexed: false,
                 type: "FLOAT",
                 existence: false
             },
-            date: {
+            basis: {
                 unique: false,
                 indexed: false,
                 type: "STRING",
                 existence: false
+            },
+            complete: {
+                unique: false,
+                indexed: false,
+                type: "BOOLEAN",
+                existence: false
+            },
+            yoyDelta: {
+                unique: false,
+                indexed: false,
+                type: "FLOAT",
+                existence: false
+            },
+            yoyGrowth: {
+                unique: false,
+                indexed: false,
+                type: "FLOAT",
+                existence: false
+            },
+            overallRank: {
+                unique: false,
+                indexed: false,
+                type: "INTEGER",
+                existence: false
+            },
+            industryRank: {
+                unique: false,
+                indexed: false,
+                type: "INTEGER",
+                existence: false
             }
             },
             type: "node",
             relationships: {
+            HAS_ANNUAL: {
+                count: 60,
+                direction: "in",
+                labels: ["Series"],
+                properties: {}
+            }
+            }
+        },
+        Series: {
+            count: 12,
+            labels: [],
+            properties: {
+            companyName: {
+                unique: false,
+                indexed: true,
+                type: "STRING",
+                existence: false
+            },
+            metricName: {
+                unique: false,
+                indexed: true,
+                type: "STRING",
+                existence: false
+            },
+            latestValue: {
+                unique: false,
+                indexed: false,
+                type: "FLOAT",
+                existence: false
+            },
+            latestDate: {
+                unique: false,
+                indexed: false,
+                type: "DATE",
+                existence: false
+            }
+            },
+            type: "node",
+            relationships: {
+            HAS_SERIES: {
+                count: 12,
+                direction: "in",
+                labels: ["Company"],
+                properties: {}
+            },
             HAS_VALUE: {
                 count: 390,
-                direction: "in",
-                labels: ["Metric"],
+                direction: "out",
+                labels: ["MetricValue"],
                 properties: {}
             },
             OF_METRIC: {
-                count: 0,
+                count: 12,
                 direction: "out",
                 labels: ["Metric"],
                 properties: {}
             }
             }
         },
+        MetricValue: {
+            count: 390,
+            labels: [],
+            properties: {
+            companyName: {
+                unique: false,
+                indexed: true,
+                type: "STRING",
+                existence: false
+            },
+            metricName: {
+                unique: false,
+                indexed: true,
+                type: "STRING",
+                existence: false
+            },
+            value: {
+                unique: false,
+                indexed: false,
+                type: "FLOAT",
+                existence: false
+            },
+            date: {
+                unique: false,
+                indexed: true,
+                type: "DATE",
+                existence: false
+            }
+            },
+            indexes: [
+                "(companyName, metricName, date)",
+                "(metricName, date)"
+            ],
+            type: "node",
+            relationships: {
+            HAS_VALUE: {
+                count: 390,
+                direction: "in",
+                labels: ["Series"],
+                properties: {}
+            }
+            }
+        },
         Metric: {
             count: 6,
             labels: [],
@@ -81,28 +252,22 @@ class QueryGenerator:
             },
             type: "node",
             relationships: {
-            HAS_VALUE: {
-                count: 0,
-                direction: "out",
-                labels: ["MetricValue"],
-                properties: {}
-            },
             HAS_METRIC: {
-                count: 390,
+                count: 12,
                 direction: "in",
                 labels: ["Company"],
                 properties: {}
             },
             OF_METRIC: {
-                count: 390,
+                count: 12,
                 direction: "in",
-                labels: ["MetricValue"],
+                labels: ["Series"],
                 properties: {}
             }
             }
         },
         HAS_METRIC: {
-            count: 390,
+            count: 12,
             properties: {},
             type: "relationship"
         },
@@ -122,6 +287,18 @@ class QueryGenerator:
                 type: "STRING",
                 existence: false
             },
+            summary: {
+                unique: false,
+                indexed: false,
+                type: "STRING",
+                existence: false
+            },
+            contentHash: {
+                unique: false,
+                indexed: false,
+                type: "STRING",
+                existence: false
+            },
             date: {
                 unique: false,
                 indexed: false,
@@ -142,6 +319,50 @@ class QueryGenerator:
                 direction: "in",
                 labels: ["Company"],
                 properties: {}
+            },
+            HAS_CHUNK: {
+                count: 0,
+                direction: "out",
+                labels: ["ReportChunk"],
+                properties: {}
+            }
+            }
+        },
+        HAS_CHUNK: {
+            count: 10,
+            properties: {},
+            type: "relationship"
+        },
+        ReportChunk: {
+            count: 10,
+            labels: [],
+            properties: {
+            id: {
+                unique: true,
+                indexed: true,
+                type: "STRING",
+                existence: false
+            },
+            index: {
+                unique: false,
+                indexed: false,
+                type: "INTEGER",
+                existence: false
+            },
+            text: {
+                unique: false,
+                indexed: true,
+                type: "STRING",
+                existence: false
+            }
+            },
+            type: "node",
+            relationships: {
+            HAS_CHUNK: {
+                count: 10,
+                direction: "in",
+                labels: ["Report"],
+                properties: {}
             }
             }
         },
@@ -163,7 +384,7 @@ class QueryGenerator:
             },
             industry: {
                 unique: false,
-                indexed: false,
+                indexed: true,
                 type: "STRING",
                 existence: false
             },
@@ -193,11 +414,17 @@ class QueryGenerator:
                 direction: "out",
                 labels: ["Metric"],
                 properties: {}
+            },
+            HAS_SERIES: {
+                count: 0,
+                direction: "out",
+                labels: ["Series"],
+                properties: {}
             }
             }
         },
         OF_METRIC: {
-            count: 390,
+            count: 12,
             properties: {},
             type: "relationship"
         }
@@ -0,0 +1,131 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+from datetime import datetime
+import re
+import logging
+import threading
+from neo4j import Query, READ_ACCESS
+
+logger = logging.getLogger(__name__)
+
+RISKY_OPERATORS = ("CartesianProduct", "AllNodesScan")
+
+# The last LIMIT is the query's own only when no clause follows it
+LAST_LIMIT = re.compile(r"(?<![\w$.])LIMIT\s+(?!.*(?<![\w$.])LIMIT\b)(.+?)\s*$", re.IGNORECASE | re.DOTALL)
+CLAUSE = re.compile(r"\b(RETURN|WITH|MATCH|UNWIND|CALL|ORDER|SKIP|UNION|WHERE)\b", re.IGNORECASE)
+PARAMETER_LIMIT = re.compile(r"^(?:toInteger\(\s*)?\$([A-Za-z_][A-Za-z0-9_]*)(?:\s*\))?$", re.IGNORECASE)
+LAST_RETURN = re.compile(r"\bRETURN\b(?!.*\bRETURN\b)", re.IGNORECASE | re.DOTALL)
+
+
+class QueryRejected(Exception):
+    pass
+
+
+def walk_plan(plan: Dict[str, Any]):
+    yield plan
+    for child in plan.get("children", []):
+        yield from walk_plan(child)
+
+
+def operator_name(step: Dict[str, Any]) -> str:
+    # Operator types carry a runtime suffix, e.g. "AllNodesScan@neo4j"
+    return step.get("operatorType", "").split("@")[0]
+
+
+class QueryGuard:
+    def __init__(self, max_rows: int = 1000, scan_row_limit: int = 10000, max_estimated_rows: int = 1000000,
+                 timeout_seconds: float = 15.0, history_size: int = 500):
+        self.max_rows = max_rows
+        self.scan_row_limit = scan_row_limit
+        self.max_estimated_rows = max_estimated_rows
+        self.timeout_seconds = timeout_seconds
+        self.decisions = deque(maxlen=history_size)
+        self.lock = threading.Lock()
+
+    def rewrite(self, query: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any], Optional[str]]:
+        query = query.strip().rstrip(";").strip()
+        params = dict(params or {})
+        match = LAST_LIMIT.search(query)
+        if match is None or CLAUSE.search(match.group(1)):
+            if LAST_RETURN.search(query) is None:
+                return query, params, None
+            return f"{query}\nLIMIT {self.max_rows}", params, f"added LIMIT {self.max_rows}"
+
+        limit = match.group(1)
+        if limit.isdigit():
+            if int(limit) > self.max_rows:
+                return f"{query[:match.start(1)]}{self.max_rows}", params, f"capped LIMIT {limit} at {self.max_rows}"
+            return query, params, None
+
+        parameter = PARAMETER_LIMIT.match(limit)
+        if parameter:
+            name = parameter.group(1)
+            value = params.get(name)
+            try:
+                value = None if value is None else int(float(value))
+            except (TypeError, ValueError):
+                raise QueryRejected(f"LIMIT ${name} is not a number ({value!r})")
+            if value is None or value > self.max_rows:
+                params[name] = self.max_rows
+                return query, params, f"capped ${name} at {self.max_rows}"
+            return query, params, None
+
+        # Any other expression is evaluated by Neo4j, so the cap goes around it
+        capped = f"CASE WHEN toInteger({limit}) > {self.max_rows} THEN {self.max_rows} ELSE toInteger({limit}) END"
+        return f"{query[:match.start(1)]}{capped}", params, f"capped LIMIT {limit} at {self.max_rows}"
+
+    def inspect(self, session, query: str, params: Dict[str, Any]) -> Tuple[List[str], float, Optional[str]]:
+        plan = session.run(f"EXPLAIN {query}", params).consume().plan or {}
+        operators = []
+        peak_rows = 0.0
+        for step in walk_plan(plan):
+            name = operator_name(step)
+            rows = float(step.get("args", {}).get("EstimatedRows", 0) or 0)
+            operators.append(name)
+            peak_rows = max(peak_rows, rows)
+            if name in RISKY_OPERATORS and rows > self.scan_row_limit:
+                return operators, peak_rows, f"{name} over an estimated {int(rows)} rows"
+        if peak_rows > self.max_estimated_rows:
+            return operators, peak_rows, f"plan touches an estimated {int(peak_rows)} rows"
+        return operators, peak_rows, None
+
+    def run(self, driver, query: str, params: Dict[str, Any] = None, profiler=None) -> List[Dict[str, Any]]:
+        decision = {"timestamp": datetime.now().isoformat(), "query": query, "rewrite": None}
+        try:
+            query, params, decision["rewrite"] = self.rewrite(query, params)
+        except Exception as e:
+            self._record(decision, action="rejected", reason=f"rewrite failed: {e}")
+            raise e if isinstance(e, QueryRejected) else QueryRejected(f"the query could not be checked ({e})")
+        # Generated queries only ever read, so a read session also blocks accidental writes
+        with driver.session(default_access_mode=READ_ACCESS) as session:
+            try:
+                operators, estimated_rows, rejection = self.inspect(session, query, params)
+            except Exception as e:
+                self._record(decision, action="rejected", reason=f"EXPLAIN failed: {e}")
+                raise QueryRejected(f"the query could not be planned ({e})")
+            decision.update(operators=sorted(set(operators)), estimated_rows=int(estimated_rows))
+            if rejection:
+                self._record(decision, action="rejected", reason=rejection)
+                raise QueryRejected(f"the query would be too expensive to run ({rejection})")
+
+            self._record(decision, action="allowed", reason=None)
+            try:
+                if profiler and profiler.should_sample(query):
+                    return profiler.profile(session, query, params, self.timeout_seconds)
+                result = session.run(Query(query, timeout=self.timeout_seconds), params)
+                return [dict(record) for record in result]
+            except Exception as e:
+                if "TransactionTimedOut" not in (getattr(e, "code", None) or ""):
+                    raise
+                self._record(decision, action="timed out", reason=str(e))
+                raise QueryRejected(f"the query ran longer than {self.timeout_seconds:g} seconds")
+
+    def _record(self, decision: Dict[str, Any], action: str, reason: Optional[str]):
+        decision.update(action=action, reason=reason)
+        with self.lock:
+            self.decisions.append(decision)
+        logger.info(f"Query guard {action}: {reason or decision.get('rewrite') or 'no changes'}")
+
+    def recent_decisions(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self.lock:
+            return list(self.decisions)[-limit:]
@@ -0,0 +1,186 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import os
+import re
+import csv
+import json
+import time
+import atexit
+import random
+import hashlib
+import logging
+import threading
+from neo4j import Query
+
+logger = logging.getLogger(__name__)
+
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Schema commands and batched writes cannot be wrapped in PROFILE
+UNPROFILABLE = re.compile(r"^\s*(CREATE|DROP|SHOW)\s+(INDEX|CONSTRAINT|FULLTEXT|VECTOR)|\bIN\s+TRANSACTIONS\b|^\s*(EXPLAIN|PROFILE)\b",
+                          re.IGNORECASE)
+
+SORT_KEYS = ("total_db_hits", "max_db_hits", "max_elapsed_ms", "avg_elapsed_ms", "max_rows", "count")
+
+
+def normalize_query(query: str) -> str:
+    query = STRING_LITERAL.sub("?", query)
+    query = NUMBER_LITERAL.sub("?", query)
+    return " ".join(query.split())
+
+
+def fingerprint(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).lower().encode("utf-8")).hexdigest()[:16]
+
+
+def plan_totals(step: Dict[str, Any]) -> Dict[str, int]:
+    totals = {
+        "db_hits": step.get("dbHits", 0) or 0,
+        "page_cache_hits": step.get("pageCacheHits", 0) or 0,
+        "page_cache_misses": step.get("pageCacheMisses", 0) or 0
+    }
+    for child in step.get("children", []):
+        for key, value in plan_totals(child).items():
+            totals[key] += value
+    return totals
+
+
+class QueryProfiler:
+    # Profiles accumulate in memory and the store is rewritten at most every flush_interval
+    # seconds (and at exit), so a sampled query never waits on a full rewrite of the file
+    def __init__(self, sample_rate: float = 0.0, store_path: str = ".finwise/query_profiles.json", max_entries: int = 200,
+                 flush_interval: float = 30.0):
+        self.sample_rate = sample_rate
+        self.store_path = store_path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.entries = self._load()
+        self.dirty = False
+        self.saved_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.store_path or not os.path.exists(self.store_path):
+            return {}
+        try:
+            with open(self.store_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Could not read query profile store {self.store_path}: {e}")
+            return {}
+
+    def _save(self, text: str):
+        os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+        temporary = f"{self.store_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temporary, self.store_path)
+
+    def flush(self):
+        if not self.store_path:
+            return
+        with self.save_lock:
+            # Serialized under the entry lock, written outside it
+            with self.lock:
+                if not self.dirty:
+                    return
+                text = json.dumps(self.entries, indent=1)
+                self.dirty = False
+                self.saved_at = time.monotonic()
+            try:
+                self._save(text)
+            except Exception as e:
+                logger.error(f"Could not write query profile store {self.store_path}: {e}")
+                with self.lock:
+                    self.dirty = True
+
+    def should_sample(self, query: str) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate and not UNPROFILABLE.search(query)
+
+    def profile(self, session, query: str, params: Dict[str, Any], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        result = session.run(Query(f"PROFILE {query}", timeout=timeout), params)
+        records = [dict(record) for record in result]
+        try:
+            summary = result.consume()
+            self.record(query, summary.profile or {}, (summary.result_available_after or 0) + (summary.result_consumed_after or 0))
+        except Exception as e:
+            logger.error(f"Failed to record query profile: {e}")
+        return records
+
+    def record(self, query: str, profile: Dict[str, Any], elapsed_ms: float):
+        totals = plan_totals(profile)
+        rows = profile.get("rows", 0) or 0
+        key = fingerprint(query)
+        with self.lock:
+            entry = self.entries.get(key) or {
+                "fingerprint": key,
+                "query": normalize_query(query),
+                "count": 0,
+                "total_db_hits": 0,
+                "max_db_hits": 0,
+                "max_rows": 0,
+                "total_elapsed_ms": 0,
+                "max_elapsed_ms": 0,
+                "page_cache_hits": 0,
+                "page_cache_misses": 0
+            }
+            entry["count"] += 1
+            entry["total_db_hits"] += totals["db_hits"]
+            entry["max_db_hits"] = max(entry["max_db_hits"], totals["db_hits"])
+            entry["max_rows"] = max(entry["max_rows"], rows)
+            entry["total_elapsed_ms"] += elapsed_ms
+            entry["max_elapsed_ms"] = max(entry["max_elapsed_ms"], elapsed_ms)
+            entry["avg_elapsed_ms"] = round(entry["total_elapsed_ms"] / entry["count"], 2)
+            entry["page_cache_hits"] += totals["page_cache_hits"]
+            entry["page_cache_misses"] += totals["page_cache_misses"]
+            accesses = entry["page_cache_hits"] + entry["page_cache_misses"]
+            entry["page_cache_hit_ratio"] = round(entry["page_cache_hits"] / accesses, 4) if accesses else None
+            entry["last_seen"] = datetime.now().isoformat()
+            self.entries[key] = entry
+
+            # Keep only the worst offenders, judged by the total work they have caused
+            if len(self.entries) > self.max_entries:
+                cheapest = min(self.entries.values(), key=lambda item: item["total_db_hits"])
+                del self.entries[cheapest["fingerprint"]]
+            self.dirty = True
+            due = time.monotonic() - self.saved_at >= self.flush_interval
+        if due:
+            self.flush()
+        logger.info(f"Profiled query {key}: {totals['db_hits']} db hits, {rows} rows, {elapsed_ms} ms")
+
+    def worst(self, limit: int = 20, sort_key: str = "total_db_hits") -> List[Dict[str, Any]]:
+        with self.lock:
+            entries = list(self.entries.values())
+        return sorted(entries, key=lambda item: item.get(sort_key) or 0, reverse=True)[:limit]
+
+    def export(self, path: str, limit: int = 20, sort_key: str = "total_db_hits") -> int:
+        self.flush()
+        entries = self.worst(limit, sort_key)
+        if path.endswith(".csv"):
+            columns = ["fingerprint", "count", "total_db_hits", "max_db_hits", "max_rows", "avg_elapsed_ms",
+                       "max_elapsed_ms", "page_cache_hit_ratio", "last_seen", "query"]
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(entries)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=2)
+        return len(entries)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the most expensive profiled FinWise queries")
+    parser.add_argument("output", help="Destination file, CSV when it ends in .csv, JSON otherwise")
+    parser.add_argument("--store", default=os.environ.get("QUERY_PROFILE_STORE", ".finwise/query_profiles.json"))
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--sort", choices=SORT_KEYS, default="total_db_hits")
+    args = parser.parse_args()
+
+    exported = QueryProfiler(store_path=args.store).export(args.output, args.top, args.sort)
+    logger.info(f"Exported {exported} query profiles to {args.output}")
@@ -0,0 +1,212 @@
+from typing import Dict, Any, List, Optional
+import re
+import hashlib
+import logging
+from modules.blob_store import report_blob_properties, blob_ref_from_row
+
+logger = logging.getLogger(__name__)
+
+FULLTEXT_INDEX_NAME = "reportChunkText"
+
+LUCENE_SPECIAL_CHARS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "how", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "their", "this", "to", "was", "were", "what", "when", "which",
+    "who", "why", "with", "about", "does", "did", "do", "tell", "me", "show", "give", "report", "reports"
+}
+
+
+def split_into_chunks(content: str, chunk_size: int = 800, chunk_overlap: int = 100) -> List[str]:
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n|\n", content or "") if p.strip()]
+    sentences = []
+    for paragraph in paragraphs:
+        sentences.extend(s.strip() for s in re.split(r"(?<=[.!?])\s+", paragraph) if s.strip())
+
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        # Hard-split sentences that are longer than a whole chunk
+        while len(sentence) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:chunk_size])
+            sentence = sentence[chunk_size - chunk_overlap:]
+        if current and len(current) + len(sentence) + 1 > chunk_size:
+            chunks.append(current)
+            current = current[-chunk_overlap:].lstrip() if chunk_overlap else ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunks_hash(chunks: List[str]) -> str:
+    digest = hashlib.sha1()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def build_fulltext_query(question: str) -> str:
+    terms = [t for t in re.findall(r"[A-Za-z0-9][A-Za-z0-9&.\-]*", question) if t.lower() not in STOPWORDS]
+    escaped = [LUCENE_SPECIAL_CHARS.sub(r"\\\1", t) for t in terms]
+    return " OR ".join(dict.fromkeys(escaped))
+
+
+class ReportStore:
+    def __init__(self, db_manager, chunk_size: int = 800, chunk_overlap: int = 100, embedding_index=None, blob_store=None):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embedding_index = embedding_index
+        self.blob_store = blob_store
+
+    def create_indexes(self):
+        self.db_manager.execute_query("CREATE CONSTRAINT IF NOT EXISTS FOR (ch:ReportChunk) REQUIRE ch.id IS UNIQUE")
+        self.db_manager.execute_query(
+            f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX_NAME} IF NOT EXISTS FOR (ch:ReportChunk) ON EACH [ch.text]"
+        )
+
+    def add_report(self, company_name: str, report_type: str, date: str, content: str) -> str:
+        report_id = f"{company_name}_{report_type}_{date}"
+        if self.blob_store is not None:
+            properties = report_blob_properties(self.blob_store.put(content), content)
+        else:
+            properties = {"content": content}
+        query = """
+        MERGE (c:Company {name: $company})
+        MERGE (r:Report {id: $id})
+        SET r.type = $type, r.date = $date, r += $properties
+        MERGE (c)-[:HAS_REPORT]->(r)
+        """
+        self.db_manager.execute_query(query, {"company": company_name, "id": report_id, "type": report_type,
+                                              "date": date, "properties": properties})
+        self.ingest_report(report_id, content)
+        return report_id
+
+    def get_report_content(self, report_id: str, max_chars: Optional[int] = None) -> Optional[str]:
+        query = """
+        MATCH (r:Report {id: $id})
+        RETURN r.contentHash AS contentHash, r.contentSegment AS contentSegment,
+               r.contentOffset AS contentOffset, r.contentLength AS contentLength,
+               CASE WHEN r.contentHash IS NULL THEN r.content END AS content
+        """
+        result = self.db_manager.execute_query(query, {"id": report_id})
+        if not result:
+            return None
+        return self._resolve_content(result[0], max_chars)
+
+    def _resolve_content(self, row: Dict[str, Any], max_chars: Optional[int] = None) -> Optional[str]:
+        ref = blob_ref_from_row(row)
+        if ref is None:
+            content = row.get("content")
+            return content[:max_chars] if content and max_chars else content
+        if self.blob_store is None:
+            logger.error(f"Report body {ref['hash']} is in the blob store but no blob store is configured")
+            return None
+        # UTF-8 needs at most four bytes per character
+        return self.blob_store.read_text(ref, max_chars * 4 if max_chars else None)[:max_chars]
+
+    def ingest_report(self, report_id: str, content: str) -> int:
+        chunks = split_into_chunks(content, self.chunk_size, self.chunk_overlap)
+        query = """
+        MATCH (r:Report {id: $reportId})
+        OPTIONAL MATCH (r)-[:HAS_CHUNK]->(old:ReportChunk)
+        DETACH DELETE old
+        WITH DISTINCT r
+        SET r.chunkCount = size($chunks), r.chunkHash = $chunkHash
+        WITH r
+        UNWIND range(0, size($chunks) - 1) AS idx
+        CREATE (r)-[:HAS_CHUNK]->(:ReportChunk {id: $reportId + '#' + toString(idx), index: idx, text: $chunks[idx]})
+        """
+        # The hash tells the embedding index which reports were re-chunked since it last saw them
+        chunk_hash = chunks_hash(chunks)
+        self.db_manager.execute_query(query, {"reportId": report_id, "chunks": chunks, "chunkHash": chunk_hash})
+        logger.info(f"Stored {len(chunks)} chunks for report {report_id}")
+        if self.embedding_index is not None and chunks:
+            self._index_chunks(report_id, chunks, chunk_hash)
+        return len(chunks)
+
+    def _index_chunks(self, report_id: str, chunks: List[str], chunk_hash: str):
+        query = """
+        MATCH (r:Report {id: $reportId})
+        OPTIONAL MATCH (c:Company)-[:HAS_REPORT]->(r)
+        RETURN c.name AS company, r.date AS date
+        """
+        result = self.db_manager.execute_query(query, {"reportId": report_id})
+        meta = result[0] if result else {"company": None, "date": None}
+        self.embedding_index.add([
+            {"id": f"{report_id}#{idx}", "text": text, "company": meta["company"], "date": meta["date"],
+             "report": report_id, "version": chunk_hash}
+            for idx, text in enumerate(chunks)
+        ])
+
+    def ingest_pending_reports(self, batch_size: int = 50) -> int:
+        # chunkCount marks a report as chunked even when its body yields no chunks, so an empty
+        # report is not picked up again; a body that cannot be read is skipped for this run only
+        query = """
+        MATCH (r:Report)
+        WHERE (r.contentHash IS NOT NULL OR (r.content IS NOT NULL AND r.content <> ''))
+          AND r.chunkCount IS NULL AND NOT (r)-[:HAS_CHUNK]->(:ReportChunk)
+          AND NOT r.id IN $skipped
+        RETURN r.id AS id, r.content AS content, r.contentHash AS contentHash, r.contentSegment AS contentSegment,
+               r.contentOffset AS contentOffset, r.contentLength AS contentLength
+        LIMIT $limit
+        """
+        ingested, skipped = 0, []
+        while True:
+            reports = self.db_manager.execute_query(query, {"limit": batch_size, "skipped": skipped})
+            if not reports:
+                return ingested
+            for report in reports:
+                try:
+                    content = self._resolve_content(report)
+                except Exception as e:
+                    logger.error(f"Error reading the body of report {report['id']}: {e}")
+                    content = None
+                if content is None:
+                    logger.error(f"Could not read the body of report {report['id']}, skipping it")
+                    skipped.append(report["id"])
+                    continue
+                if self.ingest_report(report["id"], content) == 0:
+                    logger.warning(f"Report {report['id']} has no text to chunk")
+                ingested += 1
+
+    def search(self, question: str, top_k: int = 5, company_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        fulltext_query = build_fulltext_query(question)
+        if not fulltext_query:
+            return []
+        query = f"""
+        CALL db.index.fulltext.queryNodes('{FULLTEXT_INDEX_NAME}', $searchText, {{limit: $candidates}})
+        YIELD node, score
+        MATCH (c:Company)-[:HAS_REPORT]->(r:Report)-[:HAS_CHUNK]->(node)
+        WHERE $companyNames IS NULL OR c.name IN $companyNames
+        RETURN c.name AS Company, r.id AS ReportId, r.type AS ReportType, r.date AS ReportDate,
+               node.index AS ChunkIndex, node.text AS Excerpt, score AS Score
+        ORDER BY score DESC
+        LIMIT $topK
+        """
+        return self.db_manager.execute_query(query, {
+            "searchText": fulltext_query,
+            "candidates": top_k * 4,
+            "companyNames": company_names or None,
+            "topK": top_k
+        })
+
+
+if __name__ == "__main__":
+    from modules.config import AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD
+    from modules.resources import resources
+    from modules.service import create_embedding_index, create_blob_store
+    from modules.database_manager import DatabaseManager
+
+    logging.basicConfig(level=logging.INFO)
+    driver = resources.get_driver(AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD)
+    db_manager = DatabaseManager(driver)
+    store = ReportStore(db_manager, embedding_index=create_embedding_index(), blob_store=create_blob_store())
+    store.create_indexes()
+    logger.info(f"Chunked {store.ingest_pending_reports()} reports")
+    logger.info(f"Embedded {store.embedding_index.sync_from_graph(db_manager)} additional chunks")
+    driver.close()
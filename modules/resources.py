@@ -0,0 +1,191 @@
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+from collections import OrderedDict
+import time
+import atexit
+import hashlib
+import logging
+import threading
+import openai
+from neo4j import GraphDatabase
+
+logger = logging.getLogger(__name__)
+
+
+def secret_key(secret: str) -> str:
+    # Keys hold a digest so credentials never sit in plain text in the registry
+    return hashlib.sha256((secret or "").encode("utf-8")).hexdigest()
+
+
+class DriverHandle:
+    # What the registry hands out for one (uri, username, password): database managers and the
+    # cached service hold the handle, never the driver inside it. A driver that fails its health
+    # check, or belongs to a handle evicted from the registry, is retired rather than closed, and
+    # only closed once health_interval has passed, so sessions already running on it can finish.
+    def __init__(self, uri: str, username: str, password: str, health_interval: float = 60.0):
+        self.uri = uri
+        self.username = username
+        self.password = password
+        self.health_interval = health_interval
+        self.lock = threading.Lock()
+        self.driver = GraphDatabase.driver(uri, auth=(username, password))
+        self.checked = time.monotonic()
+        self.retired = []
+
+    def current(self):
+        with self.lock:
+            now = time.monotonic()
+            self._close_retired(now)
+            if self.driver is None:
+                self.driver = GraphDatabase.driver(self.uri, auth=(self.username, self.password))
+                self.checked = now
+                logger.info(f"Reopened Neo4j driver for {self.uri} as {self.username}")
+            elif now - self.checked >= self.health_interval:
+                try:
+                    self.driver.verify_connectivity()
+                except Exception as e:
+                    logger.warning(f"Neo4j driver for {self.uri} failed its health check, reconnecting: {e}")
+                    replacement = GraphDatabase.driver(self.uri, auth=(self.username, self.password))
+                    self._retire(now)
+                    self.driver = replacement
+                self.checked = now
+            return self.driver
+
+    def session(self, **kwargs):
+        return self.current().session(**kwargs)
+
+    def verify_connectivity(self):
+        return self.current().verify_connectivity()
+
+    def retire(self):
+        # The next use opens a fresh driver; the current one is closed after the grace period
+        with self.lock:
+            self._retire(time.monotonic())
+
+    def sweep(self) -> bool:
+        # Closes retired drivers past their grace period; True once nothing is left open
+        with self.lock:
+            self._close_retired(time.monotonic())
+            return self.driver is None and not self.retired
+
+    def _retire(self, now: float):
+        if self.driver is not None:
+            self.retired.append((self.driver, now))
+            self.driver = None
+
+    def _close_retired(self, now: float, force: bool = False):
+        keep = []
+        for driver, retired_at in self.retired:
+            if force or now - retired_at >= self.health_interval:
+                self._close(driver)
+            else:
+                keep.append((driver, retired_at))
+        self.retired = keep
+
+    def _close(self, driver):
+        try:
+            driver.close()
+            logger.info(f"Closed Neo4j driver for {self.uri} as {self.username}")
+        except Exception as e:
+            logger.error(f"Error closing driver for {self.uri}: {e}")
+
+    def close(self):
+        with self.lock:
+            self._retire(time.monotonic())
+            self._close_retired(time.monotonic(), force=True)
+
+
+class ResourceRegistry:
+    # Process-wide and framework independent: Streamlit reruns re-execute main.py but
+    # not the modules it imports, so one registry outlives every rerun and session
+    def __init__(self, max_drivers: int = 8, health_interval: float = 60.0):
+        self.max_drivers = max_drivers
+        self.health_interval = health_interval
+        self.lock = threading.RLock()
+        self.drivers = OrderedDict()
+        # Handles dropped from the registry may still be held by callers; their drivers are
+        # closed once retired long enough, and whatever is left at exit
+        self.evicted = []
+        self.clients = {}
+        self.shared_objects = {}
+
+    def _driver_key(self, uri: str, username: str, password: str) -> Tuple[str, str, str]:
+        return uri, username, secret_key(password)
+
+    def get_driver(self, uri: str, username: str, password: str) -> Optional[DriverHandle]:
+        key = self._driver_key(uri, username, password)
+        with self.lock:
+            self.evicted = [handle for handle in self.evicted if not handle.sweep()]
+            handle = self.drivers.get(key)
+            if handle is None:
+                try:
+                    handle = DriverHandle(uri, username, password, self.health_interval)
+                except Exception as e:
+                    logger.error(f"Error creating driver for {uri}: {e}")
+                    return None
+                self.drivers[key] = handle
+                logger.info(f"Opened Neo4j driver for {uri} as {username}")
+                # Least recently used drivers beyond the cap are retired rather than left to leak
+                while len(self.drivers) > self.max_drivers:
+                    self._evict(next(iter(self.drivers)))
+            self.drivers.move_to_end(key)
+            return handle
+
+    def _evict(self, key: Tuple[str, str, str]):
+        handle = self.drivers.pop(key, None)
+        if handle is not None:
+            handle.retire()
+            self.evicted.append(handle)
+
+    def close_driver(self, uri: str, username: str, password: str):
+        with self.lock:
+            self._evict(self._driver_key(uri, username, password))
+
+    def get_llm_client(self, base_url: str, api_key: str):
+        key = (base_url, secret_key(api_key))
+        with self.lock:
+            if key not in self.clients:
+                self.clients[key] = openai.OpenAI(base_url=base_url, api_key=api_key)
+                logger.info(f"Created LLM client for {base_url}")
+            return self.clients[key]
+
+    def get_nlp(self):
+        # spaCy loads the model when nlp_processor is first imported; this keeps that import lazy
+        from modules.nlp_processor import nlp
+        return nlp
+
+    def shared(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self.lock:
+            if key not in self.shared_objects:
+                self.shared_objects[key] = factory()
+            return self.shared_objects[key]
+
+    def health(self) -> Dict[str, Any]:
+        with self.lock:
+            handles = list(self.drivers.values())
+            status = {"llm_clients": len(self.clients), "drivers": []}
+        for handle in handles:
+            try:
+                handle.verify_connectivity()
+                healthy = True
+            except Exception:
+                healthy = False
+            status["drivers"].append({"uri": handle.uri, "username": handle.username, "healthy": healthy})
+        return status
+
+    def close(self):
+        with self.lock:
+            for handle in list(self.drivers.values()) + self.evicted:
+                handle.close()
+            self.drivers.clear()
+            self.evicted.clear()
+            for client in self.clients.values():
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.error(f"Error closing LLM client: {e}")
+            self.clients.clear()
+            self.shared_objects.clear()
+
+
+resources = ResourceRegistry()
+atexit.register(resources.close)
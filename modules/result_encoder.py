@@ -0,0 +1,94 @@
+from typing import Dict, Any, List, Optional, Tuple
+import re
+import math
+
+# Knowledge graph results go into prompts and conversation history as small markdown tables: the
+# header is written once per run of rows with the same columns, instead of repeating every key
+# on every row the way str(list_of_dicts) does. Numbers use Indian digit grouping, as the answer
+# prompt asks for, except in identifier columns such as years and ranks. The structured rows
+# stay with the caller for charts and the answer cache.
+
+IDENTIFIER_WORDS = {"year", "rank", "id", "index", "position"}
+SIGNIFICANT_DIGITS = 4
+
+
+def group_indian(digits: str) -> str:
+    # 1234567 -> 12,34,567: the last three digits, then groups of two
+    if len(digits) <= 3:
+        return digits
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return ",".join(groups + [tail])
+
+
+def is_identifier(column: Optional[str]) -> bool:
+    # Year, FiscalYear, overallRank, report_id: the last word of the name decides
+    words = re.findall(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+", column or "")
+    return bool(words) and words[-1].lower() in IDENTIFIER_WORDS
+
+
+def format_number(value: float, column: Optional[str] = None) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if is_identifier(column) and value == int(value):
+        return str(int(value))
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    if isinstance(value, int) or value == int(value) and value >= 1:
+        return sign + group_indian(str(int(round(value))))
+    # Two decimals at least, more for small values and ratios so they keep SIGNIFICANT_DIGITS
+    decimals = min(12, max(2, SIGNIFICANT_DIGITS - 1 - math.floor(math.log10(value)))) if value else 2
+    whole, fraction = f"{value:.{decimals}f}".split(".")
+    fraction = fraction.rstrip("0")
+    return sign + group_indian(whole) + ("." + fraction if fraction else "")
+
+
+def format_cell(value: Any, column: Optional[str] = None) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return format_number(value, column)
+    if isinstance(value, (list, tuple)):
+        return "; ".join(format_cell(item, column) for item in value)
+    return str(value).replace("|", "/").replace("\r", " ").replace("\n", " ")
+
+
+def deduplicate(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    seen, unique = set(), []
+    for row in rows:
+        key = tuple((name, repr(value)) for name, value in row.items())
+        if key not in seen:
+            seen.add(key)
+            unique.append(row)
+    return unique
+
+
+def table_groups(rows: List[Dict[str, Any]]) -> List[Tuple[List[str], List[str]]]:
+    # Consecutive rows with the same columns share one header; returns (header lines, row lines)
+    groups = []
+    for row in deduplicate(rows):
+        columns = list(row.keys())
+        if not groups or groups[-1][0] != columns:
+            groups.append((columns, []))
+        groups[-1][1].append("|" + "|".join(format_cell(row[column], column) for column in columns) + "|")
+    return [(["|" + "|".join(columns) + "|", "|" + "|".join("-" for _ in columns) + "|"], lines) for columns, lines in groups]
+
+
+def encode_rows(rows: List[Dict[str, Any]]) -> str:
+    if not rows:
+        return "No rows."
+    return "\n\n".join("\n".join(header + lines) for header, lines in table_groups(rows))
+
+
+def encode_result(result: Any) -> str:
+    # Rows become tables; messages (errors, rejected queries) pass through unchanged
+    if isinstance(result, list) and all(isinstance(row, dict) for row in result):
+        return encode_rows(result)
+    return str(result)
@@ -0,0 +1,143 @@
+from typing import Dict, Any, List, Iterable, Tuple
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+ROLLUP_CONSTRAINTS = [
+    "CREATE CONSTRAINT annual_metric_key IF NOT EXISTS FOR (a:AnnualMetric) REQUIRE (a.companyName, a.metricName, a.year) IS UNIQUE",
+    "CREATE INDEX annual_metric_ranking IF NOT EXISTS FOR (a:AnnualMetric) ON (a.metricName, a.year)"
+]
+
+# Flow metrics add up over a year; the others (ratios, headcount, per-share figures) are
+# compared on the year's closing value. a.value holds whichever applies, and a.basis says which.
+FLOW_METRICS = ["Revenue", "Net Profit", "EBITDA"]
+
+# A year is complete once its data reaches the last quarter, or a later year exists; a flow total
+# also needs data from the first quarter. Incomplete years get no YoY figures and no ranks.
+ANNUAL_TOTALS_QUERY = """
+UNWIND $partitions AS p
+MATCH (s:Series {companyName: p.company, metricName: p.metric})
+OPTIONAL MATCH (c:Company {name: p.company})
+CALL {
+    WITH p
+    MATCH (mv:MetricValue)
+    WHERE mv.companyName = p.company AND mv.metricName = p.metric
+      AND mv.date >= date({year: p.year, month: 1, day: 1}) AND mv.date < date({year: p.year + 1, month: 1, day: 1})
+    WITH mv ORDER BY mv.date
+    RETURN sum(mv.value) AS total, avg(mv.value) AS average, count(mv) AS points,
+           last(collect(mv.value)) AS closing, min(mv.date) AS firstDate, max(mv.date) AS lastDate
+}
+WITH p, s, c, total, average, points, closing, firstDate, lastDate, p.metric IN $flowMetrics AS flow
+OPTIONAL MATCH (later:AnnualMetric {companyName: p.company, metricName: p.metric, year: p.year + 1})
+MERGE (a:AnnualMetric {companyName: p.company, metricName: p.metric, year: p.year})
+SET a.total = total, a.average = average, a.points = points, a.closing = closing,
+    a.firstDate = firstDate, a.lastDate = lastDate, a.industry = c.industry,
+    a.value = CASE WHEN flow THEN total ELSE closing END,
+    a.basis = CASE WHEN flow THEN 'total' ELSE 'closing' END,
+    a.complete = (later IS NOT NULL OR lastDate >= date({year: p.year, month: 10, day: 1}))
+                 AND (NOT flow OR firstDate < date({year: p.year, month: 4, day: 1}))
+MERGE (s)-[:HAS_ANNUAL]->(a)
+"""
+
+# A year's change also moves the YoY figures of the following year, and completes the year before
+YOY_QUERY = """
+UNWIND $partitions AS p
+UNWIND [p.year, p.year + 1] AS year
+MATCH (a:AnnualMetric {companyName: p.company, metricName: p.metric, year: year})
+OPTIONAL MATCH (previous:AnnualMetric {companyName: p.company, metricName: p.metric, year: year - 1})
+SET previous.complete = (previous.basis = 'closing' OR previous.firstDate < date({year: previous.year, month: 4, day: 1}))
+WITH a, previous, a.complete AND previous.complete AS comparable
+SET a.yoyDelta = CASE WHEN comparable THEN a.value - previous.value END,
+    a.yoyGrowth = CASE WHEN comparable AND previous.value <> 0 THEN (a.value - previous.value) / abs(previous.value) END
+"""
+
+LATEST_VALUE_QUERY = """
+UNWIND $series AS p
+MATCH (s:Series {companyName: p.company, metricName: p.metric})
+CALL {
+    WITH p
+    MATCH (mv:MetricValue)
+    WHERE mv.companyName = p.company AND mv.metricName = p.metric
+    RETURN mv ORDER BY mv.date DESC LIMIT 1
+}
+SET s.latestValue = mv.value, s.latestDate = mv.date
+"""
+
+RANK_QUERY = """
+UNWIND $rankPartitions AS p
+MATCH (a:AnnualMetric {metricName: p.metric, year: p.year})
+WITH p, a ORDER BY a.value DESC
+WITH p, collect(a) AS annual
+FOREACH (partial IN [x IN annual WHERE NOT coalesce(x.complete, false)] | SET partial.overallRank = null)
+WITH p, [x IN annual WHERE x.complete] AS ranked
+UNWIND range(0, size(ranked) - 1) AS position
+WITH ranked[position] AS a, position
+SET a.overallRank = position + 1
+"""
+
+INDUSTRY_RANK_QUERY = """
+UNWIND $rankPartitions AS p
+MATCH (a:AnnualMetric {metricName: p.metric, year: p.year})
+WHERE a.industry IS NOT NULL
+WITH p, a ORDER BY a.value DESC
+WITH p, a.industry AS industry, collect(a) AS annual
+FOREACH (partial IN [x IN annual WHERE NOT coalesce(x.complete, false)] | SET partial.industryRank = null)
+WITH p, industry, [x IN annual WHERE x.complete] AS ranked
+UNWIND range(0, size(ranked) - 1) AS position
+WITH ranked[position] AS a, position
+SET a.industryRank = position + 1
+"""
+
+def record_year(date: Any) -> int:
+    return int(str(date)[:4]) if date else datetime.now().year
+
+
+def partitions_for_records(records: Iterable[Dict[str, Any]]) -> List[Tuple[str, str, int]]:
+    return sorted({(record["company"], record["metric"], record_year(record.get("date"))) for record in records})
+
+
+def create_rollup_indexes(db_manager):
+    for statement in ROLLUP_CONSTRAINTS:
+        db_manager.execute_query(statement)
+
+
+def refresh_rollups(db_manager, partitions: List[Tuple[str, str, int]]):
+    for start in range(0, len(partitions), BATCH_SIZE):
+        batch = partitions[start:start + BATCH_SIZE]
+        params = {
+            "partitions": [{"company": c, "metric": m, "year": y} for c, m, y in batch],
+            "flowMetrics": FLOW_METRICS,
+            "series": [{"company": c, "metric": m} for c, m in sorted({(c, m) for c, m, _ in batch})],
+            # The year before may have just become complete
+            "rankPartitions": [{"metric": m, "year": y} for m, y in sorted({(m, year) for _, m, y in batch for year in (y - 1, y)})]
+        }
+        db_manager.execute_query(ANNUAL_TOTALS_QUERY, params)
+        db_manager.execute_query(YOY_QUERY, params)
+        db_manager.execute_query(LATEST_VALUE_QUERY, params)
+        db_manager.execute_query(RANK_QUERY, params)
+        db_manager.execute_query(INDUSTRY_RANK_QUERY, params)
+    logger.info(f"Refreshed rollups for {len(partitions)} (company, metric, year) partitions")
+
+
+def rebuild_rollups(db_manager):
+    create_rollup_indexes(db_manager)
+    db_manager.execute_query("MATCH (a:AnnualMetric) CALL { WITH a DETACH DELETE a } IN TRANSACTIONS OF 5000 ROWS")
+    rows = db_manager.execute_query("""
+    MATCH (s:Series)-[:HAS_VALUE]->(mv:MetricValue)
+    RETURN DISTINCT s.companyName AS company, s.metricName AS metric, mv.date.year AS year
+    """)
+    refresh_rollups(db_manager, sorted((row["company"], row["metric"], row["year"]) for row in rows))
+
+
+if __name__ == "__main__":
+    from modules.config import AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD
+    from modules.resources import resources
+    from modules.database_manager import DatabaseManager
+
+    logging.basicConfig(level=logging.INFO)
+    driver = resources.get_driver(AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD)
+    rebuild_rollups(DatabaseManager(driver))
+    driver.close()
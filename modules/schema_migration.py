@@ -0,0 +1,163 @@
+from typing import Dict, Any, List
+import logging
+from modules.rollups import ROLLUP_CONSTRAINTS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+BATCH_ROWS = 5000
+
+CONSTRAINTS = [
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (c:Company) REQUIRE c.name IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (m:Metric) REQUIRE m.name IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (r:Report) REQUIRE r.id IS UNIQUE",
+    "CREATE CONSTRAINT series_key IF NOT EXISTS FOR (s:Series) REQUIRE (s.companyName, s.metricName) IS UNIQUE"
+]
+
+INDEXES = [
+    # Trend questions: one company and metric over a date range
+    "CREATE INDEX metric_value_series IF NOT EXISTS FOR (mv:MetricValue) ON (mv.companyName, mv.metricName, mv.date)",
+    # Ranking questions: one metric on a date across companies
+    "CREATE INDEX metric_value_ranking IF NOT EXISTS FOR (mv:MetricValue) ON (mv.metricName, mv.date)",
+    "CREATE INDEX company_industry IF NOT EXISTS FOR (c:Company) ON (c.industry)",
+    # Incremental loads of everything newer than a watermark
+    "CREATE INDEX metric_value_date IF NOT EXISTS FOR (mv:MetricValue) ON (mv.date)"
+]
+
+MIGRATION_STEPS = [
+    ("denormalize company-linked values", f"""
+    MATCH (c:Company)-[:HAS_METRIC]->(mv:MetricValue)-[:OF_METRIC]->(m:Metric)
+    WHERE mv.companyName IS NULL
+    CALL {{
+        WITH c, mv, m
+        SET mv.companyName = c.name, mv.metricName = m.name
+    }} IN TRANSACTIONS OF {BATCH_ROWS} ROWS
+    """),
+    ("denormalize metric names", f"""
+    MATCH (m:Metric)-[:HAS_VALUE]->(mv:MetricValue)
+    WHERE mv.metricName IS NULL
+    CALL {{
+        WITH m, mv
+        SET mv.metricName = m.name
+    }} IN TRANSACTIONS OF {BATCH_ROWS} ROWS
+    """),
+    ("type dates", f"""
+    MATCH (mv:MetricValue)
+    WHERE toString(mv.date) = mv.date
+    CALL {{
+        WITH mv
+        SET mv.date = date(left(mv.date, 10))
+    }} IN TRANSACTIONS OF {BATCH_ROWS} ROWS
+    """),
+    ("build series", f"""
+    MATCH (mv:MetricValue)
+    WHERE mv.companyName IS NOT NULL AND mv.metricName IS NOT NULL AND NOT (:Series)-[:HAS_VALUE]->(mv)
+    CALL {{
+        WITH mv
+        MATCH (c:Company {{name: mv.companyName}}), (m:Metric {{name: mv.metricName}})
+        MERGE (s:Series {{companyName: mv.companyName, metricName: mv.metricName}})
+        MERGE (c)-[:HAS_SERIES]->(s)
+        MERGE (s)-[:OF_METRIC]->(m)
+        CREATE (s)-[:HAS_VALUE]->(mv)
+    }} IN TRANSACTIONS OF {BATCH_ROWS} ROWS
+    """),
+    ("drop legacy value edges", f"""
+    MATCH (s:Series)-[:HAS_VALUE]->(mv:MetricValue)-[r]-(other)
+    WHERE other:Metric OR other:Company
+    CALL {{
+        WITH r
+        DELETE r
+    }} IN TRANSACTIONS OF {BATCH_ROWS} ROWS
+    """),
+    ("deduplicate HAS_METRIC", f"""
+    MATCH (c:Company)-[r:HAS_METRIC]->(m:Metric)
+    WITH c, m, collect(r) AS rels
+    WHERE size(rels) > 1
+    UNWIND tail(rels) AS duplicate
+    CALL {{
+        WITH duplicate
+        DELETE duplicate
+    }} IN TRANSACTIONS OF {BATCH_ROWS} ROWS
+    """),
+    ("link companies to metrics", """
+    MATCH (c:Company)-[:HAS_SERIES]->(:Series)-[:OF_METRIC]->(m:Metric)
+    MERGE (c)-[:HAS_METRIC]->(m)
+    """)
+]
+
+
+def run_statement(db_manager, statement: str, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    # Unlike execute_query this raises, so a failed step stops the migration before the version is recorded
+    with db_manager.driver.session() as session:
+        return [dict(record) for record in session.run(statement, params or {})]
+
+
+def create_constraints_and_indexes(db_manager):
+    # The AnnualMetric rollups are written on every load, so their keys exist from the first bootstrap
+    for statement in CONSTRAINTS + ROLLUP_CONSTRAINTS + INDEXES:
+        run_statement(db_manager, statement)
+    run_statement(db_manager, "CALL db.awaitIndexes(300)")
+
+
+def get_schema_version(db_manager) -> int:
+    result = db_manager.execute_query("MATCH (v:SchemaVersion {name: 'finwise'}) RETURN v.version AS version")
+    return result[0]["version"] if result else 1
+
+
+def migrate(db_manager) -> Dict[str, Any]:
+    create_constraints_and_indexes(db_manager)
+    # Every step only touches what is not migrated yet, so a failed migration is simply run again
+    for name, statement in MIGRATION_STEPS:
+        logger.info(f"Schema migration step: {name}")
+        try:
+            run_statement(db_manager, statement)
+        except Exception as e:
+            logger.error(f"Schema migration step '{name}' failed, the schema version stays unchanged: {e}")
+            raise
+
+    result = run_statement(db_manager, "MATCH (mv:MetricValue) WHERE NOT (:Series)-[:HAS_VALUE]->(mv) RETURN count(mv) AS count")
+    orphaned = result[0]["count"] if result else 0
+    if orphaned:
+        # The original updater never linked values to their company, so these cannot be attributed
+        logger.warning(f"{orphaned} MetricValue nodes have no company and were left out of the series layout; "
+                       f"re-run the updater to regenerate them")
+
+    run_statement(db_manager, "MERGE (v:SchemaVersion {name: 'finwise'}) SET v.version = $version", {"version": SCHEMA_VERSION})
+    return {"schema_version": SCHEMA_VERSION, "orphaned_values": orphaned}
+
+
+def build_compact_series(db_manager):
+    # Rebuilds the optional dates/values arrays on every Series from its MetricValue nodes
+    db_manager.execute_query("""
+    MATCH (s:Series)
+    CALL {
+        WITH s
+        MATCH (s)-[:HAS_VALUE]->(mv:MetricValue)
+        WITH s, mv ORDER BY mv.date
+        WITH s, collect(duration.inDays(date('1970-01-01'), mv.date).days) AS dates, collect(toFloat(mv.value)) AS values
+        SET s.dates = dates, s.values = values, s.compactVersion = coalesce(s.compactVersion, 0) + 1
+    } IN TRANSACTIONS OF 500 ROWS
+    """)
+
+
+def bootstrap(db_manager) -> Dict[str, Any]:
+    if get_schema_version(db_manager) >= SCHEMA_VERSION:
+        create_constraints_and_indexes(db_manager)
+        return {"schema_version": SCHEMA_VERSION, "orphaned_values": 0}
+    return migrate(db_manager)
+
+
+if __name__ == "__main__":
+    import sys
+    from modules.config import AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD
+    from modules.resources import resources
+    from modules.database_manager import DatabaseManager
+
+    logging.basicConfig(level=logging.INFO)
+    driver = resources.get_driver(AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD)
+    db_manager = DatabaseManager(driver)
+    logger.info(f"Schema bootstrap finished: {bootstrap(db_manager)}")
+    if "--compact-series" in sys.argv:
+        build_compact_series(db_manager)
+        logger.info("Compact series arrays rebuilt")
+    driver.close()
@@ -0,0 +1,599 @@
+from typing import Dict, Any, List, Iterator, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import time
+import asyncio
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+from modules.config import (
+    AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD, GAIA_NODE_URL, GAIA_NODE_NAME, GAIA_NODE_API_KEY,
+    REPORT_EXCERPT_LIMIT, EMBEDDING_INDEX_DIR, EMBEDDING_SYNC_SECONDS, REPORT_BLOB_DIR, FORECAST_HORIZON, ANALYTICS_REFRESH_SECONDS,
+    ANALYTICS_FULL_REFRESH_SECONDS, COMPACT_SERIES, REPORT_TEXT_CHARS, QUERY_MAX_ROWS, QUERY_SCAN_ROW_LIMIT, QUERY_MAX_ESTIMATED_ROWS,
+    QUERY_TIMEOUT_SECONDS, QUERY_PROFILE_SAMPLE_RATE, QUERY_PROFILE_STORE, METRICS_JSONL_PATH, METRICS_PORT,
+    AUDIT_LOG_PATH, AUDIT_SAMPLE_RATE, AUDIT_MAX_FIELD_CHARS, AUDIT_MAX_FILE_MB, AUDIT_BACKUP_COUNT,
+    INSIGHT_REFRESH_SECONDS, FULL_REPORT_PHRASES, API_MAX_CONVERSATIONS, PIPELINE_DEADLINE_SECONDS,
+    PIPELINE_STAGE_THREADS, ANALYTICS_STAGE_TIMEOUT, REPORT_STAGE_TIMEOUT, PLANNER_STAGE_TIMEOUT, PLANNER_MAX_CONCURRENCY,
+    ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_REDIS_URL, ANSWER_CACHE_VERSION_SECONDS,
+    COALESCE_TIMEOUT_SECONDS, LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_BURST, LLM_INTERACTIVE_RESERVED,
+    LLM_MAX_WAIT_INTERACTIVE, LLM_MAX_WAIT_BACKGROUND, LLM_MAX_WAIT_BULK, LLM_ROUTES_FILE, CONVERSATION_DB_PATH
+)
+from modules.database_manager import DatabaseManager
+from modules.conversation_manager import Conversation, ConversationContext
+from modules.conversation_store import ConversationStore
+from modules.nlp_processor import extract_entities_and_intent
+from modules.query_generator import QueryGenerator
+from modules.chatbot import chatbot_with_context, chatbot_stream_with_context, chatbot_no_context, FailedAnswer, INTERRUPTED_MESSAGE
+from modules.tabular_recognizer import TabularMetricRecognizer, RecognitionResult
+from modules.report_store import ReportStore
+from modules.blob_store import BlobStore
+from modules.embedding_index import ChunkEmbeddingIndex, SpacyEmbedder, fetch_chunk_excerpts
+from modules.analytics_engine import MetricAnalyticsEngine, parse_year_bound
+from modules.trend_engine import Series, series_from_rows, summarize_series
+from modules.query_guard import QueryGuard, QueryRejected
+from modules.query_profiler import QueryProfiler
+from modules.metrics import pipeline_metrics
+from modules.audit_log import audit_log
+from modules.resources import resources
+from modules.insight_scheduler import InsightScheduler
+from modules.pipeline_executor import PipelineExecutor, Stage, StageFailed
+from modules.comparison_planner import ComparisonPlanner
+from modules.answer_cache import AnswerCache
+from modules.single_flight import SingleFlight, Flight, FlightFailed
+from modules.llm_scheduler import LLMScheduler, llm_scheduler, Overloaded, OVERLOADED_MESSAGE
+from modules.model_router import ModelRouter, model_router
+from modules.result_encoder import encode_result
+
+logger = logging.getLogger(__name__)
+
+
+def start_telemetry():
+    def configure():
+        pipeline_metrics.configure(METRICS_JSONL_PATH or None)
+        if METRICS_PORT:
+            pipeline_metrics.start_http_server(METRICS_PORT)
+        audit_log.configure(AUDIT_LOG_PATH, AUDIT_SAMPLE_RATE, AUDIT_MAX_FIELD_CHARS, AUDIT_MAX_FILE_MB * 1024 * 1024, AUDIT_BACKUP_COUNT)
+        return pipeline_metrics
+    return resources.shared("telemetry", configure)
+
+
+def create_embedding_index() -> ChunkEmbeddingIndex:
+    return ChunkEmbeddingIndex(EMBEDDING_INDEX_DIR, SpacyEmbedder(resources.get_nlp()))
+
+
+def create_blob_store() -> BlobStore:
+    return BlobStore(REPORT_BLOB_DIR) if REPORT_BLOB_DIR else None
+
+
+def create_query_guard() -> QueryGuard:
+    return QueryGuard(QUERY_MAX_ROWS, QUERY_SCAN_ROW_LIMIT, QUERY_MAX_ESTIMATED_ROWS, QUERY_TIMEOUT_SECONDS)
+
+
+def get_query_profiler() -> Optional[QueryProfiler]:
+    # Shared across sessions so every sampled query lands in the same bounded store
+    if QUERY_PROFILE_SAMPLE_RATE <= 0:
+        return None
+    return resources.shared("query_profiler", lambda: QueryProfiler(QUERY_PROFILE_SAMPLE_RATE, QUERY_PROFILE_STORE))
+
+
+def create_database_manager(driver) -> DatabaseManager:
+    return DatabaseManager(driver, COMPACT_SERIES, query_guard=create_query_guard(), profiler=get_query_profiler())
+
+
+def get_conversation_store() -> ConversationStore:
+    return resources.shared(("conversation_store", CONVERSATION_DB_PATH), lambda: ConversationStore(CONVERSATION_DB_PATH))
+
+
+def get_query_generator(client) -> QueryGenerator:
+    return resources.shared(("query_generator", GAIA_NODE_URL, GAIA_NODE_NAME), lambda: QueryGenerator(client, GAIA_NODE_NAME))
+
+
+class ConversationRegistry:
+    # Conversation state for API clients, which unlike Streamlit sessions carry nothing between requests
+    def __init__(self, max_conversations: int = API_MAX_CONVERSATIONS):
+        self.max_conversations = max_conversations
+        self.lock = threading.Lock()
+        self.conversations = OrderedDict()
+        self.conversation_locks = {}
+
+    def get(self, conversation_id: Optional[str] = None) -> Optional[Conversation]:
+        # Ids are only ever issued here, so an unknown or evicted id is None rather than a new
+        # conversation under a name the client picked
+        with self.lock:
+            if conversation_id:
+                conversation = self.conversations.get(conversation_id)
+                if conversation is None:
+                    return None
+            else:
+                conversation = Conversation()
+                self.conversations[conversation.id] = conversation
+                self.conversation_locks[conversation.id] = asyncio.Lock()
+                while len(self.conversations) > self.max_conversations:
+                    evicted, _ = self.conversations.popitem(last=False)
+                    self.conversation_locks.pop(evicted, None)
+            self.conversations.move_to_end(conversation.id)
+            # Nothing persists these conversations, so the store's change log is not kept
+            conversation.context.events.clear()
+            return conversation
+
+    def lock_for(self, conversation_id: str) -> asyncio.Lock:
+        # Requests for one conversation run one at a time; different conversations run in parallel.
+        # Awaited on the event loop, so a queued request holds no worker thread while it waits.
+        with self.lock:
+            return self.conversation_locks.setdefault(conversation_id, asyncio.Lock())
+
+    def delete(self, conversation_id: str) -> bool:
+        with self.lock:
+            self.conversation_locks.pop(conversation_id, None)
+            return self.conversations.pop(conversation_id, None) is not None
+
+
+class FinWiseService:
+    def __init__(self, db_manager: DatabaseManager, client, model_name: str, query_generator: QueryGenerator,
+                 blob_store: BlobStore = None):
+        self.db_manager = db_manager
+        self.client = client
+        self.model_name = model_name
+        self.query_generator = query_generator
+        self.blob_store = blob_store
+        self.analytics = MetricAnalyticsEngine(db_manager, ANALYTICS_REFRESH_SECONDS, ANALYTICS_FULL_REFRESH_SECONDS, FORECAST_HORIZON)
+        self.answer_cache = AnswerCache(db_manager, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES,
+                                        ANSWER_CACHE_REDIS_URL, ANSWER_CACHE_VERSION_SECONDS)
+        self.flights = SingleFlight(COALESCE_TIMEOUT_SECONDS)
+        self.insight_scheduler = None
+        self.embedding_index = None
+        self.embedding_checked = 0.0
+        self.embedding_sync_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=PIPELINE_STAGE_THREADS, thread_name_prefix="finwise-stage")
+        self.planner = ComparisonPlanner(db_manager, ThreadPoolExecutor(max_workers=PLANNER_MAX_CONCURRENCY, thread_name_prefix="finwise-planner"))
+        # Extraction and the analytics refresh have no dependency on each other, and report
+        # retrieval runs alongside the analytics lookup and query generation. Comparisons the
+        # analytics store could not answer go to the planner before falling back to a generated query.
+        # A cached or already running answer for the same canonical question skips every stage after extraction.
+        self.executor = PipelineExecutor([
+            Stage("nlp", lambda results: extract_entities_and_intent(results["question"])),
+            Stage("answer_cache", self._answer_cache_stage, depends_on=("nlp",), critical=False),
+            Stage("analytics_refresh", lambda results: self.analytics.refresh_if_stale(),
+                  timeout=ANALYTICS_STAGE_TIMEOUT, critical=False),
+            Stage("analytics", self._analytics_stage, depends_on=("answer_cache", "analytics_refresh"),
+                  timeout=ANALYTICS_STAGE_TIMEOUT, critical=False),
+            Stage("reports", self._reports_stage, depends_on=("answer_cache",), timeout=REPORT_STAGE_TIMEOUT, critical=False),
+            Stage("planner", self._planner_stage, depends_on=("analytics",), timeout=PLANNER_STAGE_TIMEOUT, critical=False),
+            Stage("knowledge_graph", self._knowledge_graph_stage, depends_on=("planner",))
+        ], self.pool, PIPELINE_DEADLINE_SECONDS)
+
+    def insights(self) -> InsightScheduler:
+        with self.lock:
+            if self.insight_scheduler is None:
+                self.insight_scheduler = InsightScheduler(self.db_manager, self.client, self.model_name, INSIGHT_REFRESH_SECONDS).start()
+            return self.insight_scheduler
+
+    def latest_insight(self) -> Optional[Dict[str, Any]]:
+        return self.insights().latest()
+
+    def get_embedding_index(self) -> ChunkEmbeddingIndex:
+        with self.lock:
+            if self.embedding_index is None:
+                self.embedding_index = create_embedding_index()
+            index = self.embedding_index
+        # One request syncs at a time; the others search the index as it stands
+        due = time.monotonic() - self.embedding_checked >= EMBEDDING_SYNC_SECONDS
+        if due and self.embedding_sync_lock.acquire(blocking=False):
+            try:
+                self._sync_embedding_index(index)
+            finally:
+                self.embedding_sync_lock.release()
+        return index
+
+    def _sync_embedding_index(self, index: ChunkEmbeddingIndex):
+        # Reports are chunked wherever they are ingested (the updater, the report store CLI), so the
+        # index compares its report versions with the graph and re-embeds whatever changed
+        self.embedding_checked = time.monotonic()
+        try:
+            added = index.sync_from_graph(self.db_manager)
+            if added:
+                logger.info(f"Embedding index synced, {added} new chunks, {len(index)} total")
+        except Exception as e:
+            logger.error(f"Embedding index sync failed: {e}")
+
+    def recognize_table(self, table: pd.DataFrame) -> Optional[RecognitionResult]:
+        return TabularMetricRecognizer(self.db_manager.get_metric_units()).recognize(table)
+
+    def ingest(self, records: List[Dict[str, Any]]) -> int:
+        with pipeline_metrics.stage("ingest"):
+            self.db_manager.add_metric_values(records)
+            # Uploads are often history older than the store's watermark, so they are merged as-is
+            self.analytics.add_records(records)
+        self.answer_cache.invalidate()
+        self.insights().trigger()
+        return len(records)
+
+    def analyze_upload(self, prompt: str) -> str:
+        # Bulk work, so the LLM scheduler queues it behind users' questions
+        try:
+            with pipeline_metrics.stage("upload_analysis"):
+                return chatbot_no_context(prompt, self.client, self.model_name, stage="upload_analysis")
+        except Overloaded:
+            return OVERLOADED_MESSAGE
+
+    def ask(self, question: str, context: ConversationContext) -> Dict[str, Any]:
+        return asyncio.run(self.ask_async(question, context))
+
+    async def ask_async(self, question: str, context: ConversationContext) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        with pipeline_metrics.stage("pipeline"):
+            result = await self.retrieve_async(question, context)
+            flight = result["flight"]
+            try:
+                if result["cached_at"] is None:
+                    answer = None
+                    if flight and not result["leader"]:
+                        answer = await asyncio.to_thread(flight.wait_answer, COALESCE_TIMEOUT_SECONDS)
+                        if answer is None:
+                            self.flights.abandon(flight)
+                    if answer is None:
+                        with pipeline_metrics.stage("answer"):
+                            answer = await loop.run_in_executor(self.pool, chatbot_with_context, question, context, self.client, self.model_name)
+                    result["answer"] = answer
+            except BaseException:
+                if result["leader"]:
+                    self.flights.fail(flight)
+                raise
+            self._complete(result)
+        context.update_ai_response(result["answer"])
+        return result
+
+    def stream(self, question: str, context: ConversationContext) -> Iterator[str]:
+        with pipeline_metrics.stage("pipeline"):
+            result = asyncio.run(self.retrieve_async(question, context))
+            flight = result["flight"]
+            if result["cached_at"] is not None:
+                source = iter([result["answer"]])
+            elif flight and not result["leader"]:
+                source = self._follow_stream(question, context, flight)
+            else:
+                source = self._stream_answer(question, context, flight)
+            parts = []
+            try:
+                for part in source:
+                    parts.append(part)
+                    yield part
+            except BaseException:
+                # Includes the client going away mid-stream; followers then finish on their own
+                if result["leader"]:
+                    self.flights.fail(flight)
+                raise
+            answer = "".join(parts)
+            result["answer"] = FailedAnswer(answer) if any(isinstance(part, FailedAnswer) for part in parts) else answer
+            self._complete(result)
+        context.update_ai_response(result["answer"])
+
+    def _stream_answer(self, question: str, context: ConversationContext, flight: Flight = None) -> Iterator[str]:
+        with pipeline_metrics.stage("answer"):
+            for part in chatbot_stream_with_context(question, context, self.client, self.model_name):
+                # Followers are not handed an error notice; they answer for themselves once this fails
+                if flight and not isinstance(part, FailedAnswer):
+                    flight.publish(part)
+                yield part
+
+    def _follow_stream(self, question: str, context: ConversationContext, flight: Flight) -> Iterator[str]:
+        streamed = False
+        try:
+            for part in flight.stream(COALESCE_TIMEOUT_SECONDS):
+                streamed = True
+                yield part
+        except FlightFailed as e:
+            logger.warning(f"Shared answer failed: {e}")
+            self.flights.abandon(flight)
+            if streamed:
+                yield FailedAnswer(INTERRUPTED_MESSAGE)
+            else:
+                yield from self._stream_answer(question, context)
+
+    async def retrieve_async(self, question: str, context: ConversationContext, coalesce: bool = True) -> Dict[str, Any]:
+        # The answer cache stage records the flights it leads here, so they are failed whatever goes
+        # wrong before the result is handed back, cancellation included; followers then stop waiting
+        led = []
+        try:
+            return await self._retrieve_async(question, context, coalesce, led)
+        except BaseException:
+            for flight in led:
+                self.flights.fail(flight)
+            raise
+
+    async def _retrieve_async(self, question: str, context: ConversationContext, coalesce: bool, led: List[Flight]) -> Dict[str, Any]:
+        # Everything up to the answer: extraction, then the analytics store or a generated query
+        try:
+            results = await self.executor.run({"question": question, "coalesce": coalesce, "led": led})
+        except StageFailed as e:
+            logger.error(f"Question pipeline failed: {e}")
+            for flight in led:
+                self.flights.fail(flight)
+            data = "I couldn't finish looking up the data for this question in time. Please try again or ask something narrower."
+            self._update_conversation_context(context, question, {}, {}, data)
+            return {"entities": {}, "intent": {}, "data": data, "source": "none", "degraded": [str(e)], "cached_at": None,
+                    "cache_key": None, "flight": None, "leader": False}
+
+        entities, intent = results["nlp"]
+        cache_key, cached, flight, leader = results["answer_cache"] or (None, None, None, False)
+        if cached:
+            logger.info(f"Answered '{intent.get('action')}' intent from the answer cache ({cached['cached_at']})")
+            self._update_conversation_context(context, question, entities, intent, cached["data"])
+            return {"entities": entities, "intent": intent, "data": cached["data"], "source": "cache", "degraded": results["degraded"],
+                    "answer": cached["answer"], "cached_at": cached["cached_at"], "cache_key": cache_key, "flight": None, "leader": False}
+
+        if flight and not leader:
+            shared = await asyncio.to_thread(flight.wait_data, COALESCE_TIMEOUT_SECONDS)
+            if shared is None:
+                # The leader failed or stalled before its data was ready, so this request looks it up itself
+                self.flights.abandon(flight)
+                return await self.retrieve_async(question, context, coalesce=False)
+            self._update_conversation_context(context, question, entities, intent, shared["data"])
+            return {"entities": entities, "intent": intent, "data": shared["data"], "source": shared["source"], "degraded": shared["degraded"],
+                    "cached_at": None, "cache_key": cache_key, "flight": flight, "leader": False}
+
+        pipeline_metrics.record_cache("analytics_store", bool(results["analytics"]))
+        if results["analytics"]:
+            logger.info(f"Answered '{intent.get('action')}' intent from the analytics store")
+            data = results["analytics"]
+            source = "analytics"
+        elif results["planner"]:
+            logger.info(f"Answered '{intent.get('action')}' intent from planned sub-queries")
+            data = results["planner"]
+            source = "planner"
+        else:
+            data = results["knowledge_graph"]
+            source = "knowledge_graph"
+            if isinstance(data, list):
+                excerpts = results["reports"]
+                if excerpts is None and self._needs_reports(question, data) and "reports" not in results["degraded"]:
+                    # Result rows pointed at reports the question itself did not mention
+                    with pipeline_metrics.stage("report_retrieval"):
+                        excerpts = await asyncio.get_running_loop().run_in_executor(self.pool, self._report_excerpts, question, entities)
+                data = self._merge_report_rows(question, data, excerpts or [])
+                if "reports" in results["degraded"]:
+                    data.append({"Note": "Report excerpts could not be retrieved in time; this answer uses metric data only."})
+        self._update_conversation_context(context, question, entities, intent, data)
+        if leader:
+            flight.publish_data({"data": data, "source": source, "degraded": results["degraded"]})
+        return {"entities": entities, "intent": intent, "data": data, "source": source, "degraded": results["degraded"],
+                "cached_at": None, "cache_key": cache_key, "flight": flight, "leader": leader}
+
+    def _answer_cache_stage(self, results: Dict[str, Any]):
+        entities, intent = results["nlp"]
+        key = self.answer_cache.key(entities, intent, model_router.model_for("answer", self.model_name))
+        cached = self.answer_cache.get(key)
+        if cached or key is None or not results["coalesce"]:
+            return key, cached, None, False
+        # An identical question already in flight is followed instead of computed again
+        flight, leader = self.flights.join(key)
+        if leader:
+            results["led"].append(flight)
+        pipeline_metrics.record_cache("single_flight", not leader)
+        return key, None, flight, leader
+
+    def _complete(self, result: Dict[str, Any]):
+        failed = isinstance(result["answer"], FailedAnswer)
+        if result["leader"]:
+            if failed:
+                # Followers then answer for themselves rather than repeat the error
+                self.flights.fail(result["flight"])
+            else:
+                self.flights.finish(result["flight"], result["answer"])
+        # Followers share an answer their leader has already cached
+        if not failed and (result["flight"] is None or result["leader"]):
+            self._cache_answer(result)
+
+    def _cache_answer(self, result: Dict[str, Any]):
+        # Only complete answers built from data are shared; errors and degraded answers are not
+        if result["degraded"] or not isinstance(result["data"], list) or not result["data"]:
+            return
+        self.answer_cache.put(result["cache_key"], result)
+
+    def _is_cached(self, results: Dict[str, Any]) -> bool:
+        # Cached answers and followers of an identical in-flight question skip the lookups
+        if not results["answer_cache"]:
+            return False
+        _, cached, flight, leader = results["answer_cache"]
+        return bool(cached) or (flight is not None and not leader)
+
+    def _analytics_stage(self, results: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        if self._is_cached(results):
+            return None
+        entities, intent = results["nlp"]
+        return self.analytics.serve(intent, entities)
+
+    def _reports_stage(self, results: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        # Fetched ahead of the metric query only when the question itself is about reports
+        if "report" not in results["question"].lower() or self._is_cached(results):
+            return None
+        entities, _ = results["nlp"]
+        return self._report_excerpts(results["question"], entities)
+
+    def _planner_stage(self, results: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        if results["analytics"] or self._is_cached(results):
+            return None
+        entities, intent = results["nlp"]
+        with pipeline_metrics.stage("neo4j"):
+            return self.planner.execute(intent, entities)
+
+    def _knowledge_graph_stage(self, results: Dict[str, Any]):
+        if results["analytics"] or results["planner"] or self._is_cached(results):
+            return None
+        entities, intent = results["nlp"]
+        return self._query_knowledge_graph(results["question"], entities, intent)
+
+    def _query_knowledge_graph(self, user_input: str, entities: Dict[str, List[str]], intent: Dict[str, Any]):
+        try:
+            query, is_valid, explanation = self.query_generator.generate_and_validate_query(intent, entities)
+
+            if is_valid:
+                logger.info(f"Valid query generated: {query}")
+
+                required_params = self.query_generator.extract_parameters_from_query(query)
+
+                parameters = self._prepare_query_parameters(entities, required_params)
+
+                try:
+                    with pipeline_metrics.stage("neo4j"):
+                        kg_response = self.db_manager.execute_generated_query(query, parameters)
+                    audit_log.record("cypher", question=user_input, entities=entities, intent=intent,
+                                     query=query, parameters=parameters, rows=len(kg_response))
+                    kg_response = self._summarize_trends(intent, kg_response)
+
+                except QueryRejected as e:
+                    logger.warning(f"Generated query rejected: {e}")
+                    audit_log.record("cypher", question=user_input, query=query, parameters=parameters, rejected=str(e))
+                    kg_response = f"I couldn't run the query for this question because {e}. Please narrow it down, for example to specific companies, metrics or years."
+
+                except Exception as e:
+                    logger.error(f"Neo4j query execution failed: {e}")
+                    kg_response = f"I encountered an error while fetching the data: {str(e)}. Please try rephrasing your question or providing more specific information."
+
+            else:
+                logger.warning(f"Invalid query generated: {query}")
+                logger.warning(f"Validation explanation: {explanation}")
+                kg_response = f"I apologize, but I couldn't generate a valid query to answer your question. The issue was: {explanation}. Could you please rephrase or provide more details?"
+
+        except Overloaded:
+            kg_response = OVERLOADED_MESSAGE
+
+        except Exception as e:
+            logger.error(f"Query generation failed: {e}")
+            kg_response = "I encountered an unexpected error while processing your question. Please try again or rephrase your query."
+        return kg_response
+
+    def _summarize_trends(self, intent: Dict[str, Any], kg_response: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Trend and forecast answers get computed statistics instead of raw per-point rows
+        if intent.get("action") not in ("trend", "predict"):
+            return kg_response
+        series = series_from_rows(kg_response)
+        if not series:
+            return kg_response
+        if self.db_manager.compact_series:
+            series = self._compact_series(series)
+        horizon = FORECAST_HORIZON if intent["action"] == "predict" else 0
+        return summarize_series(series, horizon=horizon)
+
+    def _compact_series(self, series: List[Series]) -> List[Series]:
+        # The compact arrays hold every point of a series; the generated query still decides
+        # which series are summarized and over which dates
+        arrays = self.db_manager.get_series_arrays_bulk(sorted({item[0] for item in series}), sorted({item[1] for item in series}))
+        compact = []
+        for company, metric, days, values in series:
+            if (company, metric) not in arrays:
+                compact.append((company, metric, days, values))
+                continue
+            dates, array_values = arrays[(company, metric)]
+            array_days = dates.astype(np.int64)
+            in_span = (array_days >= days[0]) & (array_days <= days[-1])
+            compact.append((company, metric, array_days[in_span], array_values[in_span]))
+        return compact
+
+    def _prepare_query_parameters(self, entities: Dict[str, List[str]], required_params: List[str]) -> Dict[str, Any]:
+        parameters = {}
+        for param in required_params:
+            if param in entities and entities[param]:
+                if param == "limit":
+                    parameters[param] = int(entities[param][0])
+                elif param in ["startDate", "endDate"]:
+                    parameters[param] = entities[param][0]
+                else:
+                    parameters[param] = entities[param]
+            elif param == "year":
+                # AnnualMetric rollups are keyed by calendar year
+                year = parse_year_bound(entities.get("startDate", []) + entities.get("endDate", []), "01-01")
+                parameters[param] = int(year[:4]) if year else None
+            else:
+                parameters[param] = None
+        return parameters
+
+    def _needs_reports(self, user_input: str, kg_response: List[Dict[str, Any]]) -> bool:
+        mentions_reports = "report" in user_input.lower() or any("ReportId" in row or "ReportContent" in row for row in kg_response)
+        return mentions_reports or not kg_response
+
+    def _report_excerpts(self, user_input: str, entities: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        companies = entities.get("companies") or None
+        report_store = ReportStore(self.db_manager, blob_store=self.blob_store)
+        keyword_excerpts = report_store.search(user_input, REPORT_EXCERPT_LIMIT, companies)
+        if not keyword_excerpts and companies:
+            keyword_excerpts = report_store.search(user_input, REPORT_EXCERPT_LIMIT)
+        semantic_excerpts = self._semantic_report_excerpts(user_input, entities)
+
+        # Full-text and cosine scores are not comparable, so merge by reciprocal rank
+        fused = {}
+        for ranking in (keyword_excerpts, semantic_excerpts):
+            for rank, excerpt in enumerate(ranking):
+                key = (excerpt["ReportId"], excerpt["ChunkIndex"])
+                score, _ = fused.get(key, (0.0, excerpt))
+                fused[key] = (score + 1.0 / (60 + rank), excerpt)
+        ranked = sorted(fused.values(), key=lambda item: item[0], reverse=True)
+        return [excerpt for _, excerpt in ranked[:REPORT_EXCERPT_LIMIT]]
+
+    def _merge_report_rows(self, user_input: str, kg_response: List[Dict[str, Any]], excerpts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not excerpts and not any("ReportContent" in row for row in kg_response):
+            return list(kg_response)
+        # Whole report bodies never go into the prompt, only the most relevant chunks
+        rows = [{key: value for key, value in row.items() if key != "ReportContent"} for row in kg_response]
+        if any(phrase in user_input.lower() for phrase in FULL_REPORT_PHRASES):
+            # Report bodies are only read when explicitly asked for, and then only up to the prompt limit
+            report_store = ReportStore(self.db_manager, blob_store=self.blob_store)
+            for row in rows:
+                if row.get("ReportId"):
+                    row["ReportText"] = report_store.get_report_content(row["ReportId"], REPORT_TEXT_CHARS)
+        return rows + excerpts
+
+    def _semantic_report_excerpts(self, user_input: str, entities: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        try:
+            index = self.get_embedding_index()
+            hits = index.search(
+                user_input,
+                REPORT_EXCERPT_LIMIT,
+                company_names=entities.get("companies") or None,
+                start_date=parse_year_bound(entities.get("startDate"), "01-01"),
+                end_date=parse_year_bound(entities.get("endDate"), "12-31")
+            )
+            return fetch_chunk_excerpts(self.db_manager, hits)
+        except Exception as e:
+            logger.error(f"Semantic report retrieval failed: {e}")
+            return []
+
+    def _update_conversation_context(self, context: ConversationContext, user_input: str, entities: Dict[str, List[str]], intent: Dict[str, Any], kg_response: str):
+        context.update(
+            user_input=user_input,
+            companies=entities.get("companies", []),
+            metrics=entities.get("metrics", []),
+            start_date=entities.get("startDate", ["latest"]),
+            end_date=entities.get("endDate", []),
+            industry=entities.get("industry", None),
+            intent=intent,
+            kg_response=encode_result(kg_response),
+            kg_rows=kg_response if isinstance(kg_response, list) else None
+        )
+
+
+def configure_llm_scheduler() -> LLMScheduler:
+    return resources.shared("llm_scheduler", lambda: llm_scheduler.configure(
+        LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_BURST, LLM_INTERACTIVE_RESERVED,
+        (LLM_MAX_WAIT_INTERACTIVE, LLM_MAX_WAIT_BACKGROUND, LLM_MAX_WAIT_BULK)))
+
+
+def configure_model_router() -> ModelRouter:
+    # Without a routes file every stage uses GAIA_NODE_NAME on GAIA_NODE_URL
+    if not LLM_ROUTES_FILE:
+        return model_router
+    return resources.shared(("model_router", LLM_ROUTES_FILE), lambda: model_router.load(LLM_ROUTES_FILE, resources.get_llm_client))
+
+
+def create_service(db_manager: DatabaseManager = None) -> FinWiseService:
+    start_telemetry()
+    configure_llm_scheduler()
+    configure_model_router()
+    if db_manager is None:
+        db_manager = create_database_manager(resources.get_driver(AURA_CONNECTION_URI, AURA_USERNAME, AURA_PASSWORD))
+    client = resources.get_llm_client(GAIA_NODE_URL, GAIA_NODE_API_KEY)
+    blob_store = resources.shared(("blob_store", REPORT_BLOB_DIR), create_blob_store)
+    return FinWiseService(db_manager, client, GAIA_NODE_NAME, get_query_generator(client), blob_store)
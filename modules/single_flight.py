@@ -0,0 +1,111 @@
+from typing import Dict, Any, Iterator, Optional, Tuple
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FlightFailed(Exception):
+    pass
+
+
+class Flight:
+    # One in-flight computation of a question. The leader publishes the retrieved data, then the
+    # answer either as streamed parts or all at once; followers read whatever has been published.
+    def __init__(self, key: str):
+        self.key = key
+        self.started = time.monotonic()
+        self.condition = threading.Condition()
+        self.data = None
+        self.parts = []
+        self.answer = None
+        self.finished = False
+        self.failed = False
+        self.followers = 0
+
+    def publish_data(self, data: Dict[str, Any]):
+        with self.condition:
+            self.data = data
+            self.condition.notify_all()
+
+    def publish(self, part: str):
+        with self.condition:
+            self.parts.append(part)
+            self.condition.notify_all()
+
+    def finish(self, answer: Optional[str], failed: bool = False):
+        with self.condition:
+            self.answer = answer
+            self.failed = failed
+            self.finished = True
+            self.condition.notify_all()
+
+    def wait_data(self, timeout: float) -> Optional[Dict[str, Any]]:
+        with self.condition:
+            self.condition.wait_for(lambda: self.data is not None or self.finished, timeout)
+            return self.data
+
+    def wait_answer(self, timeout: float) -> Optional[str]:
+        with self.condition:
+            self.condition.wait_for(lambda: self.finished, timeout)
+            return self.answer if self.finished and not self.failed else None
+
+    def stream(self, timeout: float) -> Iterator[str]:
+        # The timeout applies between parts, so a long answer that keeps streaming is never cut off
+        position = 0
+        while True:
+            with self.condition:
+                if not self.condition.wait_for(lambda: len(self.parts) > position or self.finished, timeout):
+                    raise FlightFailed(f"No progress on the shared answer for {timeout:.0f}s")
+                parts = self.parts[position:]
+                finished, failed, answer = self.finished, self.failed, self.answer
+            position += len(parts)
+            yield from parts
+            if finished:
+                if failed:
+                    raise FlightFailed("The shared answer was interrupted")
+                if position == 0 and answer:
+                    # The leader answered without streaming
+                    yield answer
+                return
+
+
+class SingleFlight:
+    # Concurrent requests for the same key share one computation: the first becomes the leader,
+    # the rest follow it. A flight leaves the registry as soon as it finishes, so later requests
+    # compute afresh (or hit the answer cache) instead of reusing it.
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def join(self, key: str) -> Tuple[Flight, bool]:
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                return flight, False
+            flight = Flight(key)
+            self.flights[key] = flight
+            return flight, True
+
+    def release(self, flight: Flight):
+        with self.lock:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+
+    def finish(self, flight: Flight, answer: str):
+        self.release(flight)
+        flight.finish(answer)
+        if flight.followers:
+            logger.info(f"Shared one answer with {flight.followers} coalesced requests")
+
+    def fail(self, flight: Flight):
+        self.release(flight)
+        flight.finish(None, failed=True)
+
+    def abandon(self, flight: Flight):
+        # A follower gave up on a stuck leader; later requests must not queue behind it either
+        logger.warning(f"Abandoning a shared computation after {time.monotonic() - flight.started:.1f}s")
+        self.release(flight)
@@ -0,0 +1,268 @@
+from typing import Dict, Any, List, Optional, Tuple
+import re
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Canonical metrics and their storage units, mirroring the Metric nodes created by the updater
+DEFAULT_METRIC_UNITS = {
+    "Revenue": "INR Crores",
+    "Net Profit": "INR Crores",
+    "EBITDA": "INR Crores",
+    "EPS": "INR per Share",
+    "Debt to Equity": "Ratio",
+    "Employee Count": "Number"
+}
+
+METRIC_ALIASES = {
+    "revenue": "Revenue",
+    "total revenue": "Revenue",
+    "sales": "Revenue",
+    "net sales": "Revenue",
+    "turnover": "Revenue",
+    "net profit": "Net Profit",
+    "net income": "Net Profit",
+    "profit after tax": "Net Profit",
+    "pat": "Net Profit",
+    "ebitda": "EBITDA",
+    "eps": "EPS",
+    "earnings per share": "EPS",
+    "debt to equity": "Debt to Equity",
+    "debt equity": "Debt to Equity",
+    "d e": "Debt to Equity",
+    "employee count": "Employee Count",
+    "employees": "Employee Count",
+    "headcount": "Employee Count"
+}
+
+COLUMN_ALIASES = {
+    "company": ["company", "company name", "companyname", "name", "issuer", "organisation", "organization", "firm"],
+    "metric": ["metric", "metric name", "metricname", "kpi", "indicator", "measure", "line item"],
+    "date": ["date", "period", "period end", "quarter end", "report date", "as of", "fiscal date"],
+    "value": ["value", "amount", "figure", "metric value"],
+    "unit": ["unit", "units", "currency unit", "denomination"]
+}
+
+# Multipliers that convert a source unit into crores
+CRORE_FACTORS = {
+    "crore": 1.0,
+    "crores": 1.0,
+    "cr": 1.0,
+    "lakh": 0.01,
+    "lakhs": 0.01,
+    "lac": 0.01,
+    "million": 0.1,
+    "mn": 0.1,
+    "billion": 100.0,
+    "bn": 100.0,
+    "thousand": 0.0001,
+    "k": 0.0001,
+    "rupees": 1e-7,
+    "inr": 1e-7,
+    "rs": 1e-7
+}
+
+CRORE_UNITS = {"INR Crores"}
+
+YEAR_FIRST_DATE = re.compile(r"^\s*\d{4}[-/.]")
+
+
+def normalize_label(label: Any) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(label).lower()).strip()
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    # Indian filings write dates day first (31/03/2024, 04-03-2024); ISO dates start with the
+    # year and must not have their month and day swapped
+    text = values.astype("string")
+    year_first = text.str.match(YEAR_FIRST_DATE).fillna(False).astype(bool)
+    parsed = pd.to_datetime(text.where(year_first), errors="coerce", format="mixed")
+    day_first = pd.to_datetime(text.where(~year_first), errors="coerce", format="mixed", dayfirst=True)
+    return parsed.fillna(day_first)
+
+
+SIGNIFICANT_DIGITS = 12
+
+
+def round_significant(values: pd.Series, digits: int = SIGNIFICANT_DIGITS) -> pd.Series:
+    # Clears float noise from unit conversion without flattening small values (1 rupee is 1e-7 crore)
+    return values.map(lambda value: float(f"{value:.{digits}g}") if pd.notna(value) else value)
+
+
+class RecognitionResult:
+    # skipped_rows: a company, date or value was missing or unreadable; unknown_metric_rows: the
+    # metric is not one the graph knows; duplicate_rows: an earlier row for the same company,
+    # metric and date that a later one replaced
+    def __init__(self, records: List[Dict[str, Any]], column_roles: Dict[str, str], skipped_rows: int,
+                 unknown_metric_rows: int = 0, unknown_metrics: Optional[List[str]] = None, duplicate_rows: int = 0):
+        self.records = records
+        self.column_roles = column_roles
+        self.skipped_rows = skipped_rows
+        self.unknown_metric_rows = unknown_metric_rows
+        self.unknown_metrics = unknown_metrics or []
+        self.duplicate_rows = duplicate_rows
+
+    @property
+    def companies(self) -> List[str]:
+        return sorted({record["company"] for record in self.records})
+
+    @property
+    def metrics(self) -> List[str]:
+        return sorted({record["metric"] for record in self.records})
+
+    @property
+    def date_range(self) -> tuple:
+        dates = [record["date"] for record in self.records]
+        return (min(dates), max(dates)) if dates else (None, None)
+
+    def summary(self, filename: str, preview_rows: int = 5) -> str:
+        start, end = self.date_range
+        lines = [
+            f"I recognised **{len(self.records)}** data points in {filename} without needing any further analysis.",
+            f"- Companies: {', '.join(self.companies)}",
+            f"- Metrics: {', '.join(self.metrics)}",
+            f"- Period: {start} to {end}"
+        ]
+        if self.unknown_metric_rows:
+            lines.append(f"- Skipped {self.unknown_metric_rows} rows with unrecognised metrics: {', '.join(self.unknown_metrics)}")
+        if self.skipped_rows:
+            lines.append(f"- Skipped {self.skipped_rows} rows with a missing or unreadable company, date or value")
+        if self.duplicate_rows:
+            lines.append(f"- Replaced {self.duplicate_rows} repeated rows with the last one for the same company, metric and date")
+        lines.append("")
+        for record in self.records[:preview_rows]:
+            lines.append(f"- {record['company']} | {record['metric']} | {record['date']} | {record['value']} {record['unit']}")
+        if len(self.records) > preview_rows:
+            lines.append(f"- ... and {len(self.records) - preview_rows} more")
+        lines.append("")
+        lines.append("Would you like to add these to the database? Use **Add to database** under Upload File in the sidebar.")
+        return "\n".join(lines)
+
+
+class TabularMetricRecognizer:
+    def __init__(self, metric_units: Optional[Dict[str, str]] = None):
+        self.metric_units = dict(DEFAULT_METRIC_UNITS)
+        if metric_units:
+            self.metric_units.update(metric_units)
+        self.metric_lookup = {normalize_label(name): name for name in self.metric_units}
+        for alias, name in METRIC_ALIASES.items():
+            if name in self.metric_units:
+                self.metric_lookup.setdefault(alias, name)
+
+    def recognize(self, df: pd.DataFrame) -> Optional[RecognitionResult]:
+        if df is None or df.empty:
+            return None
+
+        column_roles = self.classify_columns(df)
+        if "company" not in column_roles.values() or "date" not in column_roles.values():
+            logger.info(f"Tabular recognizer found no company/date columns: {list(df.columns)}")
+            return None
+
+        long_df = self._to_long_format(df, column_roles)
+        if long_df is None:
+            logger.info(f"Tabular recognizer found no metric/value columns: {list(df.columns)}")
+            return None
+
+        long_df, counts = self._normalize(long_df)
+        records = long_df.to_dict("records")
+        if not records:
+            return None
+        return RecognitionResult(records, column_roles, counts["invalid"], counts["unknown_metric"], counts["unknown_metrics"], counts["duplicate"])
+
+    def classify_columns(self, df: pd.DataFrame) -> Dict[str, str]:
+        roles = {}
+        for column in df.columns:
+            label = normalize_label(column)
+            base_label = normalize_label(re.sub(r"\(.*?\)|\[.*?\]", "", str(column)))
+            for role, aliases in COLUMN_ALIASES.items():
+                if (label in aliases or base_label in aliases) and role not in roles.values():
+                    roles[column] = role
+                    break
+            else:
+                if base_label in self.metric_lookup:
+                    roles[column] = "metric_column"
+
+        # Fall back to dtype heuristics for a date column with an unusual name
+        if "date" not in roles.values():
+            for column in df.columns:
+                if column in roles or pd.api.types.is_numeric_dtype(df[column]):
+                    continue
+                parsed = parse_dates(df[column])
+                if parsed.notna().mean() > 0.9:
+                    roles[column] = "date"
+                    break
+        return roles
+
+    def _to_long_format(self, df: pd.DataFrame, column_roles: Dict[str, str]) -> Optional[pd.DataFrame]:
+        by_role = {role: column for column, role in column_roles.items() if role != "metric_column"}
+        metric_columns = [column for column, role in column_roles.items() if role == "metric_column"]
+
+        if "metric" in by_role and "value" in by_role:
+            columns = {by_role["company"]: "company", by_role["metric"]: "metric", by_role["date"]: "date", by_role["value"]: "value"}
+            if "unit" in by_role:
+                columns[by_role["unit"]] = "source_unit"
+            long_df = df[list(columns)].rename(columns=columns)
+            if "source_unit" not in long_df:
+                long_df["source_unit"] = ""
+            return long_df
+
+        if metric_columns:
+            long_df = df[[by_role["company"], by_role["date"]] + metric_columns].melt(
+                id_vars=[by_role["company"], by_role["date"]],
+                value_vars=metric_columns,
+                var_name="metric",
+                value_name="value"
+            ).rename(columns={by_role["company"]: "company", by_role["date"]: "date"})
+            # Units embedded in headers such as "Revenue (INR Lakhs)"
+            long_df["source_unit"] = long_df["metric"].astype(str).str.extract(r"\((.*?)\)|\[(.*?)\]").bfill(axis=1)[0].fillna("")
+            return long_df
+
+        return None
+
+    def _normalize(self, long_df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        long_df = long_df.copy()
+        long_df["company"] = long_df["company"].astype("string").str.strip()
+
+        missing_metric = long_df["metric"].isna()
+        base_metric = long_df["metric"].astype(str).str.replace(r"\(.*?\)|\[.*?\]", "", regex=True).str.strip()
+        labels = base_metric.map(normalize_label)
+        long_df["metric"] = labels.map(self.metric_lookup)
+        unknown_metric = long_df["metric"].isna() & ~missing_metric & (labels != "")
+
+        long_df["date"] = parse_dates(long_df["date"]).dt.strftime("%Y-%m-%d")
+
+        raw_values = long_df["value"].astype(str).str.replace(r"[₹,\s]|Rs\.?|INR", "", regex=True)
+        raw_values = raw_values.str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+        # Rounded in the source unit, before the conversion can turn small figures into tiny ones
+        long_df["value"] = pd.to_numeric(raw_values, errors="coerce").astype(float).round(4)
+
+        long_df["unit"] = long_df["metric"].map(self.metric_units)
+        source_unit = long_df["source_unit"].astype(str).map(normalize_label)
+        factor = source_unit.map(self._crore_factor).astype(float).fillna(1.0)
+        in_crores = long_df["unit"].isin(CRORE_UNITS)
+        long_df.loc[in_crores, "value"] = long_df.loc[in_crores, "value"] * factor[in_crores]
+        long_df["value"] = round_significant(long_df["value"])
+
+        valid = long_df[~unknown_metric].dropna(subset=["company", "metric", "date", "value"])
+        valid = valid[valid["company"] != ""]
+        long_df = valid.drop_duplicates(subset=["company", "metric", "date"], keep="last")
+        counts = {
+            "unknown_metric": int(unknown_metric.sum()),
+            "unknown_metrics": sorted(set(base_metric[unknown_metric])),
+            "invalid": int((~unknown_metric).sum()) - len(valid),
+            "duplicate": len(valid) - len(long_df)
+        }
+        long_df = long_df.sort_values(["company", "metric", "date"])
+        long_df["company"] = long_df["company"].astype(str)
+        long_df["value"] = long_df["value"].astype(float)
+        return long_df[["company", "metric", "date", "value", "unit"]], counts
+
+    @staticmethod
+    def _crore_factor(unit_label: str) -> Optional[float]:
+        for word in unit_label.split():
+            if word in CRORE_FACTORS and word not in ("inr", "rs"):
+                return CRORE_FACTORS[word]
+        if unit_label in ("inr", "rs", "rupees"):
+            return CRORE_FACTORS[unit_label]
+        return None
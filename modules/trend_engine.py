@@ -0,0 +1,170 @@
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import warnings
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (company, metric, days since epoch, values), each series sorted by day
+Series = Tuple[str, str, np.ndarray, np.ndarray]
+
+
+def to_day(value: Any) -> Optional[int]:
+    try:
+        return int(np.datetime64(str(value)[:10], "D").astype(np.int64))
+    except ValueError:
+        return None
+
+
+def series_from_rows(rows: List[Dict[str, Any]]) -> List[Series]:
+    # Accepts flat rows with Company/Metric/Date/Value columns, or rows holding a
+    # Trend list of {date, value} maps as produced by the trend query template
+    points = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        key = (str(row.get("Company", "")), str(row.get("Metric", "")))
+        if isinstance(row.get("Trend"), list):
+            entries = [(item.get("date"), item.get("value")) for item in row["Trend"] if isinstance(item, dict)]
+        else:
+            entries = [(row.get("Date"), row.get("Value"))]
+        for date, value in entries:
+            day = to_day(date) if date is not None else None
+            if day is not None and isinstance(value, (int, float)):
+                points.setdefault(key, {})[day] = float(value)
+
+    series = []
+    for (company, metric), by_day in points.items():
+        days = np.array(sorted(by_day), dtype=np.int64)
+        series.append((company, metric, days, np.array([by_day[d] for d in days], dtype=np.float64)))
+    return series
+
+
+def cagr(first_value: float, last_value: float, days: int) -> Optional[float]:
+    if days <= 0 or first_value <= 0 or last_value <= 0:
+        return None
+    return (last_value / first_value) ** (365.25 / days) - 1
+
+
+def to_matrix(series: List[Series]) -> Tuple[np.ndarray, np.ndarray]:
+    # Right-aligns every series so the latest observation sits in the last column
+    width = max(len(values) for _, _, _, values in series)
+    matrix = np.full((len(series), width), np.nan)
+    for row, (_, _, _, values) in enumerate(series):
+        matrix[row, width - len(values):] = values
+    lengths = np.array([len(values) for _, _, _, values in series])
+    return matrix, lengths
+
+
+def linear_fit(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Least-squares line per row over column positions, ignoring the NaN padding
+    t = np.broadcast_to(np.arange(matrix.shape[1], dtype=np.float64), matrix.shape)
+    observed = ~np.isnan(matrix)
+    n = observed.sum(axis=1)
+    y = np.where(observed, matrix, 0.0)
+    x = np.where(observed, t, 0.0)
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+    denominator = n * sxx - sx * sx
+    slope = np.divide(n * sxy - sx * sy, denominator, out=np.zeros(len(matrix)), where=denominator != 0)
+    intercept = (sy - slope * sx) / np.maximum(n, 1)
+    return slope, intercept
+
+
+def linear_forecast(matrix: np.ndarray, horizon: int) -> np.ndarray:
+    slope, intercept = linear_fit(matrix)
+    future = matrix.shape[1] + np.arange(horizon, dtype=np.float64)
+    return intercept[:, None] + slope[:, None] * future[None, :]
+
+
+def holt_forecast(matrix: np.ndarray, horizon: int, alpha: float = 0.5, beta: float = 0.3) -> np.ndarray:
+    # Holt's linear exponential smoothing, stepped through time for all rows at once
+    level = np.full(len(matrix), np.nan)
+    trend = np.zeros(len(matrix))
+    for column in matrix.T:
+        observed = ~np.isnan(column)
+        starting = observed & np.isnan(level)
+        updating = observed & ~starting
+        level[starting] = column[starting]
+        previous = level[updating]
+        level[updating] = alpha * column[updating] + (1 - alpha) * (previous + trend[updating])
+        trend[updating] = beta * (level[updating] - previous) + (1 - beta) * trend[updating]
+    return level[:, None] + trend[:, None] * np.arange(1, horizon + 1)[None, :]
+
+
+def periods_per_year(series: List[Series]) -> int:
+    gaps = [np.diff(days) for _, _, days, _ in series if len(days) > 1]
+    median_gap = float(np.median(np.concatenate(gaps))) if gaps else 365.0
+    return int(np.clip(round(365.25 / max(median_gap, 1.0)), 1, 12))
+
+
+def seasonal_strength(matrix: np.ndarray, season: int) -> np.ndarray:
+    # Spread of the mean detrended value per position in the year, relative to the series level
+    strength = np.full(len(matrix), np.nan)
+    if season < 2 or matrix.shape[1] < 2 * season:
+        return strength
+    slope, intercept = linear_fit(matrix)
+    t = np.arange(matrix.shape[1])
+    detrended = matrix - (intercept[:, None] + slope[:, None] * t[None, :])
+    # Padding makes some slots all-NaN for short series; those simply drop out of the spread
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        slots = np.stack([np.nanmean(detrended[:, (t % season) == slot], axis=1) for slot in range(season)], axis=1)
+        level = np.nanmean(np.abs(matrix), axis=1)
+        np.divide(np.nanstd(slots, axis=1), level, out=strength, where=level > 0)
+    return strength
+
+
+def percent(value: Optional[float]) -> Optional[float]:
+    return None if value is None or not np.isfinite(value) else round(float(value) * 100, 2)
+
+
+def rounded(value: float) -> Optional[float]:
+    return round(float(value), 4) if np.isfinite(value) else None
+
+
+def summarize_series(series: List[Series], horizon: int = 0, method: str = "holt") -> List[Dict[str, Any]]:
+    series = [item for item in series if len(item[3])]
+    if not series:
+        return []
+    season = periods_per_year(series)
+    matrix, lengths = to_matrix(series)
+    last = matrix[:, -1]
+    with np.errstate(all="ignore"):
+        previous = matrix[:, -2] if matrix.shape[1] > 1 else np.full(len(matrix), np.nan)
+        year_ago = matrix[:, -1 - season] if matrix.shape[1] > season else np.full(len(matrix), np.nan)
+        period_change = np.where(previous != 0, last / previous - 1, np.nan)
+        yoy_change = np.where(year_ago != 0, last / year_ago - 1, np.nan)
+        window = min(season, matrix.shape[1])
+        average = np.nanmean(matrix[:, -window:], axis=1)
+    strength = seasonal_strength(matrix, season)
+    if horizon:
+        forecast = holt_forecast(matrix, horizon) if method == "holt" else linear_forecast(matrix, horizon)
+
+    summaries = []
+    for row, (company, metric, days, values) in enumerate(series):
+        step = int(np.median(np.diff(days))) if len(days) > 1 else 365
+        summary = {
+            "Company": company,
+            "Metric": metric,
+            "Points": int(lengths[row]),
+            "From": str(np.datetime64(int(days[0]), "D")),
+            "To": str(np.datetime64(int(days[-1]), "D")),
+            "First": rounded(values[0]),
+            "Latest": rounded(last[row]),
+            "Min": rounded(values.min()),
+            "Max": rounded(values.max()),
+            "PeriodChangePct": percent(period_change[row]),
+            "YoYChangePct": percent(yoy_change[row]),
+            "CAGRPct": percent(cagr(values[0], values[-1], int(days[-1] - days[0]))),
+            f"MovingAverage{window}": rounded(average[row]),
+            "Seasonality": None if np.isnan(strength[row]) else ("strong" if strength[row] > 0.1 else "weak")
+        }
+        if horizon:
+            summary["Forecast"] = [
+                {"Date": str(np.datetime64(int(days[-1] + step * (i + 1)), "D")), "Value": rounded(forecast[row, i])}
+                for i in range(horizon)
+            ]
+            summary["ForecastMethod"] = "Holt exponential smoothing" if method == "holt" else "linear trend"
+        summaries.append(summary)
+    return summaries
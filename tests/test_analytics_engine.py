@@ -0,0 +1,142 @@
+import numpy as np
+from modules.analytics_engine import MetricAnalyticsEngine, LOAD_QUERY, iso_to_day, day_to_iso
+
+
+class FakeGraph:
+    # Answers LOAD_QUERY like Neo4j would: values dated on or after the watermark
+    def __init__(self):
+        self.values = []
+        self.watermarks = []
+
+    def add(self, company, metric, date, value):
+        self.values.append({"company": company, "metric": metric, "day": iso_to_day(date), "value": value})
+
+    def execute_query(self, query, params=None):
+        if query != LOAD_QUERY:
+            return [{"company": "TCS", "industry": "IT"}]
+        watermark = params["watermark"]
+        self.watermarks.append(watermark)
+        return [dict(row) for row in self.values if watermark is None or row["day"] >= iso_to_day(watermark)]
+
+
+def revenue(engine, company="TCS"):
+    days, values = engine.series(engine.resolve_company(company), engine.resolve_metric("Revenue"))
+    return [(day_to_iso(day), float(value)) for day, value in zip(days, values)]
+
+
+def test_incremental_refresh_reloads_the_watermark_day_without_duplicates():
+    graph = FakeGraph()
+    graph.add("TCS", "Revenue", "2023-06-30", 100.0)
+    engine = MetricAnalyticsEngine(graph)
+    engine.refresh()
+    # A second value written on the watermark day, and a correction of the first
+    graph.values[0]["value"] = 110.0
+    graph.add("Infosys", "Revenue", "2023-06-30", 90.0)
+    engine.refresh()
+    assert graph.watermarks == [None, "2023-06-30"]
+    assert revenue(engine) == [("2023-06-30", 110.0)]
+    assert revenue(engine, "Infosys") == [("2023-06-30", 90.0)]
+
+
+def test_backfill_below_the_watermark():
+    graph = FakeGraph()
+    graph.add("TCS", "Revenue", "2023-06-30", 100.0)
+    engine = MetricAnalyticsEngine(graph, refresh_interval=0, full_refresh_interval=3600)
+    engine.refresh(full=True)
+
+    # Ingested through this process: merged directly
+    engine.add_records([{"company": "TCS", "metric": "Revenue", "value": 80.0, "date": "2022-06-30", "unit": "INR Crores"}])
+    assert revenue(engine) == [("2022-06-30", 80.0), ("2023-06-30", 100.0)]
+
+    # Written by another process: missed incrementally, picked up by the periodic full reload
+    graph.add("TCS", "Revenue", "2021-06-30", 70.0)
+    engine.refresh_if_stale()
+    assert ("2021-06-30", 70.0) not in revenue(engine)
+    engine.last_full_refresh -= 3601
+    engine.refresh_if_stale()
+    assert revenue(engine)[0] == ("2021-06-30", 70.0)
+
+
+def test_forecast_horizon_is_configurable():
+    graph = FakeGraph()
+    for year, value in ((2020, 50.0), (2021, 60.0), (2022, 70.0), (2023, 80.0)):
+        graph.add("TCS", "Revenue", f"{year}-03-31", value)
+    engine = MetricAnalyticsEngine(graph, forecast_horizon=2)
+    engine.refresh()
+    rows = engine.serve({"action": "predict"}, {"companies": ["TCS"], "metrics": ["Revenue"]})
+    assert [point["Date"] for point in rows[0]["Forecast"]] == ["2024-03-30", "2025-03-30"]
+
+
+class CompactGraph(FakeGraph):
+    # Serves full refreshes from the compact Series arrays
+    compact_series = True
+
+    def __init__(self):
+        super().__init__()
+        self.bulk_reads = 0
+
+    def get_series_arrays_bulk(self, company_names=None, metric_names=None):
+        self.bulk_reads += 1
+        arrays = {}
+        for row in sorted(self.values, key=lambda row: row["day"]):
+            days, values = arrays.setdefault((row["company"], row["metric"]), ([], []))
+            days.append(row["day"])
+            values.append(row["value"])
+        return {name: (np.array(days, dtype=np.int64).astype("datetime64[D]"), np.array(values))
+                for name, (days, values) in arrays.items()}
+
+
+def test_full_refresh_reads_the_compact_series_arrays():
+    graph = CompactGraph()
+    graph.add("TCS", "Revenue", "2023-03-31", 10.0)
+    graph.add("TCS", "Revenue", "2024-03-31", 12.0)
+    graph.add("Infosys", "Revenue", "2024-03-31", 9.0)
+    engine = MetricAnalyticsEngine(graph)
+    engine.refresh(full=True)
+    assert graph.bulk_reads == 1
+    # Only values from the newest loaded day on are read row by row
+    assert graph.watermarks == ["2024-03-31"]
+    days, values = engine.series(engine.resolve_company("TCS"), engine.resolve_metric("Revenue"))
+    assert [day_to_iso(day) for day in days] == ["2023-03-31", "2024-03-31"]
+    assert values.tolist() == [10.0, 12.0]
+    assert len(engine) == 3
+
+
+def quarters(graph, company, metric, year, values, months=("03-31", "06-30", "09-30", "12-31")):
+    for month, value in zip(months, values):
+        graph.add(company, metric, f"{year}-{month}", value)
+
+
+def test_rank_uses_the_latest_complete_year_for_every_company():
+    graph = FakeGraph()
+    quarters(graph, "TCS", "Revenue", 2023, [10, 10, 10, 10])
+    quarters(graph, "TCS", "Revenue", 2022, [8, 8, 8, 8])
+    quarters(graph, "Infosys", "Revenue", 2023, [12, 12, 12, 12])
+    # A lone Q1 2024 figure is newer, but 2024 is not complete for anyone
+    quarters(graph, "Infosys", "Revenue", 2024, [50])
+    # Revenue is a flow metric, so a year without its first quarter is not a full year
+    quarters(graph, "Wipro", "Revenue", 2023, [30, 30, 30], months=("06-30", "09-30", "12-31"))
+    engine = MetricAnalyticsEngine(graph)
+    engine.refresh(full=True)
+
+    ranking = engine.rank(engine.resolve_metric("Revenue"))
+    assert [(row["Company"], row["Year"], row["FullYear"], row["Value"]) for row in ranking] == [
+        ("Infosys", 2023, True, 48.0), ("TCS", 2023, True, 40.0), ("Wipro", 2023, False, 90.0)]
+    assert ranking[1]["YoYGrowth"] == 0.25
+    assert ranking[0]["YoYGrowth"] is None
+
+    # An explicit year ranks that year, complete or not
+    ranking = engine.rank(engine.resolve_metric("Revenue"), as_of=iso_to_day("2024-12-31"))
+    assert [(row["Company"], row["FullYear"], row["Value"]) for row in ranking] == [("Infosys", False, 50.0)]
+
+
+def test_stock_metrics_rank_on_the_closing_value():
+    graph = FakeGraph()
+    quarters(graph, "TCS", "EPS", 2023, [1.0, 2.0, 3.0, 4.0])
+    quarters(graph, "Infosys", "EPS", 2023, [5.0, 3.0])
+    # A later year completes 2023 for Infosys, even without a fourth quarter
+    quarters(graph, "Infosys", "EPS", 2024, [6.0])
+    engine = MetricAnalyticsEngine(graph)
+    engine.refresh(full=True)
+    ranking = engine.rank(engine.resolve_metric("EPS"))
+    assert [(row["Company"], row["Value"], row["FullYear"]) for row in ranking] == [("TCS", 4.0, True), ("Infosys", 3.0, True)]
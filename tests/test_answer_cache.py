@@ -0,0 +1,31 @@
+from modules.answer_cache import AnswerCache, canonical_question
+
+
+class Versions:
+    def get_data_version(self):
+        return "1:2024-03-31:1"
+
+
+def key(entities, intent):
+    return AnswerCache(Versions()).key(entities, intent, "model")
+
+
+def test_phrasings_of_one_question_share_a_key():
+    first = key({"companies": ["TCS ", "Infosys"], "metrics": ["revenue"], "startDate": ["the Last  Quarter"]},
+                {"action": "compare", "timeframe": "past"})
+    second = key({"companies": ["infosys", "tcs"], "metrics": ["Revenue"], "startDate": ["last quarter"]},
+                 {"action": "compare", "timeframe": "past"})
+    assert first is not None and first == second
+
+
+def test_unknown_intent_is_not_cached():
+    assert canonical_question({"companies": ["TCS"], "metrics": ["revenue"]}, {"action": "unknown"}) is None
+    assert key({"companies": ["TCS"], "metrics": ["revenue"]}, {"action": "unknown"}) is None
+
+
+def test_timeframe_and_date_terms_are_part_of_the_key():
+    entities = {"companies": ["TCS"], "metrics": ["revenue"]}
+    assert key(entities, {"action": "display", "timeframe": "past"}) != key(entities, {"action": "display", "timeframe": "current"})
+    q1 = key({**entities, "startDate": ["Q1 2023"]}, {"action": "display"})
+    q3 = key({**entities, "startDate": ["Q3 2023"]}, {"action": "display"})
+    assert q1 != q3
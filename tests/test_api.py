@@ -0,0 +1,145 @@
+import asyncio
+import json
+import time
+import pytest
+
+pytest.importorskip("neo4j")
+pytest.importorskip("spacy")
+
+from modules.api import FinWiseAPI
+
+
+class FakeService:
+    def __init__(self, parts):
+        self.parts = parts
+        self.closed = False
+        self.active = 0
+        self.overlapped = False
+        self.db_manager = FakeDatabase()
+        self.ingested = []
+
+    def stream(self, question, context):
+        try:
+            for part in self.parts:
+                if isinstance(part, Exception):
+                    raise part
+                yield part
+        finally:
+            self.closed = True
+
+    async def ask_async(self, question, context):
+        self.active += 1
+        self.overlapped = self.overlapped or self.active > 1
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return {"answer": "ok", "source": "kg", "degraded": False, "cached_at": None, "intent": {}, "entities": {}, "data": []}
+
+    def ingest(self, records):
+        if any(record["company"] == "Unreachable" for record in records):
+            raise RuntimeError("Neo4j is unavailable")
+        self.ingested.extend(records)
+        return len(records)
+
+
+class FakeDatabase:
+    def get_metric_units(self):
+        return {"Revenue": "INR Cr"}
+
+
+def call(api, path, payload):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(payload).encode("utf-8")}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path}
+    return sent, api(scope, receive, send)
+
+
+def test_stream_failure_is_reported_in_the_stream():
+    service = FakeService(["part", RuntimeError("model went away")])
+    api = FinWiseAPI(lambda: service, worker_threads=2)
+    sent, request = call(api, "/ask/stream", {"question": "TCS revenue"})
+    asyncio.run(request)
+    assert [message["type"] for message in sent].count("http.response.start") == 1
+    bodies = b"".join(message.get("body", b"") for message in sent)
+    assert b"event: error" in bodies and b"event: done" not in bodies
+    assert sent[-1]["more_body"] is False
+    assert service.closed
+
+
+def test_requests_for_one_conversation_run_one_at_a_time():
+    service = FakeService([])
+    api = FinWiseAPI(lambda: service, worker_threads=1)
+
+    async def both():
+        started, request = call(api, "/ask", {"question": "start"})
+        await request
+        conversation_id = json.loads(started[1]["body"])["conversation_id"]
+        first, request = call(api, "/ask", {"question": "a", "conversation_id": conversation_id})
+        second, other = call(api, "/ask", {"question": "b", "conversation_id": conversation_id})
+        await asyncio.gather(request, other)
+        return first, second
+
+    first, second = asyncio.run(both())
+    assert not service.overlapped
+    assert first[0]["status"] == 200 and second[0]["status"] == 200
+
+
+def test_unknown_conversation_ids_are_not_created():
+    api = FinWiseAPI(lambda: FakeService([]), worker_threads=1)
+    sent, request = call(api, "/ask", {"question": "a", "conversation_id": "someone-elses"})
+    asyncio.run(request)
+    assert sent[0]["status"] == 404
+    assert "someone-elses" not in api.conversations.conversations
+
+
+def test_invalid_records_are_rejected_before_anything_is_stored():
+    service = FakeService([])
+    api = FinWiseAPI(lambda: service, worker_threads=1)
+    records = [
+        {"company": "TCS", "metric": "Revenue", "date": "2024-03-31", "value": 10.0, "unit": "INR Cr"},
+        {"company": "TCS", "metric": "Revenue", "date": "31/03/2024", "value": 10.0},
+        {"company": "TCS", "metric": "Revenue", "date": "2024-03-31", "value": "ten"},
+        {"company": "TCS", "metric": "Revenue", "date": "2024-03-31", "value": 10.0, "unit": "USD Mn"},
+        {"company": "", "metric": "Revenue", "value": 10.0}
+    ]
+    sent, request = call(api, "/ingest", {"records": records})
+    asyncio.run(request)
+    assert sent[0]["status"] == 400
+    error = json.loads(sent[1]["body"])["error"]
+    assert all(f"record {index}" in error for index in (1, 2, 3, 4)) and "record 0" not in error
+    assert service.ingested == []
+
+
+def test_failed_write_is_not_reported_as_added():
+    service = FakeService([])
+    api = FinWiseAPI(lambda: service, worker_threads=1)
+    sent, request = call(api, "/ingest", {"records": [{"company": "Unreachable", "metric": "Revenue", "date": "2024-03-31", "value": 1.0}]})
+    asyncio.run(request)
+    assert sent[0]["status"] == 503
+
+    sent, request = call(api, "/ingest", {"records": [{"company": "TCS", "metric": "Revenue", "date": "2024-03-31", "value": 1.0}]})
+    asyncio.run(request)
+    assert sent[0]["status"] == 200 and json.loads(sent[1]["body"])["added"] == 1
+
+
+def test_concurrent_first_requests_build_one_service():
+    built = []
+
+    def factory():
+        time.sleep(0.05)
+        built.append(FakeService([]))
+        return built[-1]
+
+    api = FinWiseAPI(factory, worker_threads=4)
+
+    async def many():
+        requests = [call(api, "/ask", {"question": "a"})[1] for _ in range(4)]
+        await asyncio.gather(*requests)
+
+    asyncio.run(many())
+    assert len(built) == 1
@@ -0,0 +1,27 @@
+import gzip
+import json
+import time
+from modules.audit_log import AuditLog
+
+
+def test_fields_are_snapshotted_when_recorded(tmp_path):
+    path = tmp_path / "audit.jsonl.gz"
+    log = AuditLog()
+    log.configure(str(path), max_field_chars=10)
+    rows = [{"Company": "TCS"}]
+    log.record("answer", rows=rows, prompt="x" * 20)
+    # The caller keeps using its objects after handing them over
+    rows.append({"Company": "Infosys"})
+    rows[0]["Company"] = "Wipro"
+    lines = []
+    for _ in range(200):
+        try:
+            lines = gzip.decompress(path.read_bytes()).decode("utf-8").splitlines()
+        except (OSError, EOFError):
+            pass
+        if lines:
+            break
+        time.sleep(0.01)
+    event = json.loads(lines[0])
+    assert event["rows"] == [{"Company": "TCS"}]
+    assert event["prompt"].startswith("x" * 10 + "...")
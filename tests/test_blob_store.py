@@ -0,0 +1,65 @@
+from modules.blob_store import BlobStore, migrate_report_bodies, blob_ref_from_row, summarize_content
+
+
+def test_put_deduplicates_and_get_round_trips(tmp_path):
+    store = BlobStore(str(tmp_path))
+    ref = store.put("Revenue grew 12% — strongly.")
+    assert store.put("Revenue grew 12% — strongly.") == ref
+    assert store.read_text(ref) == "Revenue grew 12% — strongly."
+    assert bytes(store.get(ref, max_bytes=7)) == b"Revenue"
+
+    # The index survives a restart
+    reopened = BlobStore(str(tmp_path))
+    assert reopened.read_text(ref) == "Revenue grew 12% — strongly."
+    store.close()
+    reopened.close()
+
+
+def test_empty_bodies_are_never_written_or_mapped(tmp_path):
+    store = BlobStore(str(tmp_path))
+    ref = store.put("")
+    assert ref["length"] == 0
+    assert not list(tmp_path.glob("segment-*.dat"))
+    assert store.read_text(ref) == ""
+    assert store.read_text(store.put("body"), max_bytes=0) == ""
+
+
+def test_segments_roll_over_and_grown_segments_are_remapped(tmp_path):
+    store = BlobStore(str(tmp_path), segment_size=10)
+    first = store.put("abcdef")
+    second = store.put("ghijkl")
+    assert second["segment"] == first["segment"] + 1
+    assert store.read_text(second) == "ghijkl"
+    # The second segment was mapped before this blob was appended to it
+    third = store.put("mn")
+    assert third["segment"] == second["segment"] and third["offset"] == 6
+    assert store.read_text(third) == "mn"
+    assert store.read_text(first) == "abcdef"
+    store.close()
+
+
+class FakeGraph:
+    def __init__(self, reports):
+        self.reports = reports
+
+    def execute_query(self, query, params=None):
+        if "LIMIT $limit" in query:
+            pending = [{"id": report_id, "content": report["content"]} for report_id, report in self.reports.items()
+                       if "content" in report and report_id not in params["seen"]]
+            return pending[:params["limit"]]
+        report = self.reports[params["id"]]
+        report.update(params["properties"])
+        del report["content"]
+        return []
+
+
+def test_migration_moves_bodies_into_the_store(tmp_path):
+    store = BlobStore(str(tmp_path))
+    graph = FakeGraph({"r1": {"content": "First report. " * 40}, "r2": {"content": ""}, "r3": {"content": "Third"}})
+    assert migrate_report_bodies(graph, store, batch_size=2) == 3
+    for report in graph.reports.values():
+        assert "content" not in report
+    assert store.read_text(blob_ref_from_row(graph.reports["r1"])) == "First report. " * 40
+    assert graph.reports["r1"]["summary"] == summarize_content("First report. " * 40)
+    assert store.read_text(blob_ref_from_row(graph.reports["r2"])) == ""
+    assert migrate_report_bodies(graph, store) == 0
@@ -0,0 +1,48 @@
+import pytest
+from types import SimpleNamespace
+from modules import chatbot, insight_scheduler
+from modules.chatbot import FailedAnswer, ERROR_MESSAGE, INTERRUPTED_MESSAGE
+from modules.conversation_manager import ConversationContext
+from modules.llm_scheduler import Overloaded, OVERLOADED_MESSAGE
+from modules.insight_scheduler import InsightScheduler
+
+
+def failing_completion(error):
+    def create_completion(*args, **kwargs):
+        raise error
+    return create_completion
+
+
+@pytest.mark.parametrize("error, message", [(Overloaded("busy"), OVERLOADED_MESSAGE), (RuntimeError("down"), ERROR_MESSAGE)])
+def test_failures_are_marked(monkeypatch, error, message):
+    monkeypatch.setattr(chatbot, "create_completion", failing_completion(error))
+    answer = chatbot.chatbot_with_context("TCS revenue", ConversationContext(), None, "model")
+    assert isinstance(answer, FailedAnswer) and answer == message
+
+
+def test_interrupted_stream_ends_with_a_marked_notice(monkeypatch):
+    def stream_completion(*args, **kwargs):
+        yield SimpleNamespace(model="model"), "TCS had revenue"
+        raise RuntimeError("connection reset")
+    monkeypatch.setattr(chatbot, "stream_completion", stream_completion)
+    parts = list(chatbot.chatbot_stream_with_context("TCS revenue", ConversationContext(), None, "model"))
+    assert parts == ["TCS had revenue", INTERRUPTED_MESSAGE]
+    assert not isinstance(parts[0], FailedAnswer) and isinstance(parts[1], FailedAnswer)
+
+
+class Rows:
+    def execute_query(self, query, params=None):
+        return [{"Company": "TCS", "Metric": "Revenue", "Value": 100.0}]
+
+    def get_data_version(self):
+        return "1"
+
+
+def test_failed_insight_is_not_kept(monkeypatch):
+    scheduler = InsightScheduler(Rows(), None, "model")
+    monkeypatch.setattr(insight_scheduler, "chatbot_with_context", lambda *args, **kwargs: "Revenue grew.")
+    scheduler.run_once()
+    monkeypatch.setattr(insight_scheduler, "chatbot_with_context", lambda *args, **kwargs: FailedAnswer(ERROR_MESSAGE))
+    with pytest.raises(RuntimeError):
+        scheduler.run_once(force=True)
+    assert scheduler.latest()["text"] == "Revenue grew."
@@ -0,0 +1,86 @@
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from modules.comparison_planner import ComparisonPlanner, COMPANY_METRIC_QUERY, METRIC_RANK_QUERY
+
+
+class FakeManager:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append((query, params))
+        return self.rows.get((params.get("company"), params["metric"]), [])
+
+
+def test_company_without_prior_year_stays_in_the_comparison():
+    manager = FakeManager({
+        ("TCS", "Revenue"): [{"value": 120.0, "date": "2024-03-31", "previousValue": 100.0}],
+        ("Infosys", "Revenue"): [{"value": 90.0, "date": "2024-03-31", "previousValue": None}]
+    })
+    with ThreadPoolExecutor(2) as pool:
+        table = ComparisonPlanner(manager, pool).execute({"action": "compare"}, {"companies": ["TCS", "Infosys"], "metrics": ["revenue"]})
+    assert [(row["Company"], row["YoYGrowth"]) for row in table] == [("TCS", 0.2), ("Infosys", None)]
+
+
+def test_rank_rows_keep_their_order_and_full_year_flag():
+    manager = FakeManager({(None, "EPS"): [
+        {"company": "TCS", "year": 2024, "value": 120.0, "complete": True, "yoyGrowth": 0.123456, "industry": "IT"},
+        {"company": "Infosys", "year": 2024, "value": 150.0, "complete": False, "yoyGrowth": None, "industry": "IT"}
+    ]})
+    with ThreadPoolExecutor(1) as pool:
+        table = ComparisonPlanner(manager, pool).execute({"action": "rank"}, {"metrics": ["eps"]})
+    assert [(row["Rank"], row["Company"], row["FullYear"], row["YoYGrowth"]) for row in table] == [
+        (1, "TCS", True, 0.1235), (2, "Infosys", False, None)]
+
+
+def test_rank_defaults_to_no_year():
+    manager = FakeManager({})
+    with ThreadPoolExecutor(1) as pool:
+        plan = ComparisonPlanner(manager, pool).plan({"action": "rank"}, {"metrics": ["eps"]})
+    assert plan == [("rank", "EPS", {"metric": "EPS", "year": None, "industry": None, "limit": 5})]
+
+
+class GraphManager:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def execute_query(self, query, params=None):
+        with self.driver.session() as session:
+            return [record.data() for record in session.run(query, params or {})]
+
+
+@pytest.fixture
+def graph():
+    neo4j = pytest.importorskip("neo4j")
+    uri = os.environ.get("FINWISE_TEST_NEO4J_URI")
+    if not uri:
+        pytest.skip("FINWISE_TEST_NEO4J_URI is not set")
+    driver = neo4j.GraphDatabase.driver(uri, auth=(os.environ.get("FINWISE_TEST_NEO4J_USER", "neo4j"), os.environ.get("FINWISE_TEST_NEO4J_PASSWORD", "")))
+    manager = GraphManager(driver)
+    yield manager
+    manager.execute_query("MATCH (n) WHERE n.companyName STARTS WITH 'PlannerTest' DETACH DELETE n")
+    driver.close()
+
+
+def test_missing_prior_year_against_neo4j(graph):
+    graph.execute_query("""
+    UNWIND $values AS v
+    CREATE (:MetricValue {companyName: v[0], metricName: 'Revenue', date: date(v[1]), value: v[2]})
+    """, {"values": [["PlannerTestA", "2023-03-31", 100.0], ["PlannerTestA", "2024-03-31", 120.0], ["PlannerTestB", "2024-03-31", 90.0]]})
+    rows = {company: graph.execute_query(COMPANY_METRIC_QUERY, {"company": company, "metric": "Revenue", "asOf": "2024-12-31"})
+            for company in ("PlannerTestA", "PlannerTestB")}
+    assert rows["PlannerTestA"] == [{"value": 120.0, "date": "2024-03-31", "previousValue": 100.0}]
+    assert rows["PlannerTestB"] == [{"value": 90.0, "date": "2024-03-31", "previousValue": None}]
+
+
+def test_rank_prefers_complete_years_against_neo4j(graph):
+    graph.execute_query("""
+    UNWIND $values AS v
+    CREATE (:AnnualMetric {companyName: v[0], metricName: 'PlannerTestMetric', year: v[1], value: v[2], complete: v[3]})
+    """, {"values": [["PlannerTestA", 2023, 80.0, True], ["PlannerTestA", 2024, 100.0, True],
+                     ["PlannerTestB", 2024, 150.0, False], ["PlannerTestC", 2024, 90.0, True]]})
+    rows = graph.execute_query(METRIC_RANK_QUERY, {"metric": "PlannerTestMetric", "year": None, "industry": None, "limit": 5})
+    assert [(row["company"], row["year"], row["complete"]) for row in rows] == [
+        ("PlannerTestA", 2024, True), ("PlannerTestC", 2024, True), ("PlannerTestB", 2024, False)]
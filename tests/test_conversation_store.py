@@ -0,0 +1,57 @@
+from datetime import datetime
+from modules.conversation_manager import Conversation
+from modules.conversation_store import ConversationStore
+
+
+def ask(conversation, question, answer, companies):
+    conversation.add_message("user", question)
+    conversation.context.update(question, companies, ["Revenue"], [], [], None, {"action": "display"}, "|Company|Value|")
+    conversation.add_message("assistant", answer)
+
+
+def test_save_appends_only_what_is_new(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.db"))
+    conversation = Conversation()
+    ask(conversation, "TCS revenue", "TCS had revenue of 100.", ["TCS"])
+    store.save(conversation, "analyst")
+    # Rows already written are never rewritten by later saves
+    store.connection.execute("UPDATE messages SET content = 'stored' WHERE position = 0")
+    ask(conversation, "And Infosys?", "Infosys had revenue of 90.", ["Infosys"])
+    store.save(conversation, "analyst")
+    store.save(conversation, "analyst")
+    messages = store.connection.execute("SELECT position, content FROM messages ORDER BY position").fetchall()
+    assert [position for position, _ in messages] == list(range(5))
+    assert messages[0][1] == "stored" and messages[-1][1] == "Infosys had revenue of 90."
+    assert conversation.context.events == []
+
+
+def test_load_replays_the_context(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    store = ConversationStore(path)
+    conversation = Conversation()
+    ask(conversation, "TCS revenue", "TCS had revenue of 100.", ["TCS"])
+    store.save(conversation, "analyst")
+    ask(conversation, "And Infosys?", "Infosys had revenue of 90.", ["Infosys"])
+    store.save(conversation, "analyst")
+    store.close()
+
+    loaded = ConversationStore(path).load(conversation.id)
+    assert loaded.messages == conversation.messages
+    assert loaded.title == conversation.title
+    assert loaded.context.current_entities["companies"] == ["Infosys"]
+    assert loaded.context.last_ai_response == "Infosys had revenue of 90."
+    assert [turn["user_input"] for turn in loaded.context.history] == [turn["user_input"] for turn in conversation.context.history]
+    assert loaded.context.history[-1]["ai_response"] == "Infosys had revenue of 90."
+    assert (loaded.saved_messages, loaded.saved_events) == (conversation.saved_messages, conversation.saved_events)
+
+
+def test_listing_is_per_owner_and_newest_first(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.db"))
+    older, newer, other = Conversation(title="older"), Conversation(title="newer"), Conversation(title="other")
+    older.updated_at, newer.updated_at = datetime(2024, 1, 1), datetime(2024, 6, 1)
+    for conversation, owner in ((older, "analyst"), (newer, "analyst"), (other, "someone else")):
+        store.save(conversation, owner)
+    assert [row["title"] for row in store.list("analyst")] == ["newer", "older"]
+    store.delete(older.id)
+    assert store.load(older.id) is None
+    assert [row["title"] for row in store.list("analyst")] == ["newer"]
@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("neo4j")
+
+from modules.database_manager import (DatabaseManager, merge_series_points, READ_COMPACT_SERIES_QUERY,
+                                      WRITE_COMPACT_SERIES_QUERY, REFRESH_COMPACT_SERIES_QUERY)
+from modules.trend_engine import to_day
+
+
+def test_points_replace_or_remove_values_on_their_day():
+    days, values = merge_series_points([10, 20, 30], [1.0, 2.0, 3.0], {25: 2.5, 20: 9.0, 30: None, 5: 0.5})
+    assert days == [5, 10, 20, 25]
+    assert values == [0.5, 1.0, 9.0, 2.5]
+
+
+class CompactSeriesManager(DatabaseManager):
+    # Records the compact series statements instead of talking to Neo4j
+    def __init__(self, arrays, raced=()):
+        super().__init__(driver=None, compact_series=True, maintain_rollups=False)
+        self.arrays = arrays
+        self.raced = set(raced)
+        self.rebuilt = []
+
+    def execute_query(self, query, params={}):
+        if query == READ_COMPACT_SERIES_QUERY:
+            return [{"company": p["company"], "metric": p["metric"], "version": 3,
+                     "dates": self.arrays.get((p["company"], p["metric"]), (None, None))[0],
+                     "values": self.arrays.get((p["company"], p["metric"]), (None, None))[1]} for p in params["series"]]
+        if query == WRITE_COMPACT_SERIES_QUERY:
+            written = []
+            for p in params["series"]:
+                if (p["company"], p["metric"]) not in self.raced:
+                    self.arrays[(p["company"], p["metric"])] = (p["dates"], p["values"])
+                    written.append({"company": p["company"], "metric": p["metric"]})
+            return written
+        if query == REFRESH_COMPACT_SERIES_QUERY:
+            self.rebuilt.extend((p["company"], p["metric"]) for p in params["series"])
+        return []
+
+    def execute_write(self, query, params={}):
+        return self.execute_query(query, params)
+
+
+def test_batches_merge_into_the_existing_arrays():
+    march, june = to_day("2024-03-31"), to_day("2024-06-30")
+    manager = CompactSeriesManager({("TCS", "Revenue"): ([march], [10.0])})
+    manager.add_metric_values([
+        {"company": "TCS", "metric": "Revenue", "value": 12.0, "date": "2024-06-30", "unit": None},
+        {"company": "TCS", "metric": "Revenue", "value": 11.0, "date": "2024-03-31", "unit": None},
+        {"company": "TCS", "metric": "Revenue", "value": 13.0, "date": "2024-06-30", "unit": None},
+    ])
+    assert manager.arrays[("TCS", "Revenue")] == ([march, june], [11.0, 13.0])
+    assert manager.rebuilt == []
+
+
+def test_series_without_arrays_or_with_a_concurrent_writer_are_rebuilt():
+    manager = CompactSeriesManager({("TCS", "Revenue"): ([1], [1.0])}, raced=[("TCS", "Revenue")])
+    manager.add_metric_values([
+        {"company": "TCS", "metric": "Revenue", "value": 2.0, "date": "2024-06-30", "unit": None},
+        {"company": "Wipro", "metric": "Revenue", "value": 3.0, "date": "2024-06-30", "unit": None},
+    ])
+    assert sorted(manager.rebuilt) == [("TCS", "Revenue"), ("Wipro", "Revenue")]
+
+
+def test_failed_upsert_is_raised_to_the_caller():
+    class UnreachableSession:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def run(self, query, params):
+            raise RuntimeError("Neo4j is unavailable")
+
+    class UnreachableDriver:
+        def session(self, **kwargs):
+            return UnreachableSession()
+
+    manager = DatabaseManager(driver=UnreachableDriver(), compact_series=False, maintain_rollups=False)
+    with pytest.raises(RuntimeError):
+        manager.add_metric_values([{"company": "TCS", "metric": "Revenue", "value": 1.0, "date": "2024-03-31", "unit": None}])
@@ -0,0 +1,130 @@
+import zlib
+import numpy as np
+import modules.embedding_index as embedding_index
+from modules.embedding_index import ChunkEmbeddingIndex, normalize_rows
+
+
+class WordEmbedder:
+    # Bag of hashed words, so texts sharing words land close together without spaCy
+    dim = 32
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+        return normalize_rows(vectors)
+
+
+def chunk(report, idx, text, company="TCS", date="2024-03-31", version="v1"):
+    return {"id": f"{report}#{idx}", "text": text, "company": company, "date": date,
+            "report": report, "version": version}
+
+
+def test_add_skips_chunks_that_are_already_indexed(tmp_path):
+    index = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder())
+    rows = [chunk("r1", 0, "revenue grew strongly"), chunk("r1", 1, "margins fell")]
+    assert index.add(rows) == 2
+    assert index.add(rows) == 0
+    assert len(index) == 2
+    assert index.search("revenue growth", top_k=1)[0]["id"] == "r1#0"
+
+
+def test_a_new_report_version_tombstones_the_old_rows(tmp_path):
+    index = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder())
+    index.add([chunk("r1", 0, "revenue grew strongly"), chunk("r1", 1, "margins fell")])
+    # Re-chunking reuses the chunk ids, so the old vectors must stop matching
+    assert index.add([chunk("r1", 0, "dividend was raised", version="v2")]) == 1
+    hits = index.search("revenue grew strongly margins fell dividend", top_k=5)
+    assert [hit["id"] for hit in hits] == ["r1#0"]
+    assert index.search("revenue grew strongly", top_k=1)[0]["score"] < 0.5
+
+    reopened = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder())
+    assert [hit["id"] for hit in reopened.search("dividend", top_k=5)] == ["r1#0"]
+    assert reopened.remove(["r1"]) == 1
+    assert reopened.search("dividend") == []
+
+
+def test_trained_index_assigns_new_rows_and_survives_a_reload(tmp_path):
+    index = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder(), nprobe=2)
+    index.add([chunk(f"r{n}", 0, f"topic{n % 20} note{n}") for n in range(400)])
+    index.train()
+    assert index.centroids is not None
+    assert sum(len(ids) for ids in index.inverted_lists) == 400
+
+    index.add([chunk("late", 0, "topic3 appendix")])
+    assert sum(len(ids) for ids in index.inverted_lists) == 401
+    assert (tmp_path / "assignments.i32").stat().st_size == 401 * 4
+    reopened = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder(), nprobe=2)
+    assert reopened.search("topic3 appendix", top_k=1)[0]["id"] == "late#0"
+
+
+def test_filtered_search_widens_the_probe_until_enough_rows_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_index, "EXACT_SCAN_SIZE", 0)
+    index = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder(), nprobe=1)
+    rows = [chunk(f"r{n}", 0, f"topic{n % 20} note{n}") for n in range(400)]
+    rows += [chunk("infy", n, f"unrelated{n} words{n}", company="Infosys", date="2023-03-31") for n in range(3)]
+    index.add(rows)
+    index.train()
+    # The query sits near the TCS rows, so the first probed list holds no Infosys chunk
+    hits = index.search("topic3", top_k=3, company_names=["Infosys"])
+    assert sorted(hit["id"] for hit in hits) == ["infy#0", "infy#1", "infy#2"]
+    assert index.search("topic3", top_k=3, company_names=["TCS"], end_date="2023-12-31") == []
+    assert len(index.search("topic3", top_k=3, start_date="2024-01-01")) == 3
+
+
+def test_search_embeds_the_question_without_holding_the_lock(tmp_path):
+    index = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder())
+    index.add([chunk("r1", 0, "revenue grew")])
+    held = []
+    embed = index.embedder.embed
+    index.embedder.embed = lambda texts: held.append(index.lock._is_owned()) or embed(texts)
+    index.search("revenue")
+    assert held == [False]
+
+
+def test_writers_in_other_processes_are_picked_up_before_appending(tmp_path):
+    first = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder())
+    second = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder())
+    first.add([chunk("r1", 0, "revenue grew")])
+    second.add([chunk("r2", 0, "margins fell")])
+    assert second.chunk_ids == ["r1#0", "r2#0"]
+    assert first.search("margins fell", top_k=1)[0]["id"] == "r2#0"
+    reopened = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder())
+    assert reopened.search("revenue grew", top_k=1)[0]["id"] == "r1#0"
+
+
+class FakeGraph:
+    def __init__(self, reports):
+        # report id -> (version, [chunk texts])
+        self.reports = reports
+        self.chunk_queries = 0
+
+    def execute_query(self, query, params=None):
+        if "AS version" in query:
+            return [{"report": report, "version": version} for report, (version, _) in self.reports.items()]
+        self.chunk_queries += 1
+        return [{"id": f"{report}#{idx}", "text": text, "company": "TCS", "date": "2024-03-31", "report": report}
+                for report in params["reports"] for idx, text in enumerate(self.reports[report][1])]
+
+
+def test_sync_re_embeds_changed_reports_and_drops_removed_ones(tmp_path):
+    graph = FakeGraph({"r1": ("a", ["revenue grew"]), "r2": ("a", ["margins fell", "costs rose"])})
+    index = ChunkEmbeddingIndex(str(tmp_path), WordEmbedder())
+    assert index.sync_from_graph(graph) == 3
+    assert index.sync_from_graph(graph) == 0
+    assert graph.chunk_queries == 1
+
+    graph.reports["r1"] = ("b", ["dividend raised"])
+    del graph.reports["r2"]
+    assert index.sync_from_graph(graph) == 1
+    assert [hit["id"] for hit in index.search("revenue grew margins costs dividend", top_k=5)] == ["r1#0"]
+
+    # An empty answer is what a failed query looks like, so nothing is tombstoned
+    graph.reports = {}
+    assert index.sync_from_graph(graph) == 0
+    assert index.search("dividend", top_k=1)[0]["id"] == "r1#0"
@@ -0,0 +1,90 @@
+import threading
+from modules import insight_scheduler
+from modules.insight_scheduler import InsightScheduler, MOVERS_QUERY, LATEST_VALUES_QUERY
+
+
+class Graph:
+    def __init__(self, movers=None, latest=None):
+        self.version = "1:2024-03-31"
+        self.movers = movers or []
+        self.latest = latest or []
+        self.queries = []
+
+    def get_data_version(self):
+        return self.version
+
+    def execute_query(self, query, params=None):
+        self.queries.append(query)
+        return list(self.movers if query == MOVERS_QUERY else self.latest if query == LATEST_VALUES_QUERY else [])
+
+
+class Model:
+    def __init__(self):
+        self.calls = 0
+        self.prompts = []
+        self.answered = threading.Event()
+
+    def __call__(self, question, context, client, model_name, stage="answer"):
+        self.calls += 1
+        self.prompts.append(context.kg_rows)
+        self.answered.set()
+        return f"insight {self.calls}"
+
+
+def test_insights_refresh_on_new_data_or_after_the_interval(monkeypatch):
+    model = Model()
+    monkeypatch.setattr(insight_scheduler, "chatbot_with_context", model)
+    graph = Graph(movers=[{"Company": "TCS", "Metric": "Revenue", "YoYGrowthPct": 12.5}])
+    scheduler = InsightScheduler(graph, None, "model", interval=3600)
+    assert scheduler.run_once() and scheduler.latest()["text"] == "insight 1"
+    assert not scheduler.run_once()
+
+    graph.version = "2:2024-06-30"
+    assert scheduler.run_once() and scheduler.latest()["text"] == "insight 2"
+    scheduler.generated_at -= 3601
+    assert scheduler.run_once()
+    assert model.calls == 3
+
+
+def test_latest_values_stand_in_when_no_year_over_year_moves_exist(monkeypatch):
+    model = Model()
+    monkeypatch.setattr(insight_scheduler, "chatbot_with_context", model)
+    graph = Graph(latest=[{"Company": "TCS", "Metric": "EPS", "Date": "2024-03-31", "Value": 12.0}])
+    InsightScheduler(graph, None, "model").run_once()
+    assert graph.queries == [MOVERS_QUERY, LATEST_VALUES_QUERY]
+    assert model.prompts == [graph.latest]
+
+
+def test_an_empty_graph_is_not_asked_again_until_it_changes(monkeypatch):
+    model = Model()
+    monkeypatch.setattr(insight_scheduler, "chatbot_with_context", model)
+    scheduler = InsightScheduler(Graph(), None, "model")
+    assert scheduler.run_once()
+    assert not scheduler.run_once()
+    assert scheduler.latest() is None and model.calls == 0
+
+
+def test_trigger_wakes_the_background_loop(monkeypatch):
+    model = Model()
+    monkeypatch.setattr(insight_scheduler, "chatbot_with_context", model)
+    graph = Graph(movers=[{"Company": "TCS", "Metric": "Revenue", "YoYGrowthPct": 12.5}])
+    # The poll interval is far longer than the test, so only trigger() can cause the second run
+    scheduler = InsightScheduler(graph, None, "model", poll_interval=3600).start()
+    assert model.answered.wait(5)
+    model.answered.clear()
+    scheduler.trigger()
+    assert model.answered.wait(5)
+    assert scheduler.start() is scheduler and model.calls == 2
+
+
+def test_a_trigger_during_generation_is_not_lost(monkeypatch):
+    graph = Graph(movers=[{"Company": "TCS", "Metric": "Revenue", "YoYGrowthPct": 12.5}])
+    scheduler = InsightScheduler(graph, None, "model")
+
+    def answer_and_trigger(*args, **kwargs):
+        scheduler.trigger()
+        return "insight"
+
+    monkeypatch.setattr(insight_scheduler, "chatbot_with_context", answer_and_trigger)
+    assert scheduler.run_once()
+    assert scheduler.run_once()
@@ -0,0 +1,65 @@
+import time
+import threading
+import pytest
+from modules.llm_scheduler import LLMScheduler, Overloaded
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert condition()
+
+
+def queued(scheduler, endpoint="node"):
+    return len(scheduler.endpoints[endpoint].waiting)
+
+
+def test_waiting_calls_are_admitted_by_priority():
+    scheduler = LLMScheduler().configure(max_concurrency=1, reserved_interactive=0)
+    admitted = []
+
+    def call(stage):
+        with scheduler.slot("node", stage):
+            admitted.append(stage)
+
+    with scheduler.slot("node", "answer"):
+        bulk = threading.Thread(target=call, args=("upload_analysis",))
+        bulk.start()
+        wait_until(lambda: queued(scheduler) == 1)
+        interactive = threading.Thread(target=call, args=("answer",))
+        interactive.start()
+        wait_until(lambda: queued(scheduler) == 2)
+    bulk.join(2)
+    interactive.join(2)
+    assert admitted == ["answer", "upload_analysis"]
+
+
+def test_background_calls_leave_a_slot_for_questions():
+    scheduler = LLMScheduler().configure(max_concurrency=2, reserved_interactive=1)
+    admitted = []
+
+    def background():
+        with scheduler.slot("node", "insight"):
+            admitted.append("insight")
+
+    with scheduler.slot("node", "insight"):
+        waiting = threading.Thread(target=background)
+        waiting.start()
+        wait_until(lambda: queued(scheduler) == 1)
+        # The reserved slot still takes a user's question while the insight call waits
+        with scheduler.slot("node", "answer"):
+            assert admitted == []
+    waiting.join(2)
+    assert admitted == ["insight"]
+
+
+def test_calls_that_would_wait_too_long_are_shed_at_once():
+    scheduler = LLMScheduler().configure(max_concurrency=1, reserved_interactive=0, max_wait=(20.0, 120.0, 1.0))
+    with scheduler.slot("node", "answer"):
+        started = time.monotonic()
+        with pytest.raises(Overloaded):
+            with scheduler.slot("node", "upload_analysis"):
+                pass
+        assert time.monotonic() - started < 0.5
+    assert queued(scheduler) == 0
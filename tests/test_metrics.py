@@ -0,0 +1,63 @@
+import json
+import urllib.request
+from types import SimpleNamespace
+import pytest
+from modules.metrics import Histogram, PipelineMetrics
+
+
+def test_values_on_a_bucket_bound_count_in_that_bucket():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 1.0, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 1]
+    assert histogram.count == 5 and histogram.total == pytest.approx(4.65)
+    assert histogram.quantile(0.4) == 0.1
+    assert histogram.quantile(0.8) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert Histogram().quantile(0.5) is None
+
+
+def test_prometheus_render_has_cumulative_buckets_and_counters():
+    metrics = PipelineMetrics()
+    metrics.observe("neo4j", 0.03)
+    metrics.observe("neo4j", 0.3)
+    metrics.record_error("llm")
+    metrics.record_tokens("answer", SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+    metrics.record_tokens("answer", None)
+    metrics.record_cache("answers", hit=True)
+    metrics.record_cache("answers", hit=False)
+    lines = metrics.render_prometheus().splitlines()
+    assert 'finwise_stage_seconds_bucket{stage="neo4j",le="0.01"} 0' in lines
+    assert 'finwise_stage_seconds_bucket{stage="neo4j",le="0.05"} 1' in lines
+    assert 'finwise_stage_seconds_bucket{stage="neo4j",le="0.5"} 2' in lines
+    assert 'finwise_stage_seconds_bucket{stage="neo4j",le="+Inf"} 2' in lines
+    assert 'finwise_stage_seconds_count{stage="neo4j"} 2' in lines
+    assert 'finwise_stage_errors_total{stage="llm"} 1' in lines
+    assert 'finwise_llm_tokens_total{stage="answer",kind="prompt"} 120' in lines
+    assert 'finwise_cache_requests_total{cache="answers",result="miss"} 1' in lines
+    assert metrics.snapshot()["tokens"] == [{"Stage": "answer", "Calls": 1, "PromptTokens": 120, "CompletionTokens": 30}]
+
+
+def test_stage_records_failures_and_writes_the_event_sink(tmp_path):
+    metrics = PipelineMetrics()
+    metrics.configure(str(tmp_path / "events" / "metrics.jsonl"))
+    with pytest.raises(ValueError):
+        with metrics.stage("planner"):
+            raise ValueError("boom")
+    stage, = metrics.snapshot()["stages"]
+    assert (stage["Stage"], stage["Count"], stage["Errors"]) == ("planner", 1, 1)
+    events = [json.loads(line) for line in (tmp_path / "events" / "metrics.jsonl").read_text().splitlines()]
+    assert [event["type"] for event in events] == ["error", "latency"]
+
+
+def test_metrics_endpoint_serves_the_render():
+    metrics = PipelineMetrics()
+    metrics.observe("llm", 1.5)
+    server = metrics.start_http_server(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.read().decode("utf-8") == metrics.render_prometheus()
+    finally:
+        server.shutdown()
+        server.server_close()
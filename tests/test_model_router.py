@@ -0,0 +1,55 @@
+import pytest
+from types import SimpleNamespace
+from modules import chatbot
+from modules.model_router import ModelRoute, model_router
+
+
+class FakeClient:
+    def __init__(self, name, fail=False):
+        self.base_url = f"https://{name}.example/v1"
+        self.fail = fail
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, **params):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.base_url} is down")
+        return SimpleNamespace(model=model, usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer from {model}"))])
+
+
+@pytest.fixture
+def routes():
+    small, large = FakeClient("small"), FakeClient("large", fail=True)
+    model_router.configure({"small": ModelRoute("small", small, "llama-3b"), "large": ModelRoute("large", large, "llama-70b")},
+                           {"answer": ["large", "small"], "default": ["small"]}, min_samples=2, cooldown=60)
+    yield small, large
+    model_router.configure()
+
+
+def test_failing_route_falls_back_to_the_next(routes):
+    small, large = routes
+    completion, route = chatbot.create_completion(None, "unused", "answer", [{"role": "user", "content": "hi"}])
+    assert route.name == "small" and completion.choices[0].message.content == "answer from llama-3b"
+    assert large.calls == 1 and small.calls == 1
+
+
+def test_failing_route_is_demoted_behind_the_others(routes):
+    small, large = routes
+    for _ in range(2):
+        chatbot.create_completion(None, "unused", "answer", [{"role": "user", "content": "hi"}])
+    assert [route.name for route in model_router.candidates("answer", None, "unused")] == ["small", "large"]
+    chatbot.create_completion(None, "unused", "answer", [{"role": "user", "content": "hi"}])
+    assert large.calls == 2 and small.calls == 3
+
+
+def test_every_route_failing_raises(routes):
+    small, _ = routes
+    small.fail = True
+    with pytest.raises(ConnectionError):
+        chatbot.create_completion(None, "unused", "answer", [{"role": "user", "content": "hi"}])
+
+
+def test_stage_model_without_routes():
+    model_router.configure()
+    assert model_router.model_for("answer", "llama") == "llama"
@@ -0,0 +1,92 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from modules.pipeline_executor import PipelineExecutor, Stage, StageFailed
+
+
+@pytest.fixture
+def pool():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_independent_stages_overlap(pool):
+    both_running = threading.Barrier(2, timeout=1.0)
+
+    def waits_for_other(results):
+        both_running.wait()
+        return "done"
+
+    executor = PipelineExecutor([
+        Stage("intent", waits_for_other),
+        Stage("entities", waits_for_other),
+        Stage("answer", lambda results: (results["intent"], results["entities"]), depends_on=["intent", "entities"])
+    ], pool)
+    assert executor.run_sync({})["answer"] == ("done", "done")
+
+
+def test_a_failed_critical_stage_fails_the_run_and_skips_its_dependents(pool):
+    ran = []
+
+    def broken(results):
+        raise RuntimeError("model went away")
+
+    executor = PipelineExecutor([
+        Stage("intent", lambda results: "lookup"),
+        Stage("query", broken, depends_on=["intent"]),
+        Stage("answer", lambda results: ran.append("answer"), depends_on=["query"])
+    ], pool)
+    with pytest.raises(StageFailed) as failure:
+        executor.run_sync({})
+    assert "query failed: model went away" in str(failure.value)
+    assert failure.value.results["intent"] == "lookup"
+    assert ran == []
+
+
+def test_a_failed_non_critical_stage_degrades_to_its_fallback(pool):
+    def broken(results):
+        raise RuntimeError("index missing")
+
+    executor = PipelineExecutor([
+        Stage("excerpts", broken, critical=False, fallback=[]),
+        Stage("answer", lambda results: len(results["excerpts"]), depends_on=["excerpts"])
+    ], pool)
+    results = executor.run_sync({})
+    assert results["answer"] == 0
+    assert results["degraded"] == ["excerpts"]
+
+
+def test_the_deadline_covers_the_whole_run(pool):
+    release = threading.Event()
+
+    def slow(results):
+        release.wait(1.0)
+        return "late"
+
+    executor = PipelineExecutor([
+        Stage("first", slow),
+        Stage("second", lambda results: "never", depends_on=["first"])
+    ], pool, deadline=0.05)
+    started = time.monotonic()
+    with pytest.raises(StageFailed, match="first timed out"):
+        executor.run_sync({})
+    assert time.monotonic() - started < 0.5
+    release.set()
+
+
+def test_a_stage_starting_after_the_deadline_times_out_without_running(pool):
+    ran = []
+
+    def slow(results):
+        time.sleep(0.1)
+        return "slow"
+
+    executor = PipelineExecutor([
+        Stage("first", slow, critical=False),
+        Stage("second", lambda results: ran.append("second"), depends_on=["first"], critical=False, fallback="skipped")
+    ], pool, deadline=0.05)
+    results = executor.run_sync({})
+    assert results["degraded"] == ["first", "second"]
+    assert results["second"] == "skipped" and ran == []
@@ -0,0 +1,59 @@
+import re
+from modules.prompt_context import TokenCounter, ContextBuilder, TRUNCATION_MARKER
+
+SYSTEM = "You are FinWise, a financial assistant. " * 20
+
+
+def summary(rows, history):
+    return {"current_entities": {"companies": ["TCS"], "metrics": ["Revenue"], "industry": None},
+            "current_intent": {"action": "display"}, "kg_rows": rows, "kg_data": str(rows), "recent_history": history}
+
+
+def rows(count):
+    return [{"Company": f"Company {index}", "Metric": "Revenue", "Date": "2024-03-31", "Value": 1000.5 + index} for index in range(count)]
+
+
+def history(count):
+    return [{"user_input": f"question {index} " + "word " * 300, "ai_response": f"answer {index} " + "word " * 300} for index in range(count)]
+
+
+def test_prompt_stays_within_the_budget():
+    counter = TokenCounter()
+    builder = ContextBuilder(counter, budget=1500, turn_tokens=100)
+    question = "What was the revenue of TCS?"
+    context = builder.build(SYSTEM, question, summary(rows(500), history(10)))
+    assert counter.count(SYSTEM) + counter.count(question) + counter.count(context) <= 1500
+    shown = len(re.findall(r"^\|Company \d+\|", context, re.M))
+    assert 0 < shown < 500
+    assert f"({500 - shown} more of 500 rows not shown)" in context
+
+
+def test_last_exchange_survives_a_large_table():
+    builder = ContextBuilder(TokenCounter(), budget=1500, turn_tokens=100)
+    turns = history(3)
+    context = builder.build(SYSTEM, "And Infosys?", summary(rows(500), turns))
+    assert "question 2" in context and "answer 2" in context
+    assert TRUNCATION_MARKER in context
+
+
+def test_question_being_answered_is_not_repeated_as_history():
+    builder = ContextBuilder(TokenCounter(), budget=3500)
+    turns = [{"user_input": "first question", "ai_response": "first answer"},
+             {"user_input": "TCS revenue", "ai_response": ""}]
+    context = builder.build(SYSTEM, "TCS revenue", summary(rows(2), turns))
+    history_text = context.split("Recent Conversation History:\n")[1]
+    assert history_text == "User: first question\nAI: first answer"
+
+
+def test_small_table_goes_in_whole():
+    builder = ContextBuilder(TokenCounter(), budget=3500)
+    context = builder.build(SYSTEM, "TCS revenue", summary(rows(3), []))
+    assert "|Company|Metric|Date|Value|" in context and "not shown" not in context
+
+
+def test_truncate_respects_the_token_limit():
+    counter = TokenCounter()
+    text = "word " * 1000
+    truncated = counter.truncate(text, 50)
+    assert truncated.endswith(TRUNCATION_MARKER) and counter.count(truncated) <= 50
+    assert counter.truncate("short", 50) == "short"
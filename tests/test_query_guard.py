@@ -0,0 +1,106 @@
+import pytest
+
+pytest.importorskip("neo4j")
+
+from modules.query_guard import QueryGuard, QueryRejected
+
+
+def test_rewrite_adds_or_caps_the_limit():
+    guard = QueryGuard(max_rows=100)
+    assert guard.rewrite("MATCH (c:Company) RETURN c.name;", {})[0] == "MATCH (c:Company) RETURN c.name\nLIMIT 100"
+    assert guard.rewrite("MATCH (c) RETURN c LIMIT 500", {})[0] == "MATCH (c) RETURN c LIMIT 100"
+    assert guard.rewrite("MATCH (c) RETURN c LIMIT 5", {})[2] is None
+    # A LIMIT inside an earlier WITH does not bound the result
+    assert guard.rewrite("MATCH (c) WITH c LIMIT 5 MATCH (c)--(m) RETURN m", {})[0].endswith("\nLIMIT 100")
+
+
+def test_parameter_limits_are_capped_or_rejected():
+    guard = QueryGuard(max_rows=100)
+    _, params, note = guard.rewrite("MATCH (c) RETURN c LIMIT $limit", {"limit": 5000})
+    assert params == {"limit": 100} and note == "capped $limit at 100"
+    _, params, note = guard.rewrite("MATCH (c) RETURN c LIMIT toInteger($limit)", {"limit": "10"})
+    assert params == {"limit": "10"} and note is None
+    assert guard.rewrite("MATCH (c) RETURN c LIMIT toInteger( $n )", {})[1] == {"n": 100}
+    with pytest.raises(QueryRejected):
+        guard.rewrite("MATCH (c) RETURN c LIMIT $limit", {"limit": "ten"})
+
+
+def test_expression_limits_are_wrapped_in_the_cap():
+    query, _, note = QueryGuard(max_rows=100).rewrite("MATCH (c) RETURN c LIMIT size($names) * 2", {})
+    assert query.endswith("LIMIT CASE WHEN toInteger(size($names) * 2) > 100 THEN 100 ELSE toInteger(size($names) * 2) END")
+    assert note == "capped LIMIT size($names) * 2 at 100"
+
+
+class Summary:
+    def __init__(self, plan):
+        self.plan = plan
+
+
+class Result(list):
+    def __init__(self, rows=(), plan=None):
+        super().__init__(rows)
+        self.plan = plan
+
+    def consume(self):
+        return Summary(self.plan)
+
+
+class Session:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, query, params=None):
+        if isinstance(query, str) and query.startswith("EXPLAIN"):
+            return Result(plan=self.driver.plan)
+        self.driver.ran.append(query)
+        if self.driver.error:
+            raise self.driver.error
+        return Result([{"name": "TCS"}])
+
+
+class Driver:
+    def __init__(self, plan=None, error=None):
+        self.plan = plan or {"operatorType": "ProduceResults@neo4j", "args": {"EstimatedRows": 1.0}, "children": []}
+        self.error = error
+        self.ran = []
+
+    def session(self, **kwargs):
+        return Session(self)
+
+
+def test_expensive_plans_are_rejected_before_running():
+    plan = {"operatorType": "ProduceResults", "args": {}, "children": [
+        {"operatorType": "AllNodesScan@neo4j", "args": {"EstimatedRows": 50000.0}, "children": []}]}
+    driver = Driver(plan)
+    guard = QueryGuard(scan_row_limit=10000)
+    with pytest.raises(QueryRejected, match="AllNodesScan"):
+        guard.run(driver, "MATCH (n) RETURN n")
+    assert driver.ran == []
+    assert guard.recent_decisions()[-1]["action"] == "rejected"
+
+
+def test_allowed_queries_run_with_the_timeout():
+    driver = Driver()
+    assert QueryGuard(timeout_seconds=3).run(driver, "MATCH (c:Company) RETURN c.name AS name") == [{"name": "TCS"}]
+    assert driver.ran[0].timeout == 3
+
+
+def test_timeouts_and_bad_limits_surface_as_rejections():
+    class TimedOut(Exception):
+        code = "Neo.ClientError.Transaction.TransactionTimedOutClientConfiguration"
+
+    guard = QueryGuard(timeout_seconds=2)
+    with pytest.raises(QueryRejected, match="longer than 2 seconds"):
+        guard.run(Driver(error=TimedOut("timed out")), "MATCH (c) RETURN c")
+    assert guard.recent_decisions()[-1]["action"] == "timed out"
+    with pytest.raises(QueryRejected):
+        guard.run(Driver(), "MATCH (c) RETURN c LIMIT $limit", {"limit": "all"})
+    assert guard.recent_decisions()[-1]["reason"].startswith("rewrite failed")
+    with pytest.raises(RuntimeError):
+        guard.run(Driver(error=RuntimeError("connection lost")), "MATCH (c) RETURN c")
@@ -0,0 +1,51 @@
+import json
+import pytest
+
+pytest.importorskip("neo4j")
+
+import modules.query_profiler as query_profiler
+from modules.query_profiler import QueryProfiler, fingerprint
+
+
+def plan(db_hits, rows=1):
+    return {"dbHits": db_hits, "rows": rows, "children": [{"dbHits": 1, "pageCacheHits": 3, "pageCacheMisses": 1}]}
+
+
+def test_sampling_follows_the_rate_and_skips_unprofilable_queries(monkeypatch):
+    assert not QueryProfiler(0.0, store_path=None).should_sample("MATCH (n) RETURN n")
+    profiler = QueryProfiler(0.25, store_path=None)
+    draws = iter([0.1, 0.3, 0.1])
+    monkeypatch.setattr(query_profiler.random, "random", lambda: next(draws))
+    assert profiler.should_sample("MATCH (n) RETURN n")
+    assert not profiler.should_sample("MATCH (n) RETURN n")
+    assert not profiler.should_sample("CREATE INDEX foo IF NOT EXISTS FOR (n:X) ON (n.y)")
+
+
+def test_only_the_worst_queries_are_kept(tmp_path):
+    profiler = QueryProfiler(1.0, store_path=str(tmp_path / "profiles.json"), max_entries=2)
+    profiler.record("MATCH (a:A) RETURN a", plan(500), 5.0)
+    profiler.record("MATCH (b:B) RETURN b", plan(10), 1.0)
+    profiler.record("MATCH (c:C) RETURN c", plan(90), 2.0)
+    # Literals do not split a query's statistics
+    profiler.record("MATCH (a:A {x: 'y'}) RETURN a LIMIT 5", plan(100), 3.0)
+    profiler.record("MATCH (a:A {x: 'z'}) RETURN a LIMIT 9", plan(100), 7.0)
+    worst = profiler.worst()
+    assert [entry["query"] for entry in worst] == ["MATCH (a:A) RETURN a", "MATCH (a:A {x: ?}) RETURN a LIMIT ?"]
+    assert worst[1]["count"] == 2 and worst[1]["total_db_hits"] == 202 and worst[1]["avg_elapsed_ms"] == 5.0
+    assert worst[1]["page_cache_hit_ratio"] == 0.75
+    assert worst[0]["fingerprint"] == fingerprint("MATCH (a:A) RETURN a")
+
+
+def test_the_store_is_written_in_batches(tmp_path):
+    path = tmp_path / "profiles.json"
+    profiler = QueryProfiler(1.0, store_path=str(path), flush_interval=3600)
+    profiler.record("MATCH (a:A) RETURN a", plan(5), 1.0)
+    profiler.record("MATCH (b:B) RETURN b", plan(5), 1.0)
+    assert not path.exists()
+    profiler.flush()
+    assert len(json.loads(path.read_text())) == 2
+    assert QueryProfiler(store_path=str(path)).worst()[0]["total_db_hits"] == 6
+
+    eager = QueryProfiler(1.0, store_path=str(tmp_path / "eager.json"), flush_interval=0)
+    eager.record("MATCH (a:A) RETURN a", plan(5), 1.0)
+    assert (tmp_path / "eager.json").exists()
@@ -0,0 +1,71 @@
+from modules.report_store import ReportStore, split_into_chunks, build_fulltext_query
+
+
+def test_chunks_respect_the_size_and_overlap():
+    sentences = [f"Sentence number {index} talks about revenue growth." for index in range(40)]
+    chunks = split_into_chunks(" ".join(sentences), chunk_size=200, chunk_overlap=50)
+    assert len(chunks) > 1 and all(len(chunk) <= 200 for chunk in chunks)
+    # Each chunk starts with the tail of the one before it
+    assert chunks[1].startswith(chunks[0][-50:].lstrip()[:20])
+    assert "Sentence number 39" in chunks[-1]
+
+
+def test_long_sentences_are_hard_split():
+    chunks = split_into_chunks("x" * 500, chunk_size=200, chunk_overlap=50)
+    assert [len(chunk) for chunk in chunks] == [200, 200, 200]
+    assert split_into_chunks("  \n\n  ") == []
+
+
+def test_fulltext_query_drops_stopwords_and_escapes_lucene():
+    question = "What does the report say about the TCS-Infosys merger and R&D (AI)?"
+    assert build_fulltext_query(question) == "say OR TCS\\-Infosys OR merger OR R\\&D OR AI"
+    assert build_fulltext_query("what is the") == ""
+
+
+class FakeGraph:
+    # Enough of the report queries to drive ingest_pending_reports
+    def __init__(self, reports):
+        self.reports = reports
+        self.chunks = {}
+
+    def execute_query(self, query, params=None):
+        if "LIMIT $limit" in query:
+            pending = [report for report in self.reports.values()
+                       if "chunkCount" not in report and report["id"] not in params["skipped"]]
+            return [dict(report, contentHash=None, contentSegment=None, contentOffset=None, contentLength=None)
+                    for report in pending[:params["limit"]]]
+        if "DETACH DELETE old" in query:
+            self.reports[params["reportId"]]["chunkCount"] = len(params["chunks"])
+            self.chunks[params["reportId"]] = params["chunks"]
+        return []
+
+
+def test_empty_reports_do_not_stop_pending_ingestion():
+    graph = FakeGraph({
+        "a": {"id": "a", "content": "   \n  "},
+        "b": {"id": "b", "content": "TCS grew revenue. Margins held steady."},
+        "c": {"id": "c", "content": "Infosys raised guidance."}
+    })
+    store = ReportStore(graph)
+    assert store.ingest_pending_reports(batch_size=1) == 3
+    assert graph.chunks == {"a": [], "b": ["TCS grew revenue. Margins held steady."], "c": ["Infosys raised guidance."]}
+    assert store.ingest_pending_reports() == 0
+
+
+def test_unreadable_bodies_are_skipped_for_the_run():
+    graph = FakeGraph({
+        "blob": {"id": "blob", "content": None},
+        "text": {"id": "text", "content": "Wipro signed a large deal."}
+    })
+    original = graph.execute_query
+
+    def with_blob_refs(query, params=None):
+        rows = original(query, params)
+        for row in rows:
+            if row["id"] == "blob":
+                row.update(contentHash="abc", contentSegment="segment-0", contentOffset=0, contentLength=10)
+        return rows
+    graph.execute_query = with_blob_refs
+    # No blob store is configured, so the blob-backed body cannot be read
+    assert ReportStore(graph).ingest_pending_reports(batch_size=1) == 1
+    assert list(graph.chunks) == ["text"]
@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("neo4j")
+pytest.importorskip("openai")
+
+from modules import resources as resources_module
+from modules.resources import DriverHandle, ResourceRegistry
+
+
+class FakeDriver:
+    def __init__(self, uri, auth=None):
+        self.uri = uri
+        self.healthy = True
+        self.closed = False
+
+    def verify_connectivity(self):
+        if not self.healthy:
+            raise RuntimeError("connection lost")
+
+    def session(self, **kwargs):
+        return self
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_drivers(monkeypatch):
+    monkeypatch.setattr(resources_module.GraphDatabase, "driver", FakeDriver)
+
+
+def test_unhealthy_driver_is_replaced_but_closed_only_after_the_grace_period(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(resources_module.time, "monotonic", lambda: clock[0])
+    handle = DriverHandle("bolt://db", "neo4j", "secret", health_interval=60)
+    first = handle.current()
+    first.healthy = False
+    clock[0] = 61
+    second = handle.current()
+    assert second is not first and not first.closed
+    clock[0] = 122
+    handle.current()
+    assert first.closed and not second.closed
+
+
+def test_evicted_handles_stay_usable():
+    registry = ResourceRegistry(max_drivers=1)
+    first = registry.get_driver("bolt://a", "neo4j", "secret")
+    registry.get_driver("bolt://b", "neo4j", "secret")
+    assert first.session() is not None
+    assert registry.get_driver("bolt://b", "neo4j", "secret") is registry.get_driver("bolt://b", "neo4j", "secret")
+    registry.close()
+    assert first.driver is None
@@ -0,0 +1,25 @@
+from modules.result_encoder import encode_rows, format_cell, format_number
+
+
+def test_indian_grouping():
+    assert format_number(1234567) == "12,34,567"
+    assert format_number(-104290.5) == "-1,04,290.5"
+    assert format_number(123.0) == "123"
+
+
+def test_identifier_columns_are_not_grouped():
+    rows = [{"Company": "TCS", "Year": 2023, "FiscalYear": 2024.0, "overallRank": 1, "report_id": 120045, "Value": 1042900}]
+    assert encode_rows(rows).splitlines()[-1] == "|TCS|2023|2024|1|120045|10,42,900|"
+
+
+def test_small_values_keep_significant_digits():
+    assert format_cell(0.000123456, "YoYGrowth") == "0.0001235"
+    assert format_cell(0.0234, "DebtToEquity") == "0.0234"
+    assert format_cell(1.23456, "EPS") == "1.235"
+    assert format_cell(1234.5678, "Value") == "1,234.57"
+    assert format_cell(0.0, "Value") == "0"
+
+
+def test_header_once_per_run_of_columns():
+    rows = [{"Company": "TCS", "Value": 1}, {"Company": "TCS", "Value": 1}, {"Company": "Infosys", "Value": 2}, {"Note": "a|b"}]
+    assert encode_rows(rows) == "|Company|Value|\n|-|-|\n|TCS|1|\n|Infosys|2|\n\n|Note|\n|-|\n|a/b|"
@@ -0,0 +1,76 @@
+import os
+import pytest
+from modules.rollups import refresh_rollups, partitions_for_records, RANK_QUERY, FLOW_METRICS
+
+
+class RecordingManager:
+    def __init__(self):
+        self.calls = []
+
+    def execute_query(self, query, params=None):
+        self.calls.append((query, params))
+        return []
+
+
+def test_ranks_are_refreshed_for_the_year_before():
+    manager = RecordingManager()
+    records = [{"company": "TCS", "metric": "Employee Count", "value": 600000, "date": "2024-03-31"}]
+    refresh_rollups(manager, partitions_for_records(records))
+    params = next(params for query, params in manager.calls if query == RANK_QUERY)
+    assert params["rankPartitions"] == [{"metric": "Employee Count", "year": 2023}, {"metric": "Employee Count", "year": 2024}]
+    assert params["flowMetrics"] == FLOW_METRICS
+    assert "Employee Count" not in FLOW_METRICS
+
+
+@pytest.fixture
+def database():
+    neo4j = pytest.importorskip("neo4j")
+    uri = os.environ.get("FINWISE_TEST_NEO4J_URI")
+    if not uri:
+        pytest.skip("FINWISE_TEST_NEO4J_URI is not set")
+    from modules.database_manager import DatabaseManager
+    driver = neo4j.GraphDatabase.driver(uri, auth=(os.environ.get("FINWISE_TEST_NEO4J_USER", "neo4j"), os.environ.get("FINWISE_TEST_NEO4J_PASSWORD", "")))
+    manager = DatabaseManager(driver)
+    yield manager
+    manager.execute_query("MATCH (n) WHERE n.companyName STARTS WITH 'RollupTest' OR n.name STARTS WITH 'RollupTest' DETACH DELETE n")
+    driver.close()
+
+
+def quarters(company, metric, year, values, months=("03-31", "06-30", "09-30", "12-31")):
+    return [{"company": company, "metric": metric, "value": value, "date": f"{year}-{month}", "unit": None}
+            for month, value in zip(months, values)]
+
+
+def test_annual_values_yoy_and_ranks_against_neo4j(database):
+    database.add_metric_values(
+        quarters("RollupTestA", "Revenue", 2022, [8, 8, 8, 8]) + quarters("RollupTestA", "Revenue", 2023, [10, 10, 10, 10])
+        + quarters("RollupTestB", "Revenue", 2023, [12, 12, 12, 12])
+        # No first quarter, so this flow total is not a full year
+        + quarters("RollupTestC", "Revenue", 2023, [30, 30, 30], months=("06-30", "09-30", "12-31"))
+        + quarters("RollupTestA", "EPS", 2023, [1, 2, 3, 4])
+        # The 2024 value completes 2023 for a closing-value metric
+        + quarters("RollupTestB", "EPS", 2023, [5, 3]) + quarters("RollupTestB", "EPS", 2024, [6]))
+    rows = database.execute_query("""
+    MATCH (a:AnnualMetric) WHERE a.companyName STARTS WITH 'RollupTest'
+    RETURN a.companyName AS company, a.metricName AS metric, a.year AS year, a.value AS value, a.basis AS basis,
+           a.complete AS complete, a.yoyGrowth AS yoy, a.overallRank AS rank
+    """)
+    annual = {(row["company"], row["metric"], row["year"]): row for row in rows}
+
+    def figure(company, metric, year):
+        row = annual[(company, metric, year)]
+        return row["value"], row["basis"], row["complete"], row["yoy"]
+
+    def rank(company, metric, year):
+        return annual[(company, metric, year)]["rank"]
+
+    assert figure("RollupTestA", "Revenue", 2023) == (40, "total", True, 0.25)
+    assert figure("RollupTestB", "Revenue", 2023) == (48, "total", True, None)
+    assert figure("RollupTestC", "Revenue", 2023) == (90, "total", False, None)
+    assert figure("RollupTestA", "EPS", 2023) == (4, "closing", True, None)
+    assert figure("RollupTestB", "EPS", 2023) == (3, "closing", True, None)
+    assert figure("RollupTestB", "EPS", 2024) == (6, "closing", False, None)
+    # Other data in the database may rank in between, so only the order is checked
+    assert rank("RollupTestB", "Revenue", 2023) < rank("RollupTestA", "Revenue", 2023)
+    assert rank("RollupTestA", "EPS", 2023) < rank("RollupTestB", "EPS", 2023)
+    assert rank("RollupTestC", "Revenue", 2023) is None and rank("RollupTestB", "EPS", 2024) is None
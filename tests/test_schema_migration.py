@@ -0,0 +1,61 @@
+import pytest
+from modules.schema_migration import migrate, bootstrap, MIGRATION_STEPS
+from modules.rollups import ROLLUP_CONSTRAINTS
+
+
+class RecordingSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, statement, params=None):
+        self.driver.statements.append(statement)
+        if self.driver.fail_on and self.driver.fail_on in statement:
+            raise RuntimeError("step failed")
+        if "RETURN count(mv)" in statement:
+            return [{"count": 0}]
+        return []
+
+
+class RecordingDriver:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.statements = []
+
+    def session(self, **kwargs):
+        return RecordingSession(self)
+
+
+class Manager:
+    def __init__(self, driver):
+        self.driver = driver
+
+
+def test_version_recorded_after_every_step():
+    driver = RecordingDriver()
+    assert migrate(Manager(driver)) == {"schema_version": 2, "orphaned_values": 0}
+    assert "SchemaVersion" in driver.statements[-1]
+
+
+def test_failed_step_leaves_version_unchanged():
+    _, failing_step = MIGRATION_STEPS[2]
+    driver = RecordingDriver(fail_on=failing_step)
+    with pytest.raises(RuntimeError):
+        migrate(Manager(driver))
+    assert not any("SchemaVersion" in statement for statement in driver.statements)
+
+
+def test_bootstrap_creates_the_rollup_keys():
+    driver = RecordingDriver()
+
+    class Current(Manager):
+        def execute_query(self, query, params=None):
+            return [{"version": 2}]
+
+    bootstrap(Current(driver))
+    assert all(statement in driver.statements for statement in ROLLUP_CONSTRAINTS)
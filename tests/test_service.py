@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import pytest
+
+pytest.importorskip("neo4j")
+pytest.importorskip("spacy")
+
+import modules.service as service_module
+from modules.service import FinWiseService
+from modules.conversation_manager import ConversationContext
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def get_data_version(self):
+        return "1"
+
+    def execute_query(self, query, params={}):
+        return []
+
+    def execute_generated_query(self, query, params={}):
+        self.started.set()
+        self.release.wait(1.0)
+        return [{"Company": "TCS", "Value": 120.0}]
+
+
+class FakeQueryGenerator:
+    def generate_and_validate_query(self, intent, entities):
+        return "MATCH (n) RETURN n", True, ""
+
+    def extract_parameters_from_query(self, query):
+        return []
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(service_module, "extract_entities_and_intent",
+                        lambda question: ({"companies": ["TCS"], "metrics": ["revenue"]}, {"action": "display"}))
+    service = FinWiseService(FakeDatabase(), None, "llama", FakeQueryGenerator())
+    yield service
+    service.db_manager.release.set()
+
+
+def the_flight(service):
+    return service.flights.join(service.answer_cache.key({"companies": ["TCS"], "metrics": ["revenue"]}, {"action": "display"},
+                                                         service_module.model_router.model_for("answer", "llama")))
+
+
+def test_an_error_after_the_pipeline_fails_the_leaders_flight(service, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("context store unavailable")
+
+    monkeypatch.setattr(service, "_update_conversation_context", broken)
+    service.db_manager.release.set()
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.retrieve_async("TCS revenue", ConversationContext()))
+    # The failed flight has left the registry, so the next request leads its own
+    flight, leader = the_flight(service)
+    assert leader
+
+
+def test_a_cancelled_leader_fails_its_flight(service):
+    followers = []
+
+    async def cancel_mid_query():
+        leading = asyncio.ensure_future(service.retrieve_async("TCS revenue", ConversationContext()))
+        await asyncio.to_thread(service.db_manager.started.wait, 1.0)
+        flight, leader = the_flight(service)
+        followers.append(flight)
+        leading.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leading
+        return leader
+
+    assert not asyncio.run(cancel_mid_query())
+    assert followers[0].wait_data(1.0) is None and followers[0].failed
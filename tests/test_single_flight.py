@@ -0,0 +1,73 @@
+import threading
+import pytest
+from modules.single_flight import SingleFlight, FlightFailed
+
+
+def test_concurrent_joins_share_one_leader():
+    flights = SingleFlight()
+    first, first_leads = flights.join("tcs revenue")
+    second, second_leads = flights.join("tcs revenue")
+    other, other_leads = flights.join("infosys revenue")
+    assert first is second and first_leads and not second_leads
+    assert other is not first and other_leads
+    assert first.followers == 1
+
+
+def test_followers_get_the_leaders_answer_and_later_requests_start_afresh():
+    flights = SingleFlight()
+    flight, _ = flights.join("tcs revenue")
+    follower, _ = flights.join("tcs revenue")
+    answers = []
+    waiting = threading.Thread(target=lambda: answers.append(follower.wait_answer(1.0)))
+    waiting.start()
+    flights.finish(flight, "TCS revenue was 120")
+    waiting.join()
+    assert answers == ["TCS revenue was 120"]
+    assert flights.join("tcs revenue")[1]
+
+
+def test_a_failed_flight_wakes_its_followers_without_an_answer():
+    flights = SingleFlight()
+    flight, _ = flights.join("tcs revenue")
+    flight.publish("TCS revenue ")
+    flights.fail(flight)
+    assert flight.wait_data(1.0) is None
+    assert flight.wait_answer(1.0) is None
+    parts = flight.stream(1.0)
+    assert next(parts) == "TCS revenue "
+    with pytest.raises(FlightFailed):
+        next(parts)
+    assert flights.join("tcs revenue")[1]
+
+
+def test_streamed_parts_reach_followers_in_order():
+    flights = SingleFlight()
+    flight, _ = flights.join("tcs revenue")
+    received = []
+    following = threading.Thread(target=lambda: received.extend(flight.stream(1.0)))
+    following.start()
+    for part in ["TCS ", "revenue ", "was 120"]:
+        flight.publish(part)
+    flights.finish(flight, "TCS revenue was 120")
+    following.join()
+    assert received == ["TCS ", "revenue ", "was 120"]
+
+
+def test_a_leader_that_answers_at_once_is_streamed_as_one_part():
+    flights = SingleFlight()
+    flight, _ = flights.join("tcs revenue")
+    flights.finish(flight, "TCS revenue was 120")
+    assert list(flight.stream(1.0)) == ["TCS revenue was 120"]
+
+
+def test_a_stalled_leader_times_out_and_can_be_abandoned():
+    flights = SingleFlight()
+    flight, _ = flights.join("tcs revenue")
+    with pytest.raises(FlightFailed):
+        next(flight.stream(0.01))
+    flights.abandon(flight)
+    replacement, leads = flights.join("tcs revenue")
+    assert leads and replacement is not flight
+    # The abandoned leader finishing late does not remove its replacement
+    flights.finish(flight, "late")
+    assert flights.join("tcs revenue")[0] is replacement
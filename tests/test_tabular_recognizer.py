@@ -0,0 +1,48 @@
+import pandas as pd
+from modules.tabular_recognizer import TabularMetricRecognizer, parse_dates
+
+
+def test_ambiguous_dates_are_read_day_first():
+    parsed = parse_dates(pd.Series(["04/03/2023", "31/03/2023", "01-06-2023"]))
+    assert list(parsed.dt.strftime("%Y-%m-%d")) == ["2023-03-04", "2023-03-31", "2023-06-01"]
+
+
+def test_year_first_dates_keep_their_month():
+    parsed = parse_dates(pd.Series(["2023-03-04", "2023/06/01", "04/03/2023"]))
+    assert list(parsed.dt.strftime("%Y-%m-%d")) == ["2023-03-04", "2023-06-01", "2023-03-04"]
+
+
+def test_wide_table_with_day_first_dates():
+    table = pd.DataFrame({
+        "Company": ["TCS", "TCS"],
+        "Date": ["30/06/2023", "01/04/2023"],
+        "Revenue (INR Lakhs)": ["1,00,000", "2,00,000"]
+    })
+    result = TabularMetricRecognizer().recognize(table)
+    assert [(record["date"], record["value"]) for record in result.records] == [("2023-04-01", 2000.0), ("2023-06-30", 1000.0)]
+    assert result.records[0]["unit"] == "INR Crores"
+
+
+def test_small_values_survive_the_crore_conversion():
+    table = pd.DataFrame({
+        "Company": ["TCS", "TCS"],
+        "Date": ["31/03/2024", "30/06/2024"],
+        "Revenue (INR)": ["1,250", "3"]
+    })
+    result = TabularMetricRecognizer().recognize(table)
+    assert [record["value"] for record in result.records] == [1.25e-4, 3e-7]
+
+
+def test_unknown_metrics_are_counted_apart_from_unreadable_rows():
+    table = pd.DataFrame({
+        "Company": ["TCS", "TCS", "TCS", "", "TCS", "TCS"],
+        "Metric": ["Revenue", "Order Book", "Order Book", "Revenue", "Revenue", "Revenue"],
+        "Date": ["31/03/2024", "31/03/2024", "30/06/2024", "31/03/2024", "not a date", "31/03/2024"],
+        "Value": ["100", "5", "6", "7", "8", "110"]
+    })
+    result = TabularMetricRecognizer().recognize(table)
+    assert [(record["date"], record["value"]) for record in result.records] == [("2024-03-31", 110.0)]
+    assert (result.unknown_metric_rows, result.unknown_metrics) == (2, ["Order Book"])
+    assert (result.skipped_rows, result.duplicate_rows) == (2, 1)
+    summary = result.summary("upload.csv")
+    assert "2 rows with unrecognised metrics: Order Book" in summary and "Skipped 2 rows with a missing" in summary
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from modules.trend_engine import (holt_forecast, linear_forecast, summarize_series, series_from_rows, to_day,
+                                  periods_per_year)
+
+
+def quarterly(company, values, start="2022-03-31"):
+    days = to_day(start) + 91 * np.arange(len(values))
+    return (company, "Revenue", days.astype(np.int64), np.asarray(values, dtype=np.float64))
+
+
+def test_linear_forecast_continues_an_exact_line_for_padded_rows():
+    matrix = np.array([[1.0, 3.0, 5.0, 7.0], [np.nan, np.nan, 5.0, 7.0]])
+    assert linear_forecast(matrix, 2).tolist() == [[9.0, 11.0], [9.0, 11.0]]
+
+
+def test_holt_forecast_matches_the_recurrence():
+    # level 10 -> 0.5 * 12 + 0.5 * 10 = 11, trend 0 -> 0.3 * (11 - 10) = 0.3
+    forecast = holt_forecast(np.array([[10.0, 12.0], [np.nan, 4.0]]), 2)
+    assert forecast[0] == pytest.approx([11.3, 11.6])
+    # A single observation forecasts flat
+    assert forecast[1].tolist() == [4.0, 4.0]
+
+
+def test_holt_forecast_tracks_a_steady_trend():
+    forecast = holt_forecast(np.arange(40, dtype=np.float64)[None, :] * 2 + 100, 1)
+    assert forecast[0, 0] == pytest.approx(180.0, rel=1e-3)
+
+
+def test_summary_forecasts_one_period_ahead_at_the_series_step():
+    series = [quarterly("TCS", [100, 110, 120, 130, 140, 150, 160, 170])]
+    summary = summarize_series(series, horizon=2, method="linear")[0]
+    assert periods_per_year(series) == 4
+    assert [point["Value"] for point in summary["Forecast"]] == [180.0, 190.0]
+    assert summary["Forecast"][0]["Date"] == str(np.datetime64(int(series[0][2][-1]) + 91, "D"))
+    assert summary["YoYChangePct"] == pytest.approx(100 * (170 / 130 - 1), abs=0.01)
+    assert summary["PeriodChangePct"] == pytest.approx(100 * (170 / 160 - 1), abs=0.01)
+    assert summary["ForecastMethod"] == "linear trend"
+    assert summary["Seasonality"] == "weak"
+
+
+def test_summary_flags_seasonal_series_and_skips_forecasts_without_a_horizon():
+    seasonal = quarterly("Infosys", [100, 140, 100, 60] * 3)
+    summary = summarize_series([seasonal])[0]
+    assert summary["Seasonality"] == "strong"
+    assert "Forecast" not in summary
+
+
+def test_series_from_trend_rows_keeps_the_latest_value_per_day():
+    rows = [{"Company": "TCS", "Metric": "Revenue", "Trend": [{"date": "2024-06-30", "value": 2},
+                                                              {"date": "2024-03-31", "value": 1},
+                                                              {"date": "2024-06-30", "value": 3}]},
+            {"Company": "TCS", "Metric": "Revenue", "Date": "2024-09-30", "Value": "n/a"}]
+    (company, metric, days, values), = series_from_rows(rows)
+    assert [str(np.datetime64(int(day), "D")) for day in days] == ["2024-03-31", "2024-06-30"]
+    assert values.tolist() == [1.0, 3.0]